@@ -5,16 +5,101 @@
 
 """Common hterm util code."""
 
+import contextlib
+import http.server
 from pathlib import Path
+import shutil
 import sys
+import threading
 
 
 BIN_DIR = Path(__file__).resolve().parent
 DIR = BIN_DIR.parent
 LIBAPPS_DIR = DIR.parent
 
+# The browsers to look for on $PATH.
+BROWSERS = ('google-chrome', 'google-chrome-stable', 'chromium',
+            'chromium-browser', 'chrome')
+
 
 sys.path.insert(0, str(LIBAPPS_DIR / 'libdot' / 'bin'))
 
 # pylint: disable=unused-import
 import libdot  # pylint: disable=wrong-import-position
+
+
+def find_browser(browser=None):
+    """Find the browser to run, or None if we can't."""
+    if browser:
+        return shutil.which(browser)
+    for name in BROWSERS:
+        path = shutil.which(name)
+        if path:
+            return path
+    return None
+
+
+def browser_argv(browser, profile, url, visible=False, flags=()):
+    """Get the command line to open a page in a fresh browser profile.
+
+    Args:
+      browser: The browser to run.
+      profile: The (temporary) profile dir to use.
+      url: The page to open.
+      visible: Whether to show the browser rather than run it headless.
+      flags: Any extra flags for the browser.
+    """
+    argv = [
+        browser,
+        '--user-data-dir=%s' % (profile,),
+        '--no-first-run',
+        '--no-default-browser-check',
+    ] + list(flags)
+    if not visible:
+        argv += ['--headless', '--disable-gpu']
+    argv.append(url)
+    return argv
+
+
+class ReportHandler(http.server.SimpleHTTPRequestHandler):
+    """Serve libapps, and accept the results a page posts back."""
+
+    def __init__(self, *args, report_path, on_report, **kwargs):
+        self.report_path = report_path
+        self.on_report = on_report
+        super().__init__(*args, directory=str(LIBAPPS_DIR), **kwargs)
+
+    def do_POST(self):
+        """Accept the results, and pass the body to on_report."""
+        if self.path != self.report_path:
+            self.send_error(404)
+            return
+
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        self.send_response(204)
+        self.end_headers()
+        self.on_report(body)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        """Keep quiet about every request."""
+
+
+@contextlib.contextmanager
+def serve(handler):
+    """Serve HTTP on a free local port from a background thread.
+
+    Args:
+      handler: The request handler (e.g. a ReportHandler).
+
+    Yields:
+      The base URL of the server.
+    """
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield 'http://127.0.0.1:%s' % (server.server_port,)
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# Copyright 2019 The Chromium OS Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Tests for mkdist."""
+
+import importlib.machinery
+import importlib.util
+import os
+import sys
+import tempfile
+import unittest
+
+import hterm
+
+
+def load_mkdist():
+    """Load the mkdist script as a module."""
+    path = str(hterm.BIN_DIR / 'mkdist')
+    loader = importlib.machinery.SourceFileLoader('mkdist', path)
+    spec = importlib.util.spec_from_loader('mkdist', loader)
+    module = importlib.util.module_from_spec(spec)
+    # The parallel builds need to find the module by name.
+    sys.modules['mkdist'] = module
+    loader.exec_module(module)
+    return module
+
+
+mkdist = load_mkdist()
+
+
+class LazyResourcesTests(unittest.TestCase):
+    """Tests for --lazy-resources."""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.outdir = self.tempdir.name
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def build(self, name):
+        """Build a single output with --lazy-resources & return its content."""
+        mkdist.main(['-o', self.outdir, '--lazy-resources',
+                     str(hterm.DIR / 'concat' / ('%s.concat' % (name,)))])
+        with open(os.path.join(self.outdir, '%s.js' % (name,)),
+                  encoding='utf-8') as fp:
+            return fp.read()
+
+    def test_runtime_resources(self):
+        """Check the runtime resources are loaded lazily."""
+        data = self.build('hterm_resources')
+        self.assertIn(mkdist.LAZY_RESOURCE_SUFFIX, data)
+        self.assertTrue(os.path.exists(
+            os.path.join(self.outdir, 'hterm_resources.resources.json')))
+
+    def test_test_resources(self):
+        """Check the test resources are still inlined."""
+        data = self.build('hterm_test_resources')
+        self.assertNotIn(mkdist.LAZY_RESOURCE_SUFFIX, data)
+        self.assertFalse(os.path.exists(
+            os.path.join(self.outdir, 'hterm_test_resources.resources.json')))
+        # The canned session data itself is in the output.
+        self.assertIn('@@ HEADER_START', data)
+
+
+if __name__ == '__main__':
+    unittest.main()
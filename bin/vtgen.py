@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+# Copyright 2020 The Chromium OS Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Generate synthetic VT sessions for throughput testing.
+
+The canned sessions in ../test_data/ are small and exercise correctness.  This
+writes sessions of any size that stress a particular part of the terminal:
+
+    ascii:  Plain text, like `cat`ing a large file.
+    sgr:    Short runs of text with dense color & attribute changes.
+    scroll: Scroll region changes, index/reverse index, and line insert/delete.
+    cjk:    Wide (CJK, Hangul, emoji) and combining character text.
+    osc8:   Text with lots of OSC 8 hyperlinks.
+    osc52:  Large OSC 52 clipboard payloads.
+    mixed:  All of the above.
+
+Output is streamed, so sizes aren't limited by memory.  The same seed always
+generates the same data.
+
+The output uses the canned session format (see ../js/hterm_vt_canned_tests.js)
+so it can be fed to vtscope.py or the canned tests as is.  The session ends by
+resetting the terminal (and clearing its scrollback) and printing a marker
+line, and the header contains a checkpoint for it, so the canned tests can
+verify the terminal survived.  This needs a second (counting) pass over the
+data; use --no-checkpoint to skip it.
+
+Sample usage:
+
+    # 100MB of colorful text for vtscope.
+    ./vtgen.py -w sgr -s 100M -o /tmp/sgr.log
+    ./vtscope.py --clients 1 --play /tmp/sgr.log
+
+    # Or straight to a terminal.
+    ./vtgen.py -w cjk -s 10M --no-checkpoint | tail -n +3
+"""
+
+import argparse
+import base64
+import random
+import re
+import sys
+
+
+# The workloads in the order they're listed.
+WORKLOADS = ('ascii', 'sgr', 'scroll', 'cjk', 'osc8', 'osc52')
+
+# How many snippets each workload picks from.
+POOL_SIZE = 1024
+
+# About how many bytes to generate at a time.
+BATCH_SIZE = 256 * 1024
+
+# Terminal size the workloads are aimed at (same as the canned tests).
+COLUMNS = 80
+ROWS = 25
+
+# Default size of the data (not counting the header).
+SIZE = '1M'
+
+# Default size of each OSC 52 payload (before base64 encoding).
+OSC52_SIZE = '64K'
+
+# Printed after the final reset; see --no-checkpoint.
+DONE = 'vtgen: %s %d bytes'
+
+SIZE_RE = re.compile(r'^(\d+)([kmg]?)$', re.IGNORECASE)
+
+
+def parse_size(size):
+    """Parse a size like 100, 64K, or 2G."""
+    m = SIZE_RE.match(size)
+    if not m:
+        raise ValueError('invalid size: %s' % (size,))
+    return int(m.group(1)) * 1024 ** ' kmg'.index(m.group(2).lower() or ' ')
+
+
+def ascii_text(rng, length):
+    """Get random printable ASCII text."""
+    return ''.join(rng.choices(
+        'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+        '      .,;:!?()[]{}<>/\\|-_=+*&^%$#@~`"\'', k=length))
+
+
+def ascii_pool(rng, _opts):
+    """Lines of plain text."""
+    return ['%s\r\n' % (ascii_text(rng, rng.randrange(COLUMNS + 20)),)
+            for _ in range(POOL_SIZE)]
+
+
+def sgr_pool(rng, _opts):
+    """Lines with attribute/color changes every few characters."""
+    def _sgr():
+        choice = rng.randrange(5)
+        if choice == 0:
+            return '\x1b[%dm' % (rng.choice((0, 1, 2, 3, 4, 5, 7, 8, 9, 22,
+                                              23, 24, 25, 27, 28, 29)),)
+        elif choice == 1:
+            return '\x1b[%d;%dm' % (rng.randrange(30, 38),
+                                    rng.randrange(40, 48))
+        elif choice == 2:
+            return '\x1b[%d8;5;%dm' % (rng.choice((3, 4)), rng.randrange(256))
+        elif choice == 3:
+            return '\x1b[%d8;2;%d;%d;%dm' % (
+                rng.choice((3, 4)), rng.randrange(256), rng.randrange(256),
+                rng.randrange(256))
+        return '\x1b[%dm' % (rng.randrange(90, 98),)
+
+    ret = []
+    for _ in range(POOL_SIZE):
+        line = ''
+        width = 0
+        while width < COLUMNS:
+            text = ascii_text(rng, min(rng.randrange(1, 5), COLUMNS - width))
+            line += _sgr() + text
+            width += len(text)
+        ret.append(line + '\x1b[m\r\n')
+    return ret
+
+
+def scroll_pool(rng, _opts):
+    """Scroll region changes & scrolling within them."""
+    def _region():
+        top = rng.randrange(1, ROWS - 1)
+        return '\x1b[%d;%dr' % (top, rng.randrange(top + 1, ROWS + 1))
+
+    ret = []
+    for _ in range(POOL_SIZE):
+        choice = rng.randrange(6)
+        if choice == 0:
+            snippet = _region()
+        elif choice == 1:
+            # Move into the region and write a few lines that scroll it.
+            snippet = '\x1b[%dH' % (rng.randrange(1, ROWS + 1),) + ''.join(
+                '%s\x1bD\r' % (ascii_text(rng, rng.randrange(COLUMNS)),)
+                for _ in range(rng.randrange(1, 8)))
+        elif choice == 2:
+            snippet = '\x1bM' * rng.randrange(1, 8)
+        elif choice == 3:
+            snippet = '\x1b[%d%s' % (rng.randrange(1, 8), rng.choice('ST'))
+        elif choice == 4:
+            snippet = '\x1b[%dH\x1b[%d%s' % (rng.randrange(1, ROWS + 1),
+                                             rng.randrange(1, 8),
+                                             rng.choice('LM'))
+        else:
+            snippet = '\x1b[r'
+        ret.append(snippet)
+    return ret
+
+
+def cjk_pool(rng, _opts):
+    """Lines of wide & combining characters."""
+    ranges = (
+        (0x4e00, 0x9fff),    # CJK ideographs.
+        (0xac00, 0xd7a3),    # Hangul syllables.
+        (0x3041, 0x3096),    # Hiragana.
+        (0x30a1, 0x30fa),    # Katakana.
+        (0xff01, 0xff5e),    # Fullwidth ASCII.
+        (0x1f300, 0x1f5ff),  # Emoji.
+    )
+
+    def _char():
+        choice = rng.randrange(len(ranges) + 2)
+        if choice < len(ranges):
+            return chr(rng.randint(*ranges[choice])), 2
+        elif choice == len(ranges):
+            # A base character with a few combining marks.
+            return rng.choice('aeiouAEIOU') + ''.join(
+                chr(rng.randint(0x300, 0x36f))
+                for _ in range(rng.randrange(1, 4))), 1
+        return ascii_text(rng, 1), 1
+
+    ret = []
+    for _ in range(POOL_SIZE):
+        line = ''
+        width = 0
+        while width < COLUMNS - 1:
+            (char, char_width) = _char()
+            line += char
+            width += char_width
+        ret.append(line + '\r\n')
+    return ret
+
+
+def osc8_pool(rng, _opts):
+    """Lines full of hyperlinks."""
+    ret = []
+    for i in range(POOL_SIZE):
+        line = ''
+        for j in range(rng.randrange(1, 6)):
+            line += '%s\x1b]8;id=%d-%d;https://example.com/%s\x1b\\%s' \
+                    '\x1b]8;;\x1b\\' % (
+                        ascii_text(rng, rng.randrange(8)), i, j,
+                        ascii_text(rng, 16).replace(' ', '-'),
+                        ascii_text(rng, rng.randrange(1, 12)))
+        ret.append(line + '\r\n')
+    return ret
+
+
+def osc52_pool(rng, opts):
+    """Large clipboard copies with a bit of text in between."""
+    # The payloads can be big, so don't keep too many of them around.
+    return ['%s\r\n\x1b]52;c;%s\x07' % (
+        ascii_text(rng, rng.randrange(COLUMNS)),
+        base64.b64encode(rng.randbytes(opts.osc52_size)).decode('ascii'))
+            for _ in range(8)]
+
+
+POOLS = {
+    'ascii': ascii_pool,
+    'sgr': sgr_pool,
+    'scroll': scroll_pool,
+    'cjk': cjk_pool,
+    'osc8': osc8_pool,
+    'osc52': osc52_pool,
+}
+
+
+def get_pool(workload, opts):
+    """Get the encoded snippets for a workload.
+
+    Args:
+      workload: The name of the workload.
+      opts: The command line options.
+
+    Returns:
+      A list of bytes.
+    """
+    rng = random.Random('%s:%s' % (opts.seed, workload))
+    if workload == 'mixed':
+        pool = []
+        for name in WORKLOADS:
+            pool += get_pool(name, opts)
+        return pool
+    return [x.encode('utf-8') for x in POOLS[workload](rng, opts)]
+
+
+def generate(workload, size, opts):
+    """Generate the data for a workload.
+
+    Snippets are never split, so this can overshoot |size| a bit.
+
+    Args:
+      workload: The name of the workload.
+      size: How many bytes to generate.
+      opts: The command line options.
+
+    Yields:
+      Chunks of bytes.
+    """
+    pool = get_pool(workload, opts)
+    count = max(1, BATCH_SIZE * len(pool) // sum(len(x) for x in pool))
+    rng = random.Random(opts.seed)
+    total = 0
+    while total < size:
+        chunk = b''.join(rng.choices(pool, k=count))
+        # Trim the last batch down to (about) the requested size.
+        if total + len(chunk) > size:
+            chunk = bytearray()
+            while total + len(chunk) < size:
+                chunk += rng.choice(pool)
+            chunk = bytes(chunk)
+        total += len(chunk)
+        yield chunk
+
+
+def trailer(workload, size):
+    """Get the reset & marker that ends the data.
+
+    The checkpoint counts rows from the top of the scrollback, which a reset
+    leaves alone, so that's cleared too (CSI 3 J).
+    """
+    return b'\x1bc\x1b[3J' + (DONE % (workload, size)).encode('utf-8')
+
+
+def header(workload, size, offset):
+    """Get the canned session header.
+
+    Args:
+      workload: The name of the workload.
+      size: The requested size.
+      offset: The size of the generated data, or None for no checkpoint.
+    """
+    ret = '# Generated by vtgen.py: %s %d bytes\n@@ HEADER_START\n' % (
+        workload, size)
+    if offset is not None:
+        done = DONE % (workload, size)
+        ret += '@@ OFFSET:%d LINES:1 CURSOR:0,%d\n%s\n' % (
+            offset, len(done), done)
+    return (ret + '@@ HEADER_END\n').encode('utf-8')
+
+
+def get_parser():
+    """Get a command line parser."""
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-w', '--workload', default='mixed',
+                        choices=WORKLOADS + ('mixed',),
+                        help='What to generate. (default: %(default)s)')
+    parser.add_argument('-s', '--size', default=SIZE,
+                        help='Approximate size of the data (e.g. 64K, 100M, '
+                             '2G). (default: %(default)s)')
+    parser.add_argument('-o', '--output', default='-',
+                        help='File to write. (default: stdout)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Random seed. (default: %(default)s)')
+    parser.add_argument('--osc52-size', default=OSC52_SIZE,
+                        help='Size of each OSC 52 payload. '
+                             '(default: %(default)s)')
+    parser.add_argument('--no-checkpoint', dest='checkpoint',
+                        action='store_false',
+                        help="Don't add a checkpoint for the end of the data.")
+    return parser
+
+
+def main(argv):
+    """The main func!"""
+    parser = get_parser()
+    opts = parser.parse_args(argv)
+    try:
+        size = parse_size(opts.size)
+        opts.osc52_size = parse_size(opts.osc52_size)
+    except ValueError as e:
+        parser.error(e)
+
+    offset = None
+    if opts.checkpoint:
+        offset = sum(len(x) for x in generate(opts.workload, size, opts))
+        offset += len(trailer(opts.workload, size))
+
+    if opts.output == '-':
+        output = sys.stdout.buffer
+    else:
+        output = open(opts.output, 'wb')
+    try:
+        output.write(header(opts.workload, size, offset))
+        for chunk in generate(opts.workload, size, opts):
+            output.write(chunk)
+        output.write(trailer(opts.workload, size))
+        output.flush()
+    except BrokenPipeError:
+        pass
+    finally:
+        if output is not sys.stdout.buffer:
+            output.close()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,517 @@
+#!/usr/bin/env python3
+# Copyright 2020 The Chromium OS Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Pack canned VT sessions into seekable compressed files.
+
+Real world recordings can be gigabytes in size, and compressing them with gzip
+or zstd means they have to be decompressed from the start to get at any part
+of them.  A pack splits the playback data into fixed size blocks which are
+compressed independently, so readers only ever need to decompress the blocks
+they're looking at, and memory use stays bounded no matter how big the
+recording is.
+
+A pack file is laid out like this:
+
+    MAGIC
+    The compressed blocks, back to back.
+    The compressed header of the canned session (see
+        ../js/hterm_vt_canned_tests.js), if it had one.
+    The index, as zlib compressed JSON.
+    The trailer: the offset & size of the index as little endian 64-bit
+        numbers, and MAGIC again.
+
+The index is a dict with:
+
+    version: FORMAT_VERSION.
+    codec: The compression used for the blocks & header (see CODECS).
+    block_size: The size of each block of playback data (but the last).
+    size: The size of the playback data.
+    blocks: The [offset, size] in the file of each compressed block.
+    header: The [offset, size] in the file of the compressed header, or None.
+    timing: If the session came with a `script -t` timing file, the offset of
+        the first byte it accounts for ('base'), and the [delay, size] of each
+        write ('writes').  Otherwise None.
+
+Sample usage:
+
+    # Pack a recording (and its .timing file, if there is one).
+    ./vtpack.py ../test_data/vttest-01.log
+
+    # Pack a compressed capture, compressing the blocks with zstd.
+    ./vtpack.py --codec zstd -o big.vtpack big.log.gz
+
+    # Play it back.
+    ./vtscope.py --clients 1 --play big.vtpack
+
+Reading .zst input, or using the zstd codec, needs the 'zstandard' module.
+gzip, xz and bzip2 input only need the standard library.
+"""
+
+import argparse
+import bz2
+import collections
+import gzip
+import json
+import lzma
+import os
+import re
+import struct
+import sys
+import threading
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Marks the start & end of every pack file.
+MAGIC = b'\x89VTPACK\n'
+
+# The version of the index we write & understand.
+FORMAT_VERSION = 1
+
+# The suffix of pack files.
+SUFFIX = '.vtpack'
+
+# The suffix of timing files that go along with canned data files.
+TIMING_SUFFIX = '.timing'
+
+# The default size of each block of playback data.
+BLOCK_SIZE = 1024 * 1024
+
+# How many decompressed blocks a Reader keeps around by default.
+CACHE_BLOCKS = 8
+
+# The most we read at a time while looking for the header of a canned session,
+# and the largest header (including any lead-in comments) we accept.
+HEADER_READ_SIZE = 64 * 1024
+HEADER_LIMIT = 64 * 1024 * 1024
+
+# The first line the `script` command writes to its output, which the timing
+# file doesn't account for.
+SCRIPT_STARTED = b'Script started on '
+
+# The trailer at the end of the file.
+TRAILER = struct.Struct('<QQ%ds' % (len(MAGIC),))
+
+# Matches the start of a header, and the lines of it we care about.
+HEADER_START_RE = re.compile(rb'(#[^\n]*\n)*@@ HEADER_START')
+STOP_RE = re.compile(
+    rb'^@@\s+OFFSET:(\d+)\s+LINES:(\d+)\s+CURSOR:(\d+),(\d+)\s*$', re.MULTILINE)
+HEADER_END_RE = re.compile(rb'^@@ HEADER_END\r?\n', re.MULTILINE)
+
+
+def _zstd_compress(data):
+    return zstandard.ZstdCompressor().compress(data)
+
+
+def _zstd_decompress(data):
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+# The block compression methods, as (compress, decompress) functions.
+CODECS = {
+    'none': (bytes, bytes),
+    'zlib': (zlib.compress, zlib.decompress),
+    'lzma': (lzma.compress, lzma.decompress),
+    'zstd': (_zstd_compress, _zstd_decompress),
+}
+
+
+class Error(Exception):
+    """Raised for bad pack files."""
+
+
+def is_pack(filename):
+    """Return True if |filename| looks like a pack file."""
+    try:
+        with open(filename, 'rb') as fp:
+            return fp.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def check_codec(codec):
+    """Raise Error if |codec| can't be used."""
+    if codec not in CODECS:
+        raise Error('unknown codec: %s' % (codec,))
+    if codec == 'zstd' and zstandard is None:
+        raise Error("zstd needs the 'zstandard' module")
+
+
+def parse_stops(header):
+    """Parse the '@@ OFFSET' stops in a header.
+
+    Returns:
+      A list of [offset, lines, row, column] lists, sorted by offset.
+    """
+    return sorted([int(x) for x in m.groups()]
+                  for m in STOP_RE.finditer(header))
+
+
+def parse_timing(fp):
+    """Parse a `script -t` timing file into a list of [delay, size] writes.
+
+    Each line describes one write by the recorded program, either in the
+    classic "<delay> <byte-count>" format or the newer "O <delay> <byte-count>"
+    one (where only the O[utput] lines matter).  Delays are relative to the
+    previous write.
+    """
+    writes = []
+    for line in fp:
+        fields = line.split()
+        if len(fields) == 3:
+            if fields[0] != 'O':
+                continue
+            fields = fields[1:]
+        elif len(fields) != 2:
+            continue
+        writes.append([float(fields[0]), int(fields[1])])
+    return writes
+
+
+class Writer:
+    """Write a pack file a bit at a time.
+
+    The playback data is written with write(), and everything else is written
+    by close().
+    """
+
+    def __init__(self, fp, codec='zlib', block_size=BLOCK_SIZE):
+        """Start a new pack file.
+
+        Args:
+          fp: The file object to write to.
+          codec: How to compress the blocks (see CODECS).
+          block_size: How much playback data to put in each block.
+        """
+        check_codec(codec)
+        self.fp = fp
+        self.codec = codec
+        self.compress = CODECS[codec][0]
+        self.block_size = block_size
+
+        # The data waiting to fill up a block, the total size of the data, and
+        # the [offset, size] of each block written out.
+        self.pending = bytearray()
+        self.size = 0
+        self.blocks = []
+
+        # How much has been written to the file.
+        fp.write(MAGIC)
+        self.offset = len(MAGIC)
+
+    def _write(self, data):
+        """Compress & write out some data, returning its [offset, size]."""
+        data = self.compress(data)
+        self.fp.write(data)
+        ret = [self.offset, len(data)]
+        self.offset += len(data)
+        return ret
+
+    def write(self, data):
+        """Add some playback data."""
+        self.pending += data
+        self.size += len(data)
+        while len(self.pending) >= self.block_size:
+            self.blocks.append(self._write(self.pending[:self.block_size]))
+            del self.pending[:self.block_size]
+
+    def close(self, header=b'', timing=None):
+        """Finish off the pack file.
+
+        Args:
+          header: The header of the canned session, if any.
+          timing: The timing of the session as a {'base', 'writes'} dict (see
+              the module docs), if any.
+        """
+        if self.pending:
+            self.blocks.append(self._write(self.pending))
+            self.pending = bytearray()
+
+        index = {
+            'version': FORMAT_VERSION,
+            'codec': self.codec,
+            'block_size': self.block_size,
+            'size': self.size,
+            'blocks': self.blocks,
+            'header': self._write(header) if header else None,
+            'timing': timing,
+        }
+        data = zlib.compress(json.dumps(index).encode('utf-8'))
+        self.fp.write(data)
+        self.fp.write(TRAILER.pack(self.offset, len(data), MAGIC))
+        self.offset += len(data) + TRAILER.size
+
+
+class Reader:
+    """Random access to the playback data in a pack file.
+
+    This can be indexed & sliced like the bytes of the playback data, which
+    decompresses the blocks needed.  The most recently used blocks are cached.
+    Readers can be shared between threads.
+    """
+
+    def __init__(self, filename, cache_blocks=CACHE_BLOCKS):
+        """Open a pack file.
+
+        Raises Error if it isn't a valid pack file, or OSError if it can't be
+        read.
+        """
+        self.filename = filename
+        self.fp = open(filename, 'rb')
+        try:
+            self.fp.seek(-TRAILER.size, os.SEEK_END)
+            (offset, size, magic) = TRAILER.unpack(self.fp.read(TRAILER.size))
+            if magic != MAGIC:
+                raise Error('%s: not a pack file' % (filename,))
+
+            self.fp.seek(offset)
+            try:
+                index = json.loads(zlib.decompress(self.fp.read(size)))
+            except (zlib.error, ValueError) as e:
+                raise Error('%s: corrupt index: %s' % (filename, e))
+            if index.get('version') != FORMAT_VERSION:
+                raise Error('%s: unsupported version: %s' %
+                            (filename, index.get('version')))
+            check_codec(index['codec'])
+        except (Error, OSError):
+            self.fp.close()
+            raise
+
+        self.index = index
+        self.decompress = CODECS[index['codec']][1]
+        self.block_size = index['block_size']
+        self.size = index['size']
+        self.blocks = index['blocks']
+        self.timing = index['timing']
+
+        self.cache = collections.OrderedDict()
+        self.cache_blocks = cache_blocks
+
+        # Guards the file position & the cache.
+        self.lock = threading.RLock()
+
+    def close(self):
+        """Close the file."""
+        self.fp.close()
+
+    def _read(self, offset, size):
+        """Read & decompress part of the file."""
+        with self.lock:
+            self.fp.seek(offset)
+            data = self.fp.read(size)
+        return self.decompress(data)
+
+    @property
+    def header(self):
+        """The header of the canned session, or b'' if it didn't have one."""
+        if self.index['header'] is None:
+            return b''
+        return self._read(*self.index['header'])
+
+    def block(self, index):
+        """Return the decompressed playback data of block |index|."""
+        with self.lock:
+            data = self.cache.get(index)
+            if data is not None:
+                self.cache.move_to_end(index)
+                return data
+
+            data = self._read(*self.blocks[index])
+            self.cache[index] = data
+            if len(self.cache) > self.cache_blocks:
+                self.cache.popitem(last=False)
+            return data
+
+    def pieces(self, start, end):
+        """Yield the playback data between two offsets, a block at a time."""
+        start = max(start, 0)
+        end = min(end, self.size)
+        while start < end:
+            (index, pos) = divmod(start, self.block_size)
+            data = self.block(index)[pos : pos + end - start]
+            yield data
+            start += len(data)
+
+    def __len__(self):
+        """Return the size of the playback data."""
+        return self.size
+
+    def __getitem__(self, key):
+        """Get a byte (as an int) or a slice of the playback data."""
+        if isinstance(key, slice):
+            (start, end, step) = key.indices(self.size)
+            if step != 1:
+                raise ValueError('slices of packs must be contiguous')
+            return b''.join(self.pieces(start, end))
+
+        if key < 0:
+            key += self.size
+        if not 0 <= key < self.size:
+            raise IndexError('pack index out of range')
+        return self.block(key // self.block_size)[key % self.block_size]
+
+
+def open_input(filename):
+    """Open a canned session, decompressing it if need be."""
+    if filename.endswith('.gz'):
+        return gzip.open(filename, 'rb')
+    if filename.endswith('.xz'):
+        return lzma.open(filename, 'rb')
+    if filename.endswith('.bz2'):
+        return bz2.open(filename, 'rb')
+    if filename.endswith('.zst'):
+        if zstandard is None:
+            raise Error("reading .zst files needs the 'zstandard' module")
+        return zstandard.open(filename, 'rb')
+    return open(filename, 'rb')
+
+
+def read_header(fp):
+    """Read the header of a canned session, if it has one.
+
+    Lines are read in pieces of at most HEADER_READ_SIZE bytes, so a recording
+    without any newlines isn't read in whole.  Raises Error if the header is
+    bigger than HEADER_LIMIT.
+
+    Returns:
+      A (header, data) tuple of the header, and any data read after it that
+      turned out to be playback data (at most HEADER_LIMIT bytes or so).
+    """
+    pieces = []
+    size = 0
+    # Whether the next piece starts a line.
+    start = True
+    while True:
+        piece = fp.readline(HEADER_READ_SIZE)
+        pieces.append(piece)
+        size += len(piece)
+        if not piece or (start and not piece.startswith(b'#')):
+            break
+        if size > HEADER_LIMIT:
+            # Too many comments to be a lead-in to a header.
+            return (b'', b''.join(pieces))
+        start = piece.endswith(b'\n')
+
+    if not piece or not HEADER_START_RE.match(b''.join(pieces)):
+        return (b'', b''.join(pieces))
+
+    while not (start and HEADER_END_RE.match(piece)):
+        start = piece.endswith(b'\n')
+        piece = fp.readline(HEADER_READ_SIZE)
+        if not piece:
+            raise Error('unable to locate end of header')
+        pieces.append(piece)
+        size += len(piece)
+        if size > HEADER_LIMIT:
+            raise Error('header is bigger than %s bytes' % (HEADER_LIMIT,))
+    return (b''.join(pieces), b'')
+
+
+def convert(filename, output, codec='zlib', block_size=BLOCK_SIZE,
+            timing=None):
+    """Pack a canned session.
+
+    Args:
+      filename: The canned session to read.
+      output: The pack file to write.
+      codec: How to compress the blocks (see CODECS).
+      block_size: How much playback data to put in each block.
+      timing: The timing file for the session, if any.
+
+    Returns:
+      The Writer, for its stats.
+    """
+    check_codec(codec)
+
+    timing_data = None
+    if timing:
+        with open(timing) as fp:
+            timing_data = {'base': 0, 'writes': parse_timing(fp)}
+
+    with open_input(filename) as fp:
+        (header, data) = read_header(fp)
+        if not data:
+            data = fp.read(block_size)
+        if timing_data and data.startswith(SCRIPT_STARTED):
+            # The timing file doesn't account for the first line.
+            timing_data['base'] = data.find(b'\n') + 1
+
+        with open(output, 'wb') as out:
+            writer = Writer(out, codec, block_size)
+            while data:
+                writer.write(data)
+                data = fp.read(block_size)
+            writer.close(header, timing_data)
+
+    return writer
+
+
+def get_parser():
+    """Get a command line parser."""
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='+', metavar='file',
+                        help='Canned sessions to pack.  They may be gzip, xz, '
+                             'bzip2 or zstd compressed.')
+    parser.add_argument('-o', '--output',
+                        help='Where to write the pack, if packing one file. '
+                             '(default: the file with its .log & compression '
+                             'suffixes replaced by %s)' % (SUFFIX,))
+    parser.add_argument('--codec', default='zlib', choices=sorted(CODECS),
+                        help='How to compress the blocks. '
+                             '(default: %(default)s)')
+    parser.add_argument('--block-size', default=BLOCK_SIZE, type=int,
+                        help='How much playback data to put in each block. '
+                             '(default: %(default)s)')
+    parser.add_argument('--timing',
+                        help='The timing file, if packing one file. '
+                             '(default: the file + %s, if it exists)' %
+                             (TIMING_SUFFIX,))
+    return parser
+
+
+def main(argv):
+    """The main func!"""
+    parser = get_parser()
+    opts = parser.parse_args(argv)
+
+    if len(opts.files) > 1 and (opts.output or opts.timing):
+        parser.error('--output & --timing only work with one file')
+    if opts.block_size <= 0:
+        parser.error('--block-size must be positive')
+
+    for filename in opts.files:
+        output = opts.output
+        if not output:
+            output = re.sub(r'(\.log)?(\.(gz|xz|bz2|zst))?$', SUFFIX, filename,
+                            count=1)
+
+        timing = opts.timing
+        if not timing:
+            base = re.sub(r'\.(gz|xz|bz2|zst)$', '', filename)
+            if os.path.exists(base + TIMING_SUFFIX):
+                timing = base + TIMING_SUFFIX
+
+        try:
+            writer = convert(filename, output, opts.codec, opts.block_size,
+                             timing)
+        except (Error, OSError) as e:
+            print('%s: %s' % (filename, e), file=sys.stderr)
+            return 1
+
+        print('%s: %s bytes in %s blocks%s -> %s (%s bytes)' %
+              (filename, writer.size, len(writer.blocks),
+               ' + timing' if timing else '', output, writer.offset))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
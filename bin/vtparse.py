@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+# Copyright 2020 The Chromium OS Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Split terminal output into runs of plain text and escape sequences.
+
+This is a table-driven version of the DEC ANSI parser state machine described
+at https://vt100.net/emu/dec_ansi_parser, cut down to what we need to know
+where each chunk (a run of plain text, or a single escape sequence) starts &
+ends, and what kind of sequence it is.  It doesn't collect parameters or
+dispatch anything; see ../js/hterm_vt.js for the real thing.
+
+It differs from the DEC parser in the same ways hterm does:
+
+    * The data is UTF-8, so 8-bit C1 controls aren't recognized.
+    * BEL ends OSC, DCS, PM & APC strings as well as ST does.
+    * SOS (ESC X) isn't treated as the start of a string.
+    * ':' is a parameter byte in CSI sequences (for SGR subparameters).
+
+C0 controls in the middle of a sequence are part of its chunk, and CAN & SUB
+cancel a sequence (ending its chunk).  Plain text is everything else, controls
+included, up to the next ESC.
+
+The Tokenizer is fed data incrementally in buffers of any size, and sequences
+split across buffers are handled.  Runs of plain text, the contents of string
+sequences, and CSI parameters are skipped with a regex rather than a byte at a
+time, so the common cases are fast, and the whole thing is linear in the size
+of the data.
+
+Sample usage:
+
+    tokenizer = vtparse.Tokenizer()
+    for buf in bufs:
+        for (start, end, kind) in tokenizer.feed(buf):
+            print(start, end, vtparse.KINDS[kind])
+    for (start, end, kind) in tokenizer.finish():
+        ...
+"""
+
+import re
+
+
+# The chunk kinds.  Tokenizers report kinds as indexes into this.
+KINDS = (
+    # Plain text.
+    'TEXT',
+    # Control Sequence Introducers.
+    'CSI',
+    # Operating System Commands.
+    'OSC',
+    # Privacy Messages.
+    'PM',
+    # Device Control Strings.
+    'DCS',
+    # Application Program Control.
+    'APC',
+    # DEC private sequences (ESC #).
+    'DEC',
+    # Character set control (ESC %).
+    'CHR',
+    # Graphic character sets (ESC ( etc).
+    'SCS',
+    # Other escape sequences.
+    'ESC',
+    # A sequence cut off by the end of the data.
+    'UNKNOWN',
+)
+(TEXT, CSI, OSC, PM, DCS, APC, DEC, CHR, SCS, ESC, UNKNOWN) = range(len(KINDS))
+
+# The kind of an escape sequence, indexed by the byte following the ESC.
+INTRODUCERS = bytearray([ESC] * 256)
+for (_byte, _kind) in ((b'[', CSI), (b']', OSC), (b'^', PM), (b'P', DCS),
+                       (b'_', APC), (b'#', DEC), (b'%', CHR)):
+    INTRODUCERS[ord(_byte)] = _kind
+for _byte in b'()*+,-./':
+    INTRODUCERS[_byte] = SCS
+
+# The parser states.
+(GROUND, ESCAPE, ESCAPE_INTERMEDIATE, CSI_ENTRY, CSI_PARAM, CSI_INTERMEDIATE,
+ CSI_IGNORE, STRING, STRING_ESCAPE) = range(9)
+
+# What to do with the current chunk on each byte.  These are stored in the
+# high bits of the TABLE entries.
+# The byte is part of the current chunk.
+KEEP = 0
+# The byte starts a new chunk.
+BEGIN = 1 << 4
+# The byte is the last one of the current chunk.
+END = 2 << 4
+# The previous byte (an ESC inside a string) starts a new chunk, and this byte
+# has to be looked at again in the ESCAPE state.
+REWIND = 3 << 4
+
+# Bits of the TABLE entries holding the next state.
+STATE_MASK = 0xf
+
+# The bytes that make up the C0 controls we execute in the middle of
+# sequences, i.e. everything except CAN, SUB, & ESC.
+C0 = bytes(x for x in range(0x20) if x not in (0x18, 0x1a, 0x1b))
+
+
+def _make_table():
+    """Build the state transition table.
+
+    Returns:
+      A list of 256 byte long bytes objects, one per state.  Each entry has the
+      next state in the low bits, and the action in the high bits.
+    """
+    table = []
+
+    def _state(default):
+        """Add a state with every entry set to |default|."""
+        row = bytearray([default] * 256)
+        table.append(row)
+        return row
+
+    def _set(row, chars, entry):
+        """Set the entries in |row| for every byte in |chars|."""
+        for byte in chars:
+            row[byte] = entry
+
+    def _range(first, last):
+        """Return the bytes from |first| to |last| inclusive."""
+        return range(first, last + 1)
+
+    # Plain text runs until the next ESC.  Tokenizers use GROUND_SEARCH rather
+    # than this state, which is only here for completeness.
+    row = _state(GROUND)
+    row[0x1b] = ESCAPE | BEGIN
+
+    # The byte after an ESC says what kind of sequence this is.  We only get to
+    # stay here on C0 controls (and DEL), which are ignored.
+    row = _state(GROUND | END)
+    _set(row, C0 + b'\x7f', ESCAPE)
+    _set(row, _range(0x20, 0x2f), ESCAPE_INTERMEDIATE)
+    row[ord('[')] = CSI_ENTRY
+    _set(row, b']P^_', STRING)
+
+    # Any number of intermediates (e.g. ESC SP F), then a final byte.
+    row = _state(GROUND | END)
+    _set(row, C0 + b'\x7f', ESCAPE_INTERMEDIATE)
+    _set(row, _range(0x20, 0x2f), ESCAPE_INTERMEDIATE)
+
+    # CSI [private marker] params [intermediates] final.  Anything out of
+    # place (such as a marker after the params) makes us ignore everything up
+    # to the final byte.  Bytes outside of 7-bit ASCII abort the sequence.
+    row = _state(GROUND | END)
+    _set(row, C0 + b'\x7f', CSI_ENTRY)
+    _set(row, _range(0x20, 0x2f), CSI_INTERMEDIATE)
+    _set(row, _range(0x30, 0x3f), CSI_PARAM)
+
+    row = _state(GROUND | END)
+    _set(row, C0 + b'\x7f', CSI_PARAM)
+    _set(row, _range(0x20, 0x2f), CSI_INTERMEDIATE)
+    _set(row, _range(0x30, 0x3b), CSI_PARAM)
+    _set(row, _range(0x3c, 0x3f), CSI_IGNORE)
+
+    row = _state(GROUND | END)
+    _set(row, C0 + b'\x7f', CSI_INTERMEDIATE)
+    _set(row, _range(0x20, 0x2f), CSI_INTERMEDIATE)
+    _set(row, _range(0x30, 0x3f), CSI_IGNORE)
+
+    row = _state(GROUND | END)
+    _set(row, C0 + b'\x7f', CSI_IGNORE)
+    _set(row, _range(0x20, 0x3f), CSI_IGNORE)
+
+    # Strings run until BEL or ST (ESC \).  Any other ESC ends the string, and
+    # starts a new sequence.
+    row = _state(STRING)
+    row[0x07] = row[0x18] = row[0x1a] = GROUND | END
+    row[0x1b] = STRING_ESCAPE
+
+    row = _state(ESCAPE | REWIND)
+    row[ord('\\')] = GROUND | END
+
+    # CAN & SUB cancel the other sequences, and ESC starts a new one.
+    for row in table[ESCAPE:STRING]:
+        row[0x18] = row[0x1a] = GROUND | END
+        row[0x1b] = ESCAPE | BEGIN
+
+    return [bytes(x) for x in table]
+
+
+TABLE = _make_table()
+
+
+def _make_skips():
+    """Build the regexes for skipping runs of bytes that don't do anything.
+
+    Returns:
+      A list of the search functions, indexed by state, which find the next
+      byte that does something interesting.  States where sequences are
+      usually short enough that it's not worth it get None.
+    """
+    skips = [None] * len(TABLE)
+    for state in (CSI_PARAM, CSI_IGNORE, STRING):
+        stops = b''.join(re.escape(bytes([x])) for x in range(256)
+                         if TABLE[state][x] != state)
+        skips[state] = re.compile(b'[%s]' % (stops,)).search
+    return skips
+
+
+SKIPS = _make_skips()
+
+# Finds the end of a run of plain text: the next ESC, along with the rest of
+# the sequence if it's a CSI with no controls in it (which is almost all of
+# them).  Any path through the CSI states for those bytes ends at the final
+# byte, so we can skip straight there.
+GROUND_SEARCH = re.compile(rb'\x1b(\[[0-?]*[ -/]*[@-~])?').search
+
+
+class Tokenizer:
+    """Incrementally split data into chunks.
+
+    Chunks are reported as (start, end, kind) tuples, where the offsets are
+    from the start of all the data fed so far, and the kind is an index into
+    KINDS.  Chunks are contiguous, and are only reported once they're
+    complete, so a run of plain text split across buffers still comes out as
+    a single chunk.
+    """
+
+    def __init__(self):
+        # The parser state.
+        self.state = GROUND
+
+        # The offset of the start of the next buffer.
+        self.offset = 0
+
+        # Where the current (incomplete) chunk starts, and what kind it is.
+        self.start = 0
+        self.kind = TEXT
+
+    def feed(self, data):
+        """Tokenize the next buffer of data.
+
+        Args:
+          data: The data, as a bytes-like object.
+
+        Returns:
+          A list of the chunks completed by this data.
+        """
+        chunks = []
+        table = TABLE
+        skips = SKIPS
+        ground_search = GROUND_SEARCH
+        state = self.state
+        start = self.start
+        kind = self.kind
+        base = self.offset
+
+        pos = 0
+        end = len(data)
+        while pos < end:
+            if state == GROUND:
+                m = ground_search(data, pos)
+                if not m:
+                    break
+                offset = base + m.start()
+                if start < offset:
+                    chunks.append((start, offset, kind))
+                start = offset
+                pos = m.end()
+                if m.lastindex:
+                    offset = base + pos
+                    chunks.append((start, offset, CSI))
+                    start = offset
+                else:
+                    kind = ESC
+                    state = ESCAPE
+                continue
+
+            skip = skips[state]
+            if skip:
+                m = skip(data, pos)
+                if not m:
+                    break
+                pos = m.start()
+
+            byte = data[pos]
+            entry = table[state][byte]
+            if state == ESCAPE:
+                kind = INTRODUCERS[byte]
+            state = entry & STATE_MASK
+
+            action = entry & ~STATE_MASK
+            if action == END:
+                offset = base + pos + 1
+                chunks.append((start, offset, kind))
+                start = offset
+                kind = TEXT
+            elif action == BEGIN:
+                offset = base + pos
+                if start < offset:
+                    chunks.append((start, offset, kind))
+                start = offset
+                kind = ESC
+            elif action == REWIND:
+                offset = base + pos - 1
+                if start < offset:
+                    chunks.append((start, offset, kind))
+                start = offset
+                kind = ESC
+                continue
+
+            pos += 1
+
+        self.state = state
+        self.start = start
+        self.kind = kind
+        self.offset = base + end
+        return chunks
+
+    def flush(self):
+        """Report the plain text fed so far without waiting for more.
+
+        A run of plain text is normally only reported once something ends it,
+        in case the next buffer carries on with it.  This is for callers that
+        have to act on everything as soon as it's fed.
+
+        Returns:
+          A list of the pending chunk of plain text, if there is one.
+        """
+        if self.state != GROUND or self.start == self.offset:
+            return []
+        chunk = (self.start, self.offset, TEXT)
+        self.start = self.offset
+        return [chunk]
+
+    def finish(self):
+        """Flush out the last chunk at the end of the data.
+
+        A sequence that hasn't been terminated by now is reported as UNKNOWN.
+        The tokenizer is then ready for new data, starting at offset 0.
+
+        Returns:
+          A list of the remaining chunks.
+        """
+        chunks = []
+        if self.start < self.offset:
+            kind = self.kind if self.state == GROUND else UNKNOWN
+            chunks.append((self.start, self.offset, kind))
+        self.__init__()
+        return chunks
+
+
+def tokenize(data, buffer_size=1024 * 1024):
+    """Tokenize a complete blob of data.
+
+    The data is fed to a Tokenizer a buffer at a time, so the chunks are
+    generated as we go rather than all being held in memory at once.
+
+    Args:
+      data: The data, as a bytes-like object.
+      buffer_size: How much data to feed at a time.
+
+    Yields:
+      The (start, end, kind) of each chunk.
+    """
+    view = memoryview(data)
+    tokenizer = Tokenizer()
+    for pos in range(0, len(view), buffer_size):
+        yield from tokenizer.feed(view[pos : pos + buffer_size])
+    yield from tokenizer.finish()
+
+
+def count_sequences(chunks):
+    """Count the escape sequences in some chunks."""
+    return sum(1 for (_, _, kind) in chunks if kind != TEXT)
@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+# Copyright 2020 The Chromium OS Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Record a terminal session for playback with vtscope.py.
+
+This runs a command (your shell by default) under a new pty and records
+everything it writes, like `script` does.  The output is written in the canned
+session format (see ../js/hterm_vt_canned_tests.js), along with a timing file
+(in the `script -t` format) next to it, so vtscope.py can replay the session at
+its original pace.
+
+Press the checkpoint key (Ctrl-] by default; it isn't passed on to the command)
+or send the recorder a SIGUSR1 to drop a checkpoint at the current offset.  The
+cursor position is read back from your terminal and recorded in the header
+(with LINES:0 since we don't know what's on the screen).  If it can't be read
+(e.g. stdin isn't a terminal), the checkpoint is written as an '# OFFSET:'
+comment instead.  Either way, `vtscreen.py -o` fills them in.
+
+Recording is meant to be cheap enough for real workloads (build logs, top,
+editors...): output is read in large blocks and written to disk through a big
+buffer, with no per-byte processing.  Space for the header is reserved at the
+start of the file, so the output is only written once, and the session & timing
+file are written to temp files and renamed into place at the end.
+
+Sample usage:
+
+    ./vtrecord.py -o /tmp/build.log -- make -j32
+    ./vtscope.py --clients 1 --play --pace real /tmp/build.log
+"""
+
+import argparse
+import contextlib
+import errno
+import fcntl
+import os
+import pty
+import re
+import select
+import shutil
+import signal
+import struct
+import sys
+import termios
+import time
+import tty
+
+
+# Same as vtscope.py.
+TIMING_SUFFIX = '.timing'
+
+# How much to read from the pty at once.
+READ_SIZE = 64 * 1024
+
+# How much to buffer before writing to disk.
+WRITE_BUFFER = 1024 * 1024
+
+# Space reserved for the header at the start of the file.  That's enough for
+# over a thousand checkpoints; if there are more, the data is copied after a
+# bigger header.
+HEADER_RESERVE = 64 * 1024
+
+# How long to wait for the terminal to report the cursor position.
+CPR_TIMEOUT = 1.0
+
+# Ask the terminal where the cursor is (DSR), and its reply (CPR).
+CPR_REQUEST = b'\x1b[6n'
+CPR_REPLY_RE = re.compile(rb'\x1b\[(\d+);(\d+)R')
+
+# Keeps emacs from munging the escape sequences (see ../doc/hack.md).
+CODING_LINE = b'# -*- coding: no-conversion -*-\n'
+
+
+def parse_key(key):
+    """Parse a key like ^] into the byte it sends."""
+    if len(key) == 2 and key[0] == '^':
+        return bytes([ord(key[1].upper()) ^ 0x40])
+    if len(key) == 1:
+        return key.encode('utf-8')
+    raise ValueError('invalid key: %s' % (key,))
+
+
+def write_all(fd, data):
+    """Write all of |data| to |fd|."""
+    while data:
+        data = data[os.write(fd, data):]
+
+
+class Recorder:
+    """Run a command under a pty and record its output."""
+
+    def __init__(self, filename, command, checkpoint_key, timing=True):
+        """Initialize.
+
+        Args:
+          filename: The canned session to write.
+          command: The command (argv) to run.
+          checkpoint_key: The byte that drops a checkpoint.
+          timing: Whether to write a timing file.
+        """
+        self.filename = filename
+        self.command = command
+        self.checkpoint_key = checkpoint_key
+        self.timing = timing
+
+        # Bytes of output recorded so far.
+        self.offset = 0
+        # Number of reads from the pty.
+        self.writes = 0
+        # (offset, row, column) of each checkpoint; row & column are None if
+        # the terminal didn't tell us.
+        self.checkpoints = []
+        # The offset of a checkpoint waiting on the cursor position, and when
+        # to give up waiting.
+        self.pending = None
+        self.pending_deadline = 0
+        self.size = None
+        self.duration = 0.0
+
+        (self.wakeup_read, self.wakeup_write) = os.pipe()
+        self.signals = []
+
+    def get_size(self):
+        """Get the size of our terminal as a winsize struct."""
+        try:
+            return fcntl.ioctl(sys.stdout.fileno(), termios.TIOCGWINSZ,
+                               b'\0' * 8)
+        except OSError:
+            return None
+
+    def on_signal(self, signum, _frame):
+        """Queue signals to handle in the main loop."""
+        self.signals.append(signum)
+        os.write(self.wakeup_write, b'\0')
+
+    def checkpoint(self):
+        """Start a checkpoint at the current offset."""
+        if self.pending is not None:
+            self.finish_checkpoint()
+        if os.isatty(sys.stdout.fileno()) and os.isatty(sys.stdin.fileno()):
+            # Everything up to the offset has been written to the terminal,
+            # so its answer reflects the state at the offset.
+            self.pending = self.offset
+            self.pending_deadline = time.monotonic() + CPR_TIMEOUT
+            write_all(sys.stdout.fileno(), CPR_REQUEST)
+        else:
+            self.checkpoints.append((self.offset, None, None))
+
+    def finish_checkpoint(self, row=None, column=None):
+        """Record the pending checkpoint."""
+        self.checkpoints.append((self.pending, row, column))
+        self.pending = None
+
+    def filter_input(self, data):
+        """Handle the checkpoint key & cursor reports in user input.
+
+        Returns:
+          The data to pass on to the command.
+        """
+        if self.pending is not None:
+            m = CPR_REPLY_RE.search(data)
+            if m:
+                self.finish_checkpoint(int(m.group(1)) - 1, int(m.group(2)) - 1)
+                data = data[:m.start()] + data[m.end():]
+
+        if self.checkpoint_key in data:
+            for _ in range(data.count(self.checkpoint_key)):
+                self.checkpoint()
+            data = data.replace(self.checkpoint_key, b'')
+        return data
+
+    def run(self):
+        """Run the command & record it.
+
+        Returns:
+          The exit status of the command.
+        """
+        self.size = self.get_size()
+        (pid, master) = pty.fork()
+        if pid == 0:
+            if self.size:
+                fcntl.ioctl(sys.stdout.fileno(), termios.TIOCSWINSZ, self.size)
+            try:
+                os.execvp(self.command[0], self.command)
+            except OSError as e:
+                print('%s: %s' % (self.command[0], e), file=sys.stderr)
+            os._exit(127)
+
+        if self.size:
+            fcntl.ioctl(master, termios.TIOCSWINSZ, self.size)
+
+        stdin = sys.stdin.fileno()
+        old_attrs = None
+        if os.isatty(stdin):
+            old_attrs = termios.tcgetattr(stdin)
+            tty.setraw(stdin)
+
+        signal.signal(signal.SIGWINCH, self.on_signal)
+        signal.signal(signal.SIGUSR1, self.on_signal)
+
+        data_file = '%s.%d.tmp' % (self.filename, os.getpid())
+        timing_file = None
+        if self.timing:
+            timing_file = '%s.%d.tmp' % (self.filename + TIMING_SUFFIX,
+                                         os.getpid())
+        try:
+            try:
+                with contextlib.ExitStack() as stack:
+                    data = stack.enter_context(
+                        open(data_file, 'wb', buffering=WRITE_BUFFER))
+                    # The header is filled in once we know the checkpoints.
+                    data.seek(HEADER_RESERVE)
+                    timing = None
+                    if timing_file:
+                        timing = stack.enter_context(
+                            open(timing_file, 'w', buffering=WRITE_BUFFER))
+                    self.record(master, data, timing)
+            finally:
+                if old_attrs:
+                    termios.tcsetattr(stdin, termios.TCSAFLUSH, old_attrs)
+                signal.signal(signal.SIGWINCH, signal.SIG_DFL)
+                signal.signal(signal.SIGUSR1, signal.SIG_DFL)
+                os.close(master)
+
+            self.write_session(data_file)
+            if timing_file:
+                os.replace(timing_file, self.filename + TIMING_SUFFIX)
+        finally:
+            for path in (data_file, timing_file):
+                if path and os.path.exists(path):
+                    os.unlink(path)
+
+        (_, status) = os.waitpid(pid, 0)
+        return os.waitstatus_to_exitcode(status)
+
+    def record(self, master, data, timing):
+        """Shuffle data between the user & the command until it exits."""
+        stdin = sys.stdin.fileno()
+        stdout = sys.stdout.fileno()
+        inputs = [master, stdin, self.wakeup_read]
+        start = last = time.monotonic()
+
+        while True:
+            timeout = None
+            if self.pending is not None:
+                timeout = max(0, self.pending_deadline - time.monotonic())
+            (readable, _, _) = select.select(inputs, [], [], timeout)
+
+            if self.pending is not None and (
+                    time.monotonic() >= self.pending_deadline):
+                self.finish_checkpoint()
+
+            if self.wakeup_read in readable:
+                os.read(self.wakeup_read, 1024)
+                for signum in self.signals:
+                    if signum == signal.SIGWINCH:
+                        self.size = self.get_size()
+                        if self.size:
+                            fcntl.ioctl(master, termios.TIOCSWINSZ, self.size)
+                    elif signum == signal.SIGUSR1:
+                        self.checkpoint()
+                self.signals = []
+
+            if stdin in readable:
+                buf = os.read(stdin, READ_SIZE)
+                if buf:
+                    buf = self.filter_input(buf)
+                    if buf:
+                        write_all(master, buf)
+                else:
+                    # No more input; let the command carry on.
+                    inputs.remove(stdin)
+
+            if master in readable:
+                try:
+                    buf = os.read(master, READ_SIZE)
+                except OSError as e:
+                    # Linux reports EIO once the command has exited.
+                    if e.errno != errno.EIO:
+                        raise
+                    buf = b''
+                if not buf:
+                    break
+
+                now = time.monotonic()
+                data.write(buf)
+                if timing:
+                    timing.write('%.6f %d\n' % (now - last, len(buf)))
+                last = now
+                self.offset += len(buf)
+                self.writes += 1
+                write_all(stdout, buf)
+
+        if self.pending is not None:
+            self.finish_checkpoint()
+        self.duration = last - start
+
+    def get_header(self, size=None):
+        """Get the canned session header.
+
+        Args:
+          size: If set, pad the header to this size if we can.
+        """
+        header = [CODING_LINE]
+        header.append(b'# Recorded by vtrecord.py: %s\n' % (
+            ' '.join(self.command).encode('utf-8', 'replace'),))
+        if self.size:
+            (rows, columns, _, _) = struct.unpack('HHHH', self.size)
+            if rows and columns:
+                header.append(b'# Terminal size: %dx%d\n' % (columns, rows))
+        header.append(b'@@ HEADER_START\n')
+        for (offset, row, column) in self.checkpoints:
+            if row is None:
+                header.append(b'# OFFSET:%d (cursor position unknown)\n' %
+                              (offset,))
+            else:
+                header.append(b'@@ OFFSET:%d LINES:0 CURSOR:%d,%d\n' %
+                              (offset, row, column))
+        header.append(b'@@ HEADER_END\n')
+
+        # Pad with a comment (or a blank line), which readers skip.
+        padding = (size or 0) - sum(len(x) for x in header)
+        if padding == 1:
+            header.insert(-1, b'\n')
+        elif padding > 1:
+            header.insert(-1, b'#' + b' ' * (padding - 2) + b'\n')
+        return b''.join(header)
+
+    def write_session(self, data_file):
+        """Fill in the header of the recorded data, and move it into place.
+
+        Args:
+          data_file: The recording, with HEADER_RESERVE bytes left for the
+              header.
+        """
+        header = self.get_header(HEADER_RESERVE)
+        if len(header) == HEADER_RESERVE:
+            with open(data_file, 'r+b') as out:
+                out.write(header)
+            os.replace(data_file, self.filename)
+            return
+
+        # Too many checkpoints to fit, so copy the data after the header.
+        tmp = '%s.%d.session.tmp' % (self.filename, os.getpid())
+        try:
+            with open(tmp, 'wb') as out:
+                out.write(header)
+                with open(data_file, 'rb') as data:
+                    data.seek(HEADER_RESERVE)
+                    shutil.copyfileobj(data, out, WRITE_BUFFER)
+            os.replace(tmp, self.filename)
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+
+
+def get_parser():
+    """Get a command line parser."""
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-o', '--output', default='vtrecord.log',
+                        help='File to write. (default: %(default)s)')
+    parser.add_argument('--checkpoint-key', default='^]',
+                        help='Key that drops a checkpoint. '
+                             '(default: %(default)s)')
+    parser.add_argument('--no-timing', dest='timing', action='store_false',
+                        help="Don't write a timing file.")
+    parser.add_argument('command', nargs=argparse.REMAINDER,
+                        help='Command to run. (default: $SHELL)')
+    return parser
+
+
+def main(argv):
+    """The main func!"""
+    parser = get_parser()
+    opts = parser.parse_args(argv)
+
+    command = opts.command
+    if command and command[0] == '--':
+        command = command[1:]
+    if not command:
+        command = [os.environ.get('SHELL', '/bin/sh')]
+
+    try:
+        key = parse_key(opts.checkpoint_key)
+    except ValueError as e:
+        parser.error(e)
+
+    recorder = Recorder(opts.output, command, key, timing=opts.timing)
+    status = recorder.run()
+
+    print('Recorded %d bytes in %d writes over %.3fs to %s, '
+          '%d checkpoint(s).' % (
+              recorder.offset, recorder.writes, recorder.duration,
+              opts.output, len(recorder.checkpoints)),
+          file=sys.stderr)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
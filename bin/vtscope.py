@@ -17,11 +17,32 @@ happens.
 
 You can connect multiple destination terminals to the scope, in order to A/B
 test a known-good terminal with one under development.  Clients connect over a
-TCP socket to port 8383.  VT Scope only listens on the local 127.0.0.1
-interface.
+TCP socket to port 8383.  Browser based terminals like hterm can connect
+directly to a WebSocket on port 8384 instead, and get the data in large binary
+messages (see ../html/hterm.html).  VT Scope only listens on the local
+127.0.0.1 interface, plus a Unix socket if one is given with --unix.
+
+Clients can connect at any time, even while you're at the prompt.  The
+'catchup' command makes vtscope send late joiners everything that has been
+played so far, so they start out in the same state as everyone else.
+
+Each client has its own bounded output queue, and is only written to when it
+can take more data, so a slow terminal doesn't hold up the others.  The
+'policy' command controls what happens when a client falls too far behind.
 
 Canned VT sessions can be created by enabling logging in xterm.
 
+The 'play' command streams the data to the clients in large batches, either as
+fast as they will take it or paced to match the original session.  Pacing uses
+a timing file in the format written by `script -t`, which is loaded from
+<file>.timing automatically when you open <file>, or by the 'timing' command.
+
+The canned data is treated as a raw byte stream.  Files are memory-mapped
+rather than read in, and data is sent to clients straight out of the mapping,
+so even very large recordings can be opened without copying them around.
+Recordings can also be packed into seekable compressed files with vtpack.py,
+which are decompressed a block at a time as they're played.
+
 Sample usage looks like this:
 
     # Open a can of data...
@@ -30,11 +51,10 @@ Sample usage looks like this:
 
     # When the next chunk of data is plain text, the offset, byte count,
     # and first 15 bytes are displayed...
-    Next up: offset 0, 19 chars: "# 20120103.1540..."
+    Next up: offset 0, 19 bytes: "# 20120103.1540..."
 
     # Wait for two clients...
     vtscope> accept 2
-    Listening on 127.0.0.1:8383
     Waiting for client 1/2...
 
     # At this point, open an xterm and type 'nc 127.0.0.1 8383', then open
@@ -62,12 +82,11 @@ Sample usage looks like this:
 
     # Start from the beginning of the data...
     vtscope> reset
-    Next up: offset 0, 19 chars: "# 20120103.1540..."
+    Next up: offset 0, 19 bytes: "# 20120103.1540..."
 
-    # Seek directly to an offset, reset first if necessary...
+    # Seek directly to an offset, reset first if necessary.  Everything up to
+    # the chunk containing the offset is sent in one go...
     vtscope> seek 73
-    Next up: offset 19, ESC [ 0 c
-    ...
     Next up: offset 73, ESC [ 0 m
 
     # Exit vtscope.  Pressing Ctrl+D on a blank line works too.
@@ -75,72 +94,1907 @@ Sample usage looks like this:
 
 Check the comments in the "cmd_*" methods below for details about specific
 commands.
+
+VT Scope can also run without the REPL, to benchmark terminals in scripts.  For
+example, this waits for two clients, plays the whole file to them as fast as
+they will take it, and writes a JSON timing report to stdout:
+
+    $ ./vtscope.py --clients 2 --play ../test_data/vttest-01.log
+
+Similarly, this writes a JSON report of the 'stats' command for a file:
+
+    $ ./vtscope.py --stats ../test_data/vttest-01.log
+
+To find where a terminal under development goes wrong, connect it and a
+known-good terminal, and have vtscope compare their screens at each header stop
+(or every N escape sequences).  When they differ, vtscope bisects to the first
+chunk of data after which they disagree:
+
+    $ ./vtscope.py --clients 2 --compare ../test_data/vttest-01.log
+
+This relies on the terminals answering checksum (DECRQCRA) and cursor position
+(DSR) requests through the connection; see the 'compare' command for details.
+hterm only answers checksum requests with the enable-checksum-report
+preference set, which ../html/hterm.html?vtscope=... does for you.
+
+Queries can also measure how far behind a terminal falls under heavy output.
+This slips a cursor position request into the data every 64KiB, and adds the
+latency percentiles of each client's answers, and a trace of their progress
+through the data over time, to the report:
+
+    $ ./vtscope.py --clients 2 --play --probe 65536 ../test_data/vttest-01.log
+
+For load testing lots of terminals at once, --serve runs a server where every
+client that connects picks one of the given recordings (and a pace) from a
+menu, and gets its own independent replay of it:
+
+    $ ./vtscope.py --serve --pace real ../test_data/*.log
 """
 
 import argparse
+import array
+import asyncio
 import atexit
+import base64
+import bisect
+import collections
+import contextlib
+import hashlib
+import heapq
 import traceback
 import json
+import mmap
 import os
 import re
 import readline
+import selectors
 import socket
+import stat
+import struct
 import sys
+import threading
 import time
 
+import vtpack
+import vtparse
+
 
 HISTFILE = os.path.expanduser('~/.vtscope_history')
 LISTEN_HOST = '127.0.0.1'
 LISTEN_PORT = 8383
+WEBSOCKET_PORT = 8384
 PROMPT = 'vtscope> '
 MAX_TEXT = 15
 
+# How many bytes may be queued up for a single client before the slow client
+# policy kicks in.
+QUEUE_LIMIT = 1024 * 1024
+
+# How long (in seconds) clients get to drain their queues before the slow
+# client policy kicks in, unless the policy is to block.
+FLUSH_TIMEOUT = 1.0
+
+# How much data to read at a time from clients.
+READ_SIZE = 4096
+
+# How much canned data to tokenize at a time.
+TOKENIZE_SIZE = 1024 * 1024
+
+# The largest amount of canned data sent in one go during playback.
+BATCH_SIZE = 64 * 1024
+
+# The suffix of timing files that go along with canned data files.
+TIMING_SUFFIX = '.timing'
+
+# The first line the `script` command writes to its output.
+SCRIPT_STARTED = b'Script started on '
+
+# How many entries to show in each of the 'stats' top lists.
+STATS_TOP = 10
+
+# Escape sequences longer than this are only counted by function in 'stats'.
+STATS_MAX_SEQUENCE = 32
+
+# How many connections may be waiting to be accepted in --serve mode.
+SERVER_BACKLOG = 128
+
+# How long (in seconds) clients get to answer a screen report request.
+REPORT_TIMEOUT = 5.0
+
+# The most input we keep from a client while waiting for it to answer.
+INPUT_LIMIT = 1024 * 1024
+
+# The largest WebSocket opening handshake we accept from a client.
+HANDSHAKE_LIMIT = 16 * 1024
+
+# The key the WebSocket opening handshake is answered with (RFC 6455).
+WEBSOCKET_GUID = b'258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+# WebSocket frame opcodes.
+WS_CONTINUATION = 0x0
+WS_TEXT = 0x1
+WS_BINARY = 0x2
+WS_CLOSE = 0x8
+WS_PING = 0x9
+WS_PONG = 0xa
+
+# The size of the screen compared between clients (same as the canned tests).
+SCREEN_COLUMNS = 80
+SCREEN_ROWS = 25
+
+# Matches the answers to screen_query(): a checksum report (the answer to
+# DECRQCRA) and a cursor position report (CPR).
+CHECKSUM_RE = re.compile(rb'\x1bP(\d+)!~([0-9A-Fa-f]{4})\x1b\\')
+CPR_RE = re.compile(rb'\x1b\[(\d+);(\d+)R')
+
+# The queries that can be used as latency probes: the query itself, a regex for
+# its answer, and a regex for the same query turning up in the canned data.
+PROBE_QUERIES = {
+    # Device Attributes (DA).
+    'da': (b'\x1b[c', re.compile(rb'\x1b\[\?[0-9;]*c'),
+           re.compile(rb'\x1b\[0?c')),
+    # Device Status Report (DSR), asking for the cursor position.
+    'dsr': (b'\x1b[6n', CPR_RE, re.compile(rb'\x1b\[6n')),
+}
+
+
+def decode(data):
+    """Decode a slice of canned data for display to the user."""
+    return str(data, 'utf-8', 'backslashreplace')
+
+
+def load_data(filename):
+    """Load a canned data file as a memoryview.
+
+    Regular files are memory-mapped so the data is paged in on demand and never
+    copied.  Empty files and things like pipes can't be mapped, so those are
+    read in instead.
+    """
+    with open(filename, 'rb') as f:
+        try:
+            return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        except (ValueError, OSError):
+            return memoryview(f.read())
+
+
+class ChunkIndex:
+    """An index of the chunks in a blob of canned data.
+
+    A chunk is either a run of plain text or a single escape sequence (see
+    vtparse.py).  The data is tokenized in a single pass when the index is
+    created, so stepping and seeking afterwards are simple lookups.
+
+    Chunks are contiguous, so we only store the start offset of each one (plus a
+    trailing sentinel at the end of the data) and derive the end offset from the
+    start of the next chunk.  Offsets and kinds are kept in flat arrays rather
+    than lists of objects to keep the index small for large recordings.
+    """
+
+    # Kind used for plain text runs.
+    TEXT = vtparse.TEXT
+
+    # The kind names, indexed by the numbers stored in |kinds|.
+    names = vtparse.KINDS
+
+    def __init__(self, data):
+        """Tokenize |data|.
+
+        Args:
+          data: The canned data to index, as a memoryview or vtpack.Reader.
+        """
+        self.starts = array.array('Q')
+        self.kinds = array.array('B')
+
+        tokenizer = vtparse.Tokenizer()
+        for pos in range(0, len(data), TOKENIZE_SIZE):
+            self._add(tokenizer.feed(data[pos : pos + TOKENIZE_SIZE]))
+        self._add(tokenizer.finish())
+
+        # Sentinel so the end of the last chunk can be looked up like any other.
+        self.starts.append(len(data))
+
+    def _add(self, chunks):
+        """Add the chunks found by the tokenizer to the index."""
+        self.starts.extend(start for (start, _, _) in chunks)
+        self.kinds.extend(kind for (_, _, kind) in chunks)
+
+    def __len__(self):
+        """Return the number of chunks."""
+        return len(self.kinds)
+
+    def start(self, index):
+        """Return the start offset of chunk |index|."""
+        return self.starts[index]
+
+    def end(self, index):
+        """Return the end offset of chunk |index|."""
+        return self.starts[index + 1]
+
+    def kind(self, index):
+        """Return the kind name of chunk |index|."""
+        return self.names[self.kinds[index]]
+
+    def find(self, position):
+        """Return the index of the chunk containing |position|.
+
+        Positions at (or past) the end of the data return len(self).
+        """
+        return min(bisect.bisect_right(self.starts, position) - 1, len(self))
+
+    def count_sequences(self, start, end):
+        """Return the number of escape sequences starting in [start, end)."""
+        kinds = self.kinds[bisect.bisect_left(self.starts, start) :
+                           bisect.bisect_left(self.starts, end)]
+        return len(kinds) - kinds.count(self.TEXT)
+
+
+class Timing:
+    """When each part of the canned data was originally written.
+
+    This is loaded from a timing file as written by `script -t` (see
+    vtpack.parse_timing() for the formats), or from a pack.  Each write by the
+    recorded program has a delay relative to the previous write, and a size.
+
+    We keep the running totals in parallel arrays: the offset at the end of
+    each write, and the time (in seconds from the start) it was made.
+    """
+
+    def __init__(self, writes, base=0):
+        """Initialize from a list of writes.
+
+        Args:
+          writes: The (delay, byte-count) of each write.
+          base: The offset in the canned data of the first byte the timing
+              accounts for.
+        """
+        self.offsets = array.array('Q')
+        self.times = array.array('d')
+
+        offset = base
+        now = 0.0
+        for (delay, count) in writes:
+            now += delay
+            offset += count
+            self.times.append(now)
+            self.offsets.append(offset)
+
+    @classmethod
+    def load(cls, filename, base=0):
+        """Load a timing file."""
+        with open(filename) as f:
+            return cls(vtpack.parse_timing(f), base)
+
+    def __len__(self):
+        """Return the number of writes."""
+        return len(self.offsets)
+
+    def duration(self):
+        """Return the time of the last write."""
+        return self.times[-1] if self.times else 0.0
+
+    def time_at(self, position):
+        """Return the time at which everything before |position| was written."""
+        index = bisect.bisect_right(self.offsets, position) - 1
+        return self.times[index] if index >= 0 else 0.0
+
+    def next_time(self, position):
+        """Return the time at which the data at |position| was written.
+
+        Returns None if the timing data doesn't reach that far.
+        """
+        index = bisect.bisect_right(self.offsets, position)
+        return self.times[index] if index < len(self.times) else None
+
+    def offset_at(self, when):
+        """Return the offset of everything written by time |when|."""
+        index = bisect.bisect_right(self.times, when) - 1
+        return self.offsets[index] if index >= 0 else 0
+
+
+class StopTable:
+    """The OFFSET stops defined in the header of canned data.
+
+    Each stop is a place where we might want to stop and view the current
+    state, along with the number of significant lines and the expected cursor
+    position there.  The fields are kept in parallel arrays, sorted by offset,
+    so big tables stay small and can be searched with bisect.
+    """
+
+    # Matches the interesting lines of a header: the OFFSET lines, and the line
+    # that ends the header.
+    LINE_RE = re.compile(
+        rb'^@@\s+(?:OFFSET:(\d+)\s+LINES:(\d+)\s+CURSOR:(\d+),(\d+)\s*$|'
+        rb'HEADER_END\r?\n)',
+        re.MULTILINE)
+
+    NEWLINE_RE = re.compile(rb'\n')
+
+    def __init__(self):
+        self.offsets = array.array('Q')
+        self.lines = array.array('L')
+        self.rows = array.array('L')
+        self.columns = array.array('L')
+
+        # Where the expected lines for each stop start in the header.
+        self.text_starts = array.array('Q')
+
+    @classmethod
+    def scan(cls, data, pos=0):
+        """Scan a header for stops in a single pass.
+
+        Args:
+          data: The canned data.
+          pos: Where the header starts in |data|.
+
+        Returns:
+          A (StopTable, end) tuple, where end is the offset just past the
+          '@@ HEADER_END' line, or None if the header never ends.
+        """
+        stops = cls()
+        end = None
+        for m in cls.LINE_RE.finditer(data, pos):
+            if m.group(1) is None:
+                end = m.end()
+                break
+
+            stops.offsets.append(int(m.group(1)))
+            stops.lines.append(int(m.group(2)))
+            stops.rows.append(int(m.group(3)))
+            stops.columns.append(int(m.group(4)))
+
+            # The trailing \s* might have eaten blank lines that are part of
+            # the expected text, so find the end of the OFFSET line itself.
+            newline = cls.NEWLINE_RE.search(data, m.start())
+            stops.text_starts.append(newline.end() if newline else len(data))
+
+        stops.sort()
+        return (stops, end)
+
+    def sort(self):
+        """Sort the stops by offset, if they aren't already."""
+        if all(self.offsets[i] <= self.offsets[i + 1]
+               for i in range(len(self) - 1)):
+            return
+
+        order = sorted(range(len(self)), key=self.offsets.__getitem__)
+        for name in ('offsets', 'lines', 'rows', 'columns', 'text_starts'):
+            column = getattr(self, name)
+            setattr(self, name,
+                    array.array(column.typecode, (column[i] for i in order)))
+
+    def __len__(self):
+        """Return the number of stops."""
+        return len(self.offsets)
+
+    def __getitem__(self, index):
+        """Return stop |index| as a dict."""
+        return {
+            'offset': self.offsets[index],
+            'lines': self.lines[index],
+            'row': self.rows[index],
+            'column': self.columns[index],
+        }
+
+    def expected_lines(self, header, index):
+        """Return the expected lines of text at stop |index|.
+
+        Args:
+          header: The data that was passed to scan().
+          index: The stop to look up.
+
+        Returns:
+          A list of the lines, as bytes.
+        """
+        lines = []
+        pos = self.text_starts[index]
+        for _ in range(self.lines[index]):
+            newline = self.NEWLINE_RE.search(header, pos)
+            end = newline.start() if newline else len(header)
+            lines.append(bytes(header[pos:end]).rstrip(b'\r'))
+            if not newline:
+                break
+            pos = newline.end()
+        return lines
+
+    def next_after(self, position):
+        """Return the index of the first stop after |position|, or None."""
+        index = bisect.bisect_right(self.offsets, position)
+        return index if index < len(self) else None
+
+    def previous_before(self, position):
+        """Return the index of the last stop before |position|, or None."""
+        index = bisect.bisect_left(self.offsets, position) - 1
+        return index if index >= 0 else None
+
+
+def repaint_stream(lines, row, column):
+    """Return data that recreates a screen on a freshly reset terminal.
+
+    Args:
+      lines: The text on each row of the screen, as bytes.
+      row: The 0-based row of the cursor.
+      column: The 0-based column of the cursor.
+    """
+    data = [b'\x1bc']
+    for (i, line) in enumerate(lines):
+        if line:
+            data.append(b'\x1b[%d;1H%s' % (i + 1, line))
+    data.append(b'\x1b[%d;%dH' % (row + 1, column + 1))
+    return b''.join(data)
+
+
+class Checkpoints:
+    """Places in the canned data where the terminal state is known.
+
+    Each checkpoint holds a repaint stream (see repaint_stream()) that puts a
+    freshly reset terminal into the state it would be in after playing the data
+    up to the checkpoint offset.  Seeking can then send one screen's worth of
+    data rather than the whole history.
+    """
+
+    def __init__(self):
+        self.offsets = array.array('Q')
+        self.repaints = []
+
+    @classmethod
+    def from_stops(cls, stops, header):
+        """Create checkpoints at the stops defined in a header.
+
+        Args:
+          stops: The StopTable from the header.
+          header: The data that was passed to StopTable.scan().
+        """
+        checkpoints = cls()
+        for i in range(len(stops)):
+            # Stops without any lines (e.g. from vtrecord.py) only know where
+            # the cursor is, which isn't enough to repaint the screen.
+            if not stops.lines[i]:
+                continue
+            checkpoints.add(stops.offsets[i], repaint_stream(
+                stops.expected_lines(header, i), stops.rows[i],
+                stops.columns[i]))
+        return checkpoints
+
+    def __len__(self):
+        """Return the number of checkpoints."""
+        return len(self.offsets)
+
+    def add(self, offset, repaint):
+        """Add a checkpoint.  They must be added in order of offset."""
+        self.offsets.append(offset)
+        self.repaints.append(repaint)
+
+    def find(self, position):
+        """Return the index of the last checkpoint at or before |position|.
+
+        Returns None if there isn't one.
+        """
+        index = bisect.bisect_right(self.offsets, position) - 1
+        return index if index >= 0 else None
+
+
+def timing_base(data):
+    """Return the offset in canned data that timing files start from.
+
+    The `script` command writes a line at the start of the data that isn't
+    accounted for in its timing file.
+    """
+    if data[:len(SCRIPT_STARTED)] == SCRIPT_STARTED:
+        # The line is short, so there's no need to look far for its end.
+        return bytes(data[:READ_SIZE]).find(b'\n') + 1
+    return 0
+
+
+def playback_steps(start, end, batch_size, timing=None, speed=1.0):
+    """Work out how to pace playback of canned data.
+
+    This is shared by everything that plays data, whether it blocks or not.  It
+    yields either a (start, end) tuple of the next batch of data to send, or a
+    float number of seconds to wait before asking for the next step.
+
+    Args:
+      start: The offset to start playing from.
+      end: The offset to stop at.
+      batch_size: The most data to send in one go.
+      timing: The Timing to pace the data by, or None to send it as fast as
+          possible.
+      speed: A multiplier for |timing|.
+    """
+    pos = start
+    began = time.monotonic()
+    if timing is not None:
+        offset_time = timing.time_at(start)
+
+    while pos < end:
+        stop = end
+        if timing is not None:
+            # Send everything that's due, or wait for the next write.
+            now = offset_time + (time.monotonic() - began) * speed
+            due = timing.offset_at(now)
+            if due <= pos:
+                next_time = timing.next_time(pos)
+                if next_time is not None:
+                    yield (next_time - now) / speed
+                    continue
+            else:
+                stop = min(stop, due)
+
+        stop = min(stop, pos + batch_size)
+        yield (pos, stop)
+        pos = stop
+
+
+def parse_pace(pace):
+    """Turn a 'max', 'real' or <speed> pace into a speed.
+
+    Returns None for 'max'.  Raises ValueError for bad paces.
+    """
+    if pace == 'max':
+        return None
+
+    speed = 1.0 if pace == 'real' else float(pace)
+    if speed <= 0:
+        raise ValueError('Speed must be positive.')
+    return speed
+
+
+class Recording:
+    """A canned data file, split into its header and playback data.
+
+    The file is memory-mapped (see load_data()), so one Recording can be shared
+    by any number of players without copying the data.  Pack files (see
+    vtpack.py) are read a block at a time as needed instead.
+    """
+
+    def __init__(self, filename):
+        """Load a canned data file.
+
+        Raises OSError if the file can't be read, or vtpack.Error if it's a
+        broken pack file.
+        """
+        self.filename = filename
+
+        # The size of the header, which is 0 if there isn't one, or None if
+        # the end of the header couldn't be found.
+        self.header_size = 0
+        self.header = b''
+        self.stops = StopTable()
+        self.checkpoints = Checkpoints()
+
+        # The Timing for the data, if any, and where it came from.
+        self.timing = None
+        self.timing_filename = None
+
+        if vtpack.is_pack(filename):
+            pack = vtpack.Reader(filename)
+            self.scan_header(pack.header)
+
+            # The playback part of the file, as a vtpack.Reader.
+            self.data = pack
+
+            if pack.timing:
+                self.timing = Timing(pack.timing['writes'],
+                                     pack.timing['base'])
+                self.timing_filename = filename
+            return
+
+        data = load_data(filename)
+        self.scan_header(data)
+
+        # The playback part of the file, as a memoryview.
+        self.data = data[self.header_size or 0:]
+
+        # A bad timing file shouldn't stop the data from being used.
+        timing = filename + TIMING_SUFFIX
+        if os.path.exists(timing):
+            try:
+                self.timing = Timing.load(timing, timing_base(self.data))
+                self.timing_filename = timing
+            except (OSError, ValueError) as e:
+                print('Unable to load timing from %s: %s' % (timing, e))
+
+    def scan_header(self, data):
+        """Load the stops & checkpoints from the header at the start of data."""
+        m = re.match(rb'(#[^\n]*\n)*@@ HEADER_START', data)
+        if m:
+            (self.stops, self.header_size) = StopTable.scan(data, m.end())
+            self.header = data[:self.header_size or 0]
+            if self.header_size:
+                self.checkpoints = Checkpoints.from_stops(self.stops, data)
+
+
+def sequence_key(kind, sequence):
+    """Return a short name for the function of an escape sequence.
+
+    This drops the parameters, so e.g. 'ESC [ 1 ; 2 H' and 'ESC [ H' both come
+    out as 'CSI H', while 'ESC [ ? 2 5 h' comes out as 'CSI ? h'.  OSCs are
+    named by their command number, as in 'OSC 52'.
+
+    Args:
+      kind: The kind name of the sequence, as found by the ChunkIndex.
+      sequence: The bytes of the sequence after the leading ESC.
+    """
+    if kind in ('CSI', 'DCS'):
+        m = re.match(rb'.([<=>?]?)[0-9:;<=>?]*([ -/]*)([@-~]?)', sequence)
+        (marker, intermediates, final) = (decode(x) for x in m.groups())
+        return ' '.join([kind] + list(marker) +
+                        ['SP' if x == ' ' else x for x in intermediates] +
+                        list(final))
+
+    if kind == 'OSC':
+        m = re.match(rb'\](\d*)', sequence)
+        return 'OSC %s' % (decode(m.group(1)),)
+
+    if kind in ('PM', 'APC', 'UNKNOWN'):
+        return kind
+
+    return '%s %s' % (kind, ' '.join(decode(sequence)))
+
+
+def collect_stats(data, chunks, top=STATS_TOP):
+    """Gather statistics about canned data in a single pass over its chunks.
+
+    Args:
+      data: The canned data.
+      chunks: The ChunkIndex for |data|.
+      top: How many of the most common & largest sequences to report.
+
+    Returns:
+      A dict with the results, suitable for turning into JSON.
+    """
+    kinds = collections.Counter()
+    kind_bytes = collections.Counter()
+    functions = collections.Counter()
+    sequences = collections.Counter()
+    runs = collections.Counter()
+    run_bytes = collections.Counter()
+    largest = []
+
+    starts = chunks.starts
+    for index, kind_id in enumerate(chunks.kinds):
+        start = starts[index]
+        length = starts[index + 1] - start
+        kind = chunks.names[kind_id]
+        kinds[kind] += 1
+        kind_bytes[kind] += length
+
+        if kind_id == chunks.TEXT:
+            # Bucket text runs by powers of two.
+            bucket = length.bit_length()
+            runs[bucket] += 1
+            run_bytes[bucket] += length
+            continue
+
+        sequence = data[start + 1 : start + length]
+        functions[sequence_key(kind, sequence)] += 1
+
+        # Only count short sequences verbatim, so big payloads (like OSC 52)
+        # with unique contents don't eat up all our memory.
+        if length <= STATS_MAX_SEQUENCE:
+            sequences[bytes(sequence)] += 1
+
+        if len(largest) < top:
+            heapq.heappush(largest, (length, start, kind))
+        elif length > largest[0][0]:
+            heapq.heapreplace(largest, (length, start, kind))
+
+    return {
+        'bytes': len(data),
+        'chunks': len(chunks),
+        'kinds': {kind: {'count': count, 'bytes': kind_bytes[kind]}
+                  for (kind, count) in kinds.most_common()},
+        'functions': functions.most_common(),
+        'sequences': [
+            (json.dumps(' '.join(['ESC'] + list(decode(x))))[1:-1], count)
+            for (x, count) in sequences.most_common(top)],
+        'text_runs': [
+            {'min': 1 << (bucket - 1), 'max': (1 << bucket) - 1,
+             'count': runs[bucket], 'bytes': run_bytes[bucket]}
+            for bucket in sorted(runs)],
+        'largest': [
+            {'offset': start, 'bytes': length, 'kind': kind,
+             'sequence': json.dumps(' '.join(decode(
+                 data[start + 1 : start + min(length, MAX_TEXT + 1)])))[1:-1]}
+            for (length, start, kind) in sorted(largest, reverse=True)],
+    }
+
+
+def print_stats(stats, top=STATS_TOP):
+    """Display the results of collect_stats() to the user."""
+    total = max(stats['bytes'], 1)
+
+    print('%s bytes in %s chunks.' % (stats['bytes'], stats['chunks']))
+
+    print()
+    print('By kind:')
+    for (kind, counts) in stats['kinds'].items():
+        print('  %-8s %10s chunks %12s bytes %5.1f%%' %
+              (kind, counts['count'], counts['bytes'],
+               100.0 * counts['bytes'] / total))
+
+    print()
+    print('Most common functions:')
+    for (name, count) in stats['functions'][:top]:
+        print('  %-20s %10s' % (name, count))
+
+    print()
+    print('Most common sequences:')
+    for (sequence, count) in stats['sequences']:
+        print('  %-20s %10s' % (sequence, count))
+
+    print()
+    print('Plain text run lengths:')
+    for run in stats['text_runs']:
+        print('  %10s-%-10s %10s runs %12s bytes' %
+              (run['min'], run['max'], run['count'], run['bytes']))
+
+    print()
+    print('Largest sequences:')
+    for seq in stats['largest']:
+        print('  offset %s, %s bytes: %s %s%s' %
+              (seq['offset'], seq['bytes'], seq['kind'], seq['sequence'],
+               '...' if seq['bytes'] > MAX_TEXT + 1 else ''))
+
+
+def screen_query(rows, columns):
+    """Return the data that asks a terminal to report its screen.
+
+    The checksum of each row is requested separately (DECRQCRA, with the row
+    number as the id) so we can tell which rows differ, followed by the cursor
+    position (DSR).  Terminals answer in order, so the cursor position comes
+    last.
+    """
+    data = [b'\x1b[%d;1;%d;1;%d;%d*y' % (row, row, row, columns)
+            for row in range(1, rows + 1)]
+    data.append(b'\x1b[6n')
+    return b''.join(data)
+
+
+def parse_screen_report(data, rows):
+    """Parse a terminal's answer to screen_query().
+
+    The canned data can make terminals send other things (like the answers to
+    its own queries), so we only pick out the checksums we asked for, and the
+    first cursor position report after them.
+
+    Args:
+      data: What the terminal has sent since it was asked.
+      rows: The number of rows asked for.
+
+    Returns:
+      A dict with the 'checksums' of each row (as hex strings) and the 'cursor'
+      as a 0-based [row, column], or None if the report isn't complete yet.
+    """
+    checksums = {}
+    end = 0
+    for m in CHECKSUM_RE.finditer(data):
+        checksums[int(m.group(1))] = m.group(2).decode('ascii').upper()
+        end = m.end()
+
+    if len(checksums) < rows or any(
+            row not in checksums for row in range(1, rows + 1)):
+        return None
+
+    m = CPR_RE.search(data, end)
+    if not m:
+        return None
+
+    return {
+        'checksums': [checksums[row] for row in range(1, rows + 1)],
+        'cursor': [int(m.group(1)) - 1, int(m.group(2)) - 1],
+    }
+
+
+def diff_reports(reports):
+    """Compare the screen reports from clients.
+
+    Args:
+      reports: The parse_screen_report() results for each client, with None
+          for clients that didn't answer.
+
+    Returns:
+      A list of descriptions of the differences, which is empty if all the
+      clients agree.  Clients & rows are numbered as in the 'clients' command
+      and the header stops.
+    """
+    missing = [i + 1 for (i, report) in enumerate(reports) if report is None]
+    if missing:
+        return ['Client #%s did not report.' % (i,) for i in missing]
+
+    diffs = []
+    first = reports[0]
+    for (row, checksum) in enumerate(first['checksums']):
+        if any(x['checksums'][row] != checksum for x in reports[1:]):
+            diffs.append('Row %s checksums: %s' % (row, ', '.join(
+                '#%s %s' % (i + 1, x['checksums'][row])
+                for (i, x) in enumerate(reports))))
+
+    if any(x['cursor'] != first['cursor'] for x in reports[1:]):
+        diffs.append('Cursors: %s' % (', '.join(
+            '#%s %s,%s' % (i + 1, x['cursor'][0], x['cursor'][1])
+            for (i, x) in enumerate(reports)),))
+
+    return diffs
+
+
+def percentiles(values):
+    """Summarize a list of durations (in seconds) in milliseconds."""
+    if not values:
+        return {}
+
+    values = sorted(values)
+
+    def _at(fraction):
+        return values[min(int(len(values) * fraction), len(values) - 1)] * 1000
+
+    return {
+        'min_ms': values[0] * 1000,
+        'median_ms': _at(0.5),
+        'p90_ms': _at(0.9),
+        'p99_ms': _at(0.99),
+        'max_ms': values[-1] * 1000,
+    }
+
+
+def probe_report(client, start, began):
+    """Work out how a client fared with the latency probes.
+
+    Terminals answer in order, so the Nth answer goes with the Nth probe written
+    out to the client.
+
+    Args:
+      client: The Client that was probed.
+      start: The offset playback began at.
+      began: When playback began, from time.monotonic().
+
+    Returns:
+      A dict with the number of probes written & answered, the latency
+      percentiles, and a trace of how far through the data the client had got
+      at each answer, with the average throughput since the one before.
+    """
+    latencies = []
+    trace = []
+    (last_time, last_offset) = (began, start)
+    for ((offset, written), answered) in zip(client.probe_writes,
+                                             client.probe_answers):
+        latencies.append(answered - written)
+        rate = None
+        if answered > last_time:
+            rate = (offset - last_offset) / (answered - last_time)
+        trace.append({
+            'time': answered - began,
+            'offset': offset,
+            'latency_ms': (answered - written) * 1000,
+            'bytes_per_sec': rate,
+        })
+        (last_time, last_offset) = (answered, offset)
+
+    return {
+        'probes': len(client.probe_writes) + len(client.probes),
+        'answered': len(client.probe_answers),
+        'latency': percentiles(latencies),
+        'trace': trace,
+    }
+
+
+def remove_stale_socket(path):
+    """Remove a Unix socket left behind by an earlier run, so we can bind it.
+
+    Anything other than a socket is left alone, so binding fails instead.
+    """
+    try:
+        if stat.S_ISSOCK(os.stat(path).st_mode):
+            os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def format_address(addr):
+    """Format the address of a client for display."""
+    if isinstance(addr, tuple):
+        return '%s:%s' % addr[:2]
+    return str(addr)
+
+
+def websocket_header(opcode, length):
+    """Build the header of an (unmasked, unfragmented) WebSocket frame.
+
+    Args:
+      opcode: One of the WS_* opcodes.
+      length: The size of the payload.
+
+    Returns:
+      The header, to be followed by the payload.
+    """
+    if length < 126:
+        return struct.pack('!BB', 0x80 | opcode, length)
+    if length < 0x10000:
+        return struct.pack('!BBH', 0x80 | opcode, 126, length)
+    return struct.pack('!BBQ', 0x80 | opcode, 127, length)
+
+
+def parse_websocket_frame(data):
+    """Parse the WebSocket frame at the start of some data.
+
+    Args:
+      data: The data received so far.
+
+    Returns:
+      An (opcode, payload, size) tuple, where size is how much of |data| the
+      frame takes up, or None if the frame isn't complete yet.  The payload is
+      unmasked.  Raises ConnectionError if the frame is too big to accept.
+    """
+    if len(data) < 2:
+        return None
+
+    length = data[1] & 0x7f
+    pos = 2
+    if length == 126:
+        if len(data) < 4:
+            return None
+        (length,) = struct.unpack_from('!H', data, 2)
+        pos = 4
+    elif length == 127:
+        if len(data) < 10:
+            return None
+        (length,) = struct.unpack_from('!Q', data, 2)
+        pos = 10
+    if length > INPUT_LIMIT:
+        raise ConnectionError('WebSocket frame too big: %s bytes' % (length,))
+
+    mask = None
+    if data[1] & 0x80:
+        mask = bytes(data[pos:pos + 4])
+        pos += 4
+    if len(data) < pos + length:
+        return None
+
+    payload = bytes(data[pos:pos + length])
+    if mask and payload:
+        key = (mask * (length // 4 + 1))[:length]
+        payload = (int.from_bytes(payload, 'big') ^
+                   int.from_bytes(key, 'big')).to_bytes(length, 'big')
+    return (data[0] & 0x0f, payload, pos + length)
+
+
+def websocket_response(request):
+    """Answer a WebSocket opening handshake.
+
+    Args:
+      request: The HTTP request, up to (but not including) the blank line that
+          ends it.
+
+    Returns:
+      The HTTP response accepting the connection, or None if the request isn't
+      a WebSocket handshake.
+    """
+    headers = {}
+    for line in bytes(request).split(b'\r\n')[1:]:
+        (name, _, value) = line.partition(b':')
+        headers[name.strip().lower()] = value.strip()
+
+    key = headers.get(b'sec-websocket-key')
+    if b'websocket' not in headers.get(b'upgrade', b'').lower() or not key:
+        return None
+
+    accept = base64.b64encode(hashlib.sha1(key + WEBSOCKET_GUID).digest())
+    return (b'HTTP/1.1 101 Switching Protocols\r\n'
+            b'Upgrade: websocket\r\n'
+            b'Connection: Upgrade\r\n'
+            b'Sec-WebSocket-Accept: ' + accept + b'\r\n\r\n')
+
+
+class Catchup:
+    """Played data a client missed, read from the backlog as it's sent.
+
+    This sits in a client's output queue in place of the data itself, so
+    catching up on a large recording (or a pack, which would have to be
+    decompressed) doesn't need it all in memory at once.
+    """
+
+    def __init__(self, backlog, start, end):
+        self.backlog = backlog
+        self.start = start
+        self.end = end
+
+    def __len__(self):
+        return self.end - self.start
+
+    def take(self):
+        """Return the next BATCH_SIZE bytes or so of the data."""
+        end = min(self.start + BATCH_SIZE, self.end)
+        data = memoryview(self.backlog[self.start:end])
+        self.start = end
+        return data
+
+
+class Client:
+    """A connected terminal and the output queued up for it."""
+
+    # Whether the client can be sent output yet.
+    ready = True
+
+    def __init__(self, sock, addr):
+        self.sock = sock
+        self.addr = addr
+
+        # Whether the socket is registered with the selector, and the events
+        # we're waiting for on it.
+        self.registered = False
+        self.events = 0
+
+        # Pending output as a FIFO of memoryviews (or a Catchup), and the total
+        # size of it.  If only part of the head of the queue has been written,
+        # |partial| is set.
+        self.queue = collections.deque()
+        self.queued = 0
+        self.partial = False
+
+        # Running totals of bytes written out and thrown away.
+        self.sent = 0
+        self.dropped = 0
+
+        # When the output queue last became empty, from time.monotonic().
+        self.drained = None
+
+        # What the client has sent us since we last asked it something.
+        self.input = bytearray()
+
+        # Latency probes queued up for the client, as (end, offset) pairs of
+        # where each one ends in the output we've queued in total, and the
+        # offset in the canned data it was sent at.  Once written out, they're
+        # moved to |probe_writes| as (offset, time) pairs.  The times the
+        # answers came in are in |probe_answers|.
+        self.probes = collections.deque()
+        self.probe_writes = []
+        self.probe_answers = []
+
+        sock.setblocking(False)
+
+    @property
+    def address(self):
+        """The address of the client, for display."""
+        return format_address(self.addr)
+
+    def receive(self, data):
+        """Take in data read from the client."""
+        self.input += data
+
+    def enqueue(self, data):
+        """Add a memoryview to the output queue."""
+        self.queue.append(data)
+        self.queued += len(data)
+
+    def enqueue_catchup(self, backlog, end):
+        """Add the backlog up to |end| to the output queue, to read as sent."""
+        self.queue.append(Catchup(backlog, 0, end))
+        self.queued += end
+
+    def frame(self, data):
+        """Wrap a memoryview of output for sending."""
+        return data
+
+    def discard(self):
+        """Throw away all the queued output."""
+        self.dropped += self.queued
+        self.queue.clear()
+        self.queued = 0
+        self.probes.clear()
+
+    def write(self):
+        """Write as much queued output as the socket will take right now.
+
+        If only part of a buffer gets written, the rest of it stays at the head
+        of the queue for next time.  Raises OSError if the client went away.
+        """
+        while self.queue:
+            data = self.queue[0]
+            if isinstance(data, Catchup):
+                piece = data.take()
+                if not data:
+                    self.queue.popleft()
+                framed = self.frame(piece)
+                self.queued += len(framed) - len(piece)
+                self.queue.appendleft(framed)
+                continue
+
+            try:
+                count = self.sock.send(data)
+            except BlockingIOError:
+                return
+
+            self.sent += count
+            self.queued -= count
+            while self.probes and self.probes[0][0] <= self.sent:
+                self.probe_writes.append((self.probes.popleft()[1],
+                                          time.monotonic()))
+            if count < len(data):
+                self.queue[0] = data[count:]
+                self.partial = True
+                return
+
+            self.queue.popleft()
+            self.partial = False
+
+        self.drained = time.monotonic()
+
+
+class WebSocketClient(Client):
+    """A terminal connected over a WebSocket, like an hterm page.
+
+    The client isn't ready for output until the opening handshake is done.
+    After that, everything queued up for it is sent as binary messages (one per
+    batch of playback), and the payloads of the messages it sends us are its
+    input.
+    """
+
+    ready = False
+
+    def __init__(self, sock, addr):
+        super().__init__(sock, addr)
+
+        # What the client has sent that we haven't parsed yet: the handshake
+        # request, then partial frames.
+        self.pending = bytearray()
+
+    @property
+    def address(self):
+        """The address of the client, for display."""
+        return 'ws://%s' % (super().address,)
+
+    def handshake(self, data):
+        """Take in part of the opening handshake.
+
+        Returns:
+          True once the handshake is done.  Raises ConnectionError if it isn't
+          a WebSocket handshake.
+        """
+        self.pending += data
+        end = self.pending.find(b'\r\n\r\n')
+        if end == -1:
+            if len(self.pending) > HANDSHAKE_LIMIT:
+                raise ConnectionError('WebSocket handshake too long')
+            return False
+
+        response = websocket_response(self.pending[:end])
+        if response is None:
+            self.sock.send(b'HTTP/1.1 400 Bad Request\r\n'
+                           b'Content-Length: 0\r\n\r\n')
+            raise ConnectionError('not a WebSocket handshake')
+
+        # The response is tiny, and nothing else has been written to the
+        # socket yet, so it all fits in the send buffer.
+        self.sock.send(response)
+        self.ready = True
+        data = self.pending[end + 4:]
+        self.pending = bytearray()
+        if data:
+            self.receive(data)
+        return True
+
+    def receive(self, data):
+        """Take in frames read from the client."""
+        self.pending += data
+        while True:
+            frame = parse_websocket_frame(self.pending)
+            if frame is None:
+                return
+
+            (opcode, payload, size) = frame
+            del self.pending[:size]
+            if opcode in (WS_CONTINUATION, WS_TEXT, WS_BINARY):
+                self.input += payload
+            elif opcode == WS_CLOSE:
+                raise ConnectionResetError()
+            elif opcode == WS_PING:
+                self.send_frame(WS_PONG, payload)
+
+    @staticmethod
+    def make_frame(opcode, payload):
+        """Build a frame.
+
+        The header and payload are joined, so the frame is never split up by
+        discard().
+        """
+        return memoryview(
+            b''.join((websocket_header(opcode, len(payload)), payload)))
+
+    def send_frame(self, opcode, payload):
+        """Queue up a frame."""
+        super().enqueue(self.make_frame(opcode, payload))
+
+    def enqueue(self, data):
+        """Add a memoryview to the output queue as a binary message."""
+        self.send_frame(WS_BINARY, data)
+
+    def frame(self, data):
+        """Wrap a memoryview of output in a binary message."""
+        return self.make_frame(WS_BINARY, data)
+
+    def discard(self):
+        """Throw away all the queued output, apart from a partly sent frame."""
+        if not self.partial:
+            super().discard()
+            return
+
+        head = self.queue.popleft()
+        self.queued -= len(head)
+        super().discard()
+        self.queue.append(head)
+        self.queued += len(head)
+
+
+class Broadcaster:
+    """Fan data out to a set of clients.
+
+    All the socket I/O happens on a background thread, so clients can connect
+    and be written to while the REPL is sitting at the prompt.  Sockets are
+    non-blocking and only written to when the selector says they can take more
+    data, so one slow or stalled client doesn't hold up the rest.  When a
+    client's queue is full, the policy decides what happens:
+
+      block: Wait for it to catch up (while still servicing everyone else).
+      drop: Throw away the data it doesn't have room for.
+      disconnect: Disconnect it.
+
+    The selector is only ever touched by the I/O thread.  Everything else is
+    guarded by |lock|, which is notified whenever the I/O thread makes progress.
+    """
+
+    POLICIES = ('block', 'drop', 'disconnect')
+
+    def __init__(self, policy='block', queue_limit=QUEUE_LIMIT,
+                 timeout=FLUSH_TIMEOUT):
+        self.policy = policy
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self.clients = []
+        self.lock = threading.Condition()
+
+        # Listening sockets (and which of them take WebSocket clients),
+        # WebSocket clients still in their opening handshake, and clients
+        # waiting to be unregistered & closed by the I/O thread.
+        self.listeners = []
+        self.websocket_listeners = set()
+        self.handshaking = []
+        self.closing = []
+
+        # The canned data being played, and how much of it has been sent.  If
+        # |catchup| is set, clients connecting late are sent what they missed.
+        self.backlog = memoryview(b'')
+        self.played = 0
+        self.catchup = False
+
+        # A regex for the answers to latency probes while we're probing (see
+        # start_probing()), otherwise None.
+        self.probe_re = None
+
+        self.selector = selectors.DefaultSelector()
+
+        # Used by other threads to wake the I/O thread up from select().
+        (self.wakeup_reader, self.wakeup_writer) = socket.socketpair()
+        self.wakeup_reader.setblocking(False)
+        self.wakeup_writer.setblocking(False)
+        self.selector.register(self.wakeup_reader, selectors.EVENT_READ,
+                               self._on_wakeup)
+
+        thread = threading.Thread(target=self._run, name='vtscope-io',
+                                  daemon=True)
+        thread.start()
+
+    def listen(self, host, port, websocket=False):
+        """Start accepting clients on a TCP port.
+
+        Args:
+          host: The address to listen on.
+          port: The port to listen on.
+          websocket: Whether clients connect with WebSockets.
+
+        Raises OSError if the port can't be bound.
+        """
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._add_listener(sock, (host, port), websocket)
+
+    def listen_unix(self, path):
+        """Start accepting clients on a Unix domain socket.
+
+        A stale socket left at |path| by an earlier run is replaced.  Raises
+        OSError if the socket can't be bound.
+        """
+        remove_stale_socket(path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._add_listener(sock, path)
+
+    def _add_listener(self, sock, address, websocket=False):
+        """Bind a new listening socket, and start accepting clients on it."""
+        try:
+            sock.bind(address)
+            sock.listen(5)
+        except OSError:
+            sock.close()
+            raise
+        sock.setblocking(False)
+
+        with self.lock:
+            self.listeners.append(sock)
+            if websocket:
+                self.websocket_listeners.add(sock)
+            self._wake()
+
+    def add(self, client):
+        """Start broadcasting to a newly connected Client."""
+        with self.lock:
+            self.clients.append(client)
+            if self.catchup and self.played:
+                client.enqueue_catchup(self.backlog, self.played)
+            self._wake()
+            self.lock.notify_all()
+            return client
+
+    def remove(self, client, reason='disconnected'):
+        """Stop broadcasting to a client and close its connection."""
+        with self.lock:
+            print('Client #%s %s.' % (self.clients.index(client) + 1, reason))
+            self.clients.remove(client)
+            self.closing.append(client)
+            self._wake()
+
+    def clear(self):
+        """Close all client connections."""
+        with self.lock:
+            self.closing.extend(self.clients + self.handshaking)
+            self.clients.clear()
+            self.handshaking.clear()
+            self._wake()
+
+    def set_backlog(self, data, played=0):
+        """Set the canned data being played, and how much has been sent."""
+        with self.lock:
+            self.backlog = data
+            self.played = played
+
+    def pending(self):
+        """Return True if any client has output queued."""
+        return any(client.queued for client in self.clients)
+
+    def wait_for_clients(self, count, timeout=None):
+        """Wait until at least |count| clients are connected.
+
+        Returns False if they didn't all show up within |timeout| seconds.
+        """
+        deadline = None
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+
+        with self.lock:
+            while len(self.clients) < count:
+                print('Waiting for client %s/%s...' %
+                      (len(self.clients) + 1, count))
+                connected = len(self.clients)
+                while len(self.clients) == connected:
+                    remaining = None
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            return False
+                    self.lock.wait(remaining)
+
+        return True
+
+    def send(self, data, played=None, probe=None):
+        """Queue up bytes (or a memoryview of them) for all clients.
+
+        This only waits on clients whose queue is full, and only when the policy
+        is to block.
+
+        Args:
+          data: The data to send.
+          played: If |data| comes from the backlog, the offset in the backlog
+              where it ends.
+          probe: If |data| is a latency probe, the offset in the backlog it
+              was sent at.
+        """
+        data = memoryview(data)
+
+        with self.lock:
+            if played is not None:
+                self.played = played
+
+            if not data:
+                return
+
+            for client in list(self.clients):
+                # An empty queue always takes the data, even if it's bigger than
+                # the limit, so an oversized send can't get stuck.
+                if (client.queued and
+                        client.queued + len(data) > self.queue_limit):
+                    if self.policy == 'drop':
+                        client.dropped += len(data)
+                        continue
+
+                    if self.policy == 'disconnect':
+                        self.remove(client, 'is too slow, disconnected')
+                        continue
+
+                    while (client in self.clients and client.queued and
+                           client.queued + len(data) > self.queue_limit):
+                        self.lock.wait()
+
+                    if client not in self.clients:
+                        continue
+
+                client.enqueue(data)
+                if probe is not None:
+                    client.probes.append((client.sent + client.queued, probe))
+
+            self._wake()
+
+    def flush(self):
+        """Wait for all queued output to be written.
+
+        When the policy is to block this waits as long as it takes.  Otherwise
+        clients have a limited amount of time to catch up, after which their
+        remaining output is dropped or they get disconnected.
+        """
+        deadline = None
+        if self.policy != 'block':
+            deadline = time.monotonic() + self.timeout
+
+        with self.lock:
+            while self.pending():
+                timeout = None
+                if deadline is not None:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        for client in [x for x in self.clients if x.queued]:
+                            if self.policy == 'drop':
+                                client.discard()
+                            else:
+                                self.remove(client, 'is too slow, disconnected')
+                        return
+
+                self.lock.wait(timeout)
+
+    def query(self, data, parse, timeout=REPORT_TIMEOUT):
+        """Send a query to all clients and wait for them to answer.
+
+        Everything sent before the query is flushed out first, so the answers
+        reflect the state after all of it.
+
+        Args:
+          data: The query to send.
+          parse: Called with what a client has sent since the query, returns
+              its answer, or None if the answer isn't complete yet.
+          timeout: How long to wait for the answers, in seconds.
+
+        Returns:
+          The answer from each client that was connected when the query was
+          sent, in order, with None for clients that didn't answer in time.
+        """
+        self.flush()
+
+        with self.lock:
+            clients = list(self.clients)
+            for client in clients:
+                client.input.clear()
+            self.send(data)
+
+            deadline = time.monotonic() + timeout
+            while True:
+                answers = [parse(client.input) for client in clients]
+                remaining = deadline - time.monotonic()
+                if None not in answers or remaining <= 0:
+                    return answers
+                self.lock.wait(remaining)
+
+    def start_probing(self, answer_re):
+        """Start timing the answers to latency probes.
+
+        Any earlier probe results are thrown away.
+
+        Args:
+          answer_re: A regex matching the answer to a probe.
+        """
+        with self.lock:
+            self.probe_re = answer_re
+            for client in self.clients:
+                client.input.clear()
+                client.probes.clear()
+                client.probe_writes = []
+                client.probe_answers = []
+
+    def wait_for_probes(self, timeout=REPORT_TIMEOUT):
+        """Wait for the answers to all the probes written out so far.
+
+        Args:
+          timeout: How long to wait for the answers, in seconds.
+        """
+        deadline = time.monotonic() + timeout
+        with self.lock:
+            while any(len(x.probe_answers) < len(x.probe_writes)
+                      for x in self.clients):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                self.lock.wait(remaining)
+
+    def stop_probing(self):
+        """Stop timing the answers to latency probes."""
+        with self.lock:
+            self.probe_re = None
+
+    def _wake(self):
+        """Wake up the I/O thread so it notices new data or sockets."""
+        try:
+            self.wakeup_writer.send(b'\0')
+        except BlockingIOError:
+            # The I/O thread already has plenty of wakeups pending.
+            pass
+
+    def _on_wakeup(self, _events):
+        """Drain the wakeup socket."""
+        try:
+            while self.wakeup_reader.recv(READ_SIZE):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _on_accept(self, sock):
+        """Accept all pending connections on a listening socket."""
+        while True:
+            try:
+                (fd, addr) = sock.accept()
+            except BlockingIOError:
+                return
+
+            if sock.family == socket.AF_UNIX:
+                # Clients of Unix sockets don't usually have an address.
+                addr = 'unix:%s' % (sock.getsockname(),)
+
+            if sock in self.websocket_listeners:
+                # These only count as connected after the handshake.
+                self.handshaking.append(WebSocketClient(fd, addr))
+                continue
+
+            client = self.add(Client(fd, addr))
+            print('Remote connected by', client.address)
+
+    def _on_handshake(self, client, events):
+        """Service a WebSocket client that's in its opening handshake."""
+        try:
+            if events & selectors.EVENT_READ:
+                data = client.sock.recv(READ_SIZE)
+                if not data:
+                    raise ConnectionResetError()
+                if not client.handshake(data):
+                    return
+        except OSError as e:
+            print('WebSocket client %s failed to connect: %s' %
+                  (client.address, e))
+            self.handshaking.remove(client)
+            self.closing.append(client)
+            return
+
+        self.handshaking.remove(client)
+        self.add(client)
+        print('Remote connected by', client.address)
+
+    def _on_client(self, client, events):
+        """Service a client socket that the selector says is ready."""
+        if not client.ready:
+            if client in self.handshaking:
+                self._on_handshake(client, events)
+            return
+
+        if client not in self.clients:
+            return
+
+        try:
+            if events & selectors.EVENT_READ:
+                # Clients send us their answers to queries (see query()), and
+                # we need to notice when they hang up.
+                data = client.sock.recv(READ_SIZE)
+                if not data:
+                    raise ConnectionResetError()
+
+                client.receive(data)
+                if self.probe_re:
+                    self._on_probe_answers(client)
+                if len(client.input) > INPUT_LIMIT:
+                    del client.input[:-INPUT_LIMIT]
+
+            if events & selectors.EVENT_WRITE:
+                client.write()
+        except OSError:
+            self.remove(client)
+
+    def _on_probe_answers(self, client):
+        """Note the time of any probe answers in a client's input."""
+        now = time.monotonic()
+        end = 0
+        for m in self.probe_re.finditer(client.input):
+            client.probe_answers.append(now)
+            end = m.end()
+        del client.input[:end]
+
+    def _sync(self):
+        """Bring the selector up to date with the sockets we know about."""
+        for client in self.closing:
+            if client.registered:
+                self.selector.unregister(client.sock)
+            client.sock.close()
+        self.closing.clear()
+
+        for sock in self.listeners:
+            try:
+                self.selector.get_key(sock)
+            except KeyError:
+                self.selector.register(
+                    sock, selectors.EVENT_READ,
+                    lambda _events, sock=sock: self._on_accept(sock))
+
+        for client in self.clients + self.handshaking:
+            events = selectors.EVENT_READ
+            if client.queued:
+                events |= selectors.EVENT_WRITE
+
+            if not client.registered:
+                client.registered = True
+                client.events = events
+                self.selector.register(
+                    client.sock, events,
+                    lambda events, client=client: self._on_client(
+                        client, events))
+            elif events != client.events:
+                client.events = events
+                self.selector.modify(client.sock, events,
+                                     self.selector.get_key(client.sock).data)
+
+    def _run(self):
+        """Service the sockets forever.  This runs on the I/O thread."""
+        while True:
+            with self.lock:
+                self._sync()
+
+            ready = self.selector.select()
+
+            with self.lock:
+                for (key, events) in ready:
+                    key.data(events)
+                self.lock.notify_all()
+
+
+class Server:
+    """Serve independent replays of canned data to many clients at once.
+
+    Each client that connects is shown a menu of recordings, and picks one (and
+    optionally a pace) by typing a line like '2' or 'vttest-01.log 0.5'.  The
+    recording is then played back to that client alone, with its own position
+    in the data.
+
+    Everything runs on a single asyncio event loop.  Recordings are loaded the
+    first time somebody asks for them, and the same memory-mapped data is
+    shared by all the sessions playing it.
+    """
+
+    def __init__(self, filenames, pace='max', batch_size=BATCH_SIZE):
+        self.filenames = filenames
+        self.pace = pace
+        self.batch_size = batch_size
+
+        # The Recordings loaded so far, by file name.
+        self.recordings = {}
+
+        # How many sessions have been started, and how many are running.
+        self.sessions = 0
+        self.active = 0
+
+    def menu(self):
+        """Return the menu shown to clients when they connect."""
+        lines = ['Recordings:']
+        for (i, filename) in enumerate(self.filenames):
+            lines.append('  %s) %s' % (i + 1, os.path.basename(filename)))
+        lines.append('Choose a recording [and max|real|<speed>] (default: %s): '
+                     % (self.pace,))
+        return '\r\n'.join(lines).encode('utf-8')
+
+    def find(self, name):
+        """Look up a recording by its 1-based number or file name.
+
+        Returns None if there's no such recording.
+        """
+        if name.isdigit():
+            index = int(name) - 1
+            if 0 <= index < len(self.filenames):
+                return self.filenames[index]
+            return None
+
+        for filename in self.filenames:
+            if name in (filename, os.path.basename(filename)):
+                return filename
+        return None
+
+    def load(self, filename):
+        """Return the (shared) Recording for a file."""
+        recording = self.recordings.get(filename)
+        if recording is None:
+            recording = Recording(filename)
+            self.recordings[filename] = recording
+            print('Loaded %s: %s bytes of playback.' %
+                  (filename, len(recording.data)))
+        return recording
+
+    async def choose(self, reader, writer):
+        """Ask a client which recording to play, and how fast.
+
+        Returns a (Recording, speed) tuple, or None if the client went away.
+        """
+        while True:
+            writer.write(self.menu())
+            await writer.drain()
+
+            line = await reader.readline()
+            if not line:
+                return None
+
+            args = line.decode('utf-8', 'replace').split()
+            if not args:
+                continue
+
+            filename = self.find(args[0])
+            if filename is None:
+                writer.write(b'No such recording.\r\n')
+                continue
+
+            try:
+                speed = parse_pace(args[1] if len(args) > 1 else self.pace)
+                recording = self.load(filename)
+            except (ValueError, OSError, vtpack.Error) as e:
+                writer.write(('%s\r\n' % (e,)).encode('utf-8'))
+                continue
+
+            if speed is not None and not recording.timing:
+                writer.write(b'No timing data, playing at max speed.\r\n')
+                speed = None
+
+            return (recording, speed)
+
+    async def play(self, recording, speed, writer):
+        """Play a recording to one client.
+
+        Returns the number of bytes sent.
+        """
+        data = recording.data
+        timing = recording.timing if speed is not None else None
+        sent = 0
+        for step in playback_steps(0, len(data), self.batch_size, timing,
+                                   speed):
+            if isinstance(step, float):
+                await asyncio.sleep(step)
+                continue
+
+            (start, end) = step
+            writer.write(data[start:end])
+            await writer.drain()
+            sent = end
+        return sent
+
+    async def handle(self, reader, writer):
+        """Run a session for a newly connected client."""
+        self.sessions += 1
+        self.active += 1
+        session = self.sessions
+        addr = writer.get_extra_info('peername')
+        if not isinstance(addr, tuple):
+            addr = 'unix:%s' % (writer.get_extra_info('sockname'),)
+        addr = format_address(addr)
+        print('Session #%s: %s connected (%s active).' %
+              (session, addr, self.active))
+
+        try:
+            choice = await self.choose(reader, writer)
+            if choice:
+                (recording, speed) = choice
+                print('Session #%s: playing %s at %s.' %
+                      (session, recording.filename,
+                       'max' if speed is None else speed))
+
+                began = time.monotonic()
+                sent = await self.play(recording, speed, writer)
+                elapsed = max(time.monotonic() - began, 1e-6)
+                print('Session #%s: played %s bytes in %.3fs: '
+                      '%.0f bytes/sec.' % (session, sent, elapsed,
+                                           sent / elapsed))
+        except (ConnectionError, OSError) as e:
+            print('Session #%s: %s' % (session, e))
+        finally:
+            self.active -= 1
+            writer.close()
+            print('Session #%s: disconnected (%s active).' %
+                  (session, self.active))
+
+    async def serve(self, host, port, unix_path=None):
+        """Accept clients forever.
+
+        Args:
+          host: The address to listen on.
+          port: The TCP port to listen on.
+          unix_path: The path of a Unix socket to listen on too, if any.
+        """
+        server = await asyncio.start_server(self.handle, host, port,
+                                            reuse_address=True,
+                                            backlog=SERVER_BACKLOG)
+        print('Serving %s recordings on %s:%s' %
+              (len(self.filenames), host, port))
+        if not unix_path:
+            async with server:
+                await server.serve_forever()
+            return
+
+        remove_stale_socket(unix_path)
+        unix_server = await asyncio.start_unix_server(self.handle, unix_path,
+                                                      backlog=SERVER_BACKLOG)
+        print('Serving on unix:%s' % (unix_path,))
+        async with server, unix_server:
+            await asyncio.gather(server.serve_forever(),
+                                 unix_server.serve_forever())
+
 
 class VTScope:
     """The VTScope tool."""
 
-    # The list of connected terminals.
-    clients = []
-
-    # True if we're running the REPL.
-    running = False
-
-    # The canned data.
-    data = ''
-
-    # The amount of sleep time between each character, in ms.
-    delay_ms = 0
-
-    # The list of header-defined OFFSETs where we might want to stop and view
-    # the current state.
-    stops = []
-
-    # The current start/end position in the data.  The characters between these
-    # two positions are next up to be sent to the clients.
-    start_position = 0
-    end_position = 0
-
-    # Patterns for escape sequences we expect to see in the data.
-    re_escapes = (
-        # Control Sequence Introducers.
-        ('CSI', re.compile(r'\[.*?[@-~]')),
-        # Operating System Commands.
-        ('OSC', re.compile(r'\].*?(\x1b\\|\x07)')),
-        # Privacy Messages.
-        ('PM', re.compile(r'^.*?(\x1b\\|\x07)')),
-        # Device Control Strings.
-        ('DCS', re.compile(r'P.*?(\x1b\\|\x07)')),
-        # Application Program Control.
-        ('APC', re.compile(r'_.*?(\x1b\\|\x07)')),
-        # DEC private sequences.
-        ('DEC', re.compile(r'#[^\x1b]')),
-        # Character set control.
-        ('CHR', re.compile(r'%[^\x1b]')),
-        # Graphic character sets.
-        ('SCS', re.compile(r'[()*+-./][^\x1b]')),
-        # Other escape sequences.
-        ('ESC', re.compile(r'[^\x1b]')),
-    )
+    def __init__(self):
+        # The connected terminals.
+        self.broadcaster = Broadcaster()
+
+        # The port to accept WebSocket clients on (or None for none), and the
+        # path of a Unix socket to accept clients on (or None for none).
+        self.websocket_port = WEBSOCKET_PORT
+        self.unix_path = None
+
+        # The descriptions of the places we're listening on.
+        self.listening = set()
+
+        # True if we're running the REPL.
+        self.running = False
+
+        # The canned data, as a memoryview of the playback part of the file.
+        self.data = memoryview(b'')
+
+        # The ChunkIndex for the canned data.
+        self.chunks = None
+
+        # The Timing for the canned data, if any.
+        self.timing = None
+
+        # The amount of sleep time between each character, in ms.
+        self.delay_ms = 0
+
+        # The most data sent in one go by the 'play' command, in bytes.
+        self.batch_size = BATCH_SIZE
+
+        # How often (in bytes) the 'play' command sends latency probes, or
+        # None for never, and which PROBE_QUERIES to use.
+        self.probe_interval = None
+        self.probe_query = 'dsr'
+
+        # The StopTable of header-defined OFFSETs where we might want to stop
+        # and view the current state.
+        self.stops = StopTable()
+
+        # The Checkpoints for seeking, and whether to use them.
+        self.checkpoints = Checkpoints()
+        self.use_checkpoints = False
+
+        # The size of the screen compared by the 'compare' & 'diff' commands.
+        self.screen_columns = SCREEN_COLUMNS
+        self.screen_rows = SCREEN_ROWS
+
+        # The current start/end position in the data.  The bytes between
+        # these two positions are next up to be sent to the clients.
+        self.start_position = 0
+        self.end_position = 0
 
     def run(self):
         """Start the VTScope REPL."""
@@ -169,25 +2023,61 @@ class VTScope:
 
             last_command_line = command_line
 
-    def scan_header(self, header):
-        """Scan the header for OFFSET blocks where we might want to stop and
-        view the current state.
+    def run_batch(self, filename, clients=0, pace='max', stop=None,
+                  wait=None, compare=False, every=None):
+        """Play a file without the REPL.
+
+        Args:
+          filename: The canned data to play.
+          clients: How many clients to wait for before playing.
+          pace: How fast to play, as for the 'play' command.
+          stop: Where to stop, as for the 'play' command, or None for the end.
+          wait: How long to wait for the clients, or None to wait forever.
+          compare: Whether to compare the clients while playing, as for the
+              'compare' command.
+          every: How many escape sequences to compare after, or None to
+              compare at each header stop.
+
+        Returns:
+          The report from play_range() (or compare_range()), plus the file
+          name and a 'clients_time' of how long it took for the clients to
+          connect.  Returns None if playback couldn't start.
         """
-        offset_re = re.compile(
-            r'^@@\s+OFFSET:(\d+)\s+LINES:(\d+)\s+CURSOR:(\d+),(\d+)\s*$',
-            re.MULTILINE)
+        self.cmd_open([filename])
+        if self.chunks is None:
+            return None
 
-        self.stops = []
+        began = time.monotonic()
+        if not self.broadcaster.wait_for_clients(clients, wait):
+            print('Timed out waiting for clients.')
+            return None
+        clients_time = time.monotonic() - began
 
-        m = offset_re.search(header)
-        while m:
-            self.stops.append({
-                'offset': int(m.group(1)),
-                'lines': int(m.group(2)),
-                'row': int(m.group(3)),
-                'column': int(m.group(4)),
-            })
-            m = offset_re.search(header, m.end())
+        try:
+            speed = parse_pace(pace)
+        except ValueError as e:
+            print(e)
+            return None
+
+        if not compare and speed is not None and not self.timing:
+            print('No timing data for %s.' % filename)
+            return None
+
+        end = len(self.data)
+        if stop is not None:
+            end = self.parse_offset(stop)
+            if end is None:
+                return None
+
+        if compare:
+            report = self.compare_range(0, end, every)
+            if report is None:
+                return None
+        else:
+            report = self.play_range(0, end, speed)
+        report['file'] = filename
+        report['clients_time'] = clients_time
+        return report
 
     def find_next_chunk(self):
         """Advance start_position and end_position to the next chunk in the
@@ -198,33 +2088,32 @@ class VTScope:
         if self.start_position >= len(self.data):
             return ''
 
-        if self.data[self.start_position] == '\x1b':
-            m = None
-            for (esc_name, pattern) in self.re_escapes:
-                m = pattern.match(self.data, self.start_position + 1)
-                if m:
-                    break
+        # The start might be in the middle of a chunk if we stepped by bytes.
+        index = self.chunks.find(self.start_position)
+        self.end_position = self.chunks.end(index)
+        kind = self.chunks.kind(index)
+        partial = self.start_position != self.chunks.start(index)
 
-            if m:
-                self.end_position = m.end()
-            else:
-                self.end_position = self.start_position + MAX_TEXT
-                print('Unable to find end of escape sequence.')
+        if kind == 'UNKNOWN':
+            print('Unable to find end of escape sequence.')
+            kind = 'ESC'
 
-            sequence = self.data[self.start_position + 1 : self.end_position]
-            return json.dumps(esc_name + ' ' + ' '.join(sequence))[1:-1]
+        if kind != 'TEXT' and not partial:
+            sequence = decode(
+                self.data[self.start_position + 1 : self.end_position])
+            return json.dumps(kind + ' ' + ' '.join(sequence))[1:-1]
 
         else:
-            self.end_position = self.data.find('\x1b', self.start_position)
-            if self.end_position == -1:
-                self.end_position = len(self.data)
-
-            plaintext = self.data[self.start_position : self.end_position]
-            if len(plaintext) > MAX_TEXT:
-                plaintext = plaintext[0:MAX_TEXT] + '...'
-
-            return ('%s chars: %s' %
-                    (self.end_position - self.start_position,
+            # The rest of a chunk we stepped into is shown as plain bytes.
+            length = self.end_position - self.start_position
+            plaintext = decode(self.data[
+                self.start_position :
+                min(self.end_position, self.start_position + MAX_TEXT)])
+            if length > MAX_TEXT:
+                plaintext += '...'
+
+            return ('%s bytes%s: %s' %
+                    (length, ' (rest of %s)' % (kind,) if partial else '',
                      json.dumps(plaintext)))
 
     def show_next_chunk(self):
@@ -237,29 +2126,394 @@ class VTScope:
             print('End of data.')
 
     def send(self, data):
-        """Broadcast a string to all clients.
+        """Broadcast bytes (or a memoryview of them) to all clients.
 
         This automatically removes any clients that appear to have disconnected.
         """
-        for i in range(len(self.clients), 0, -1):
-            fd = self.clients[i - 1]
-            try:
-                fd.send(data)
-            except IOError:
-                print('Client #%s disconnected.' % i)
-                del self.clients[i - 1]
+        self.broadcaster.send(data)
 
     def broadcast_chunk(self):
         """Broadcast the current chunk of data to the connected clients."""
+        self.broadcast_range(self.start_position, self.end_position)
+
+    def broadcast_range(self, start, end):
+        """Broadcast the canned data between two offsets to the clients."""
         if not self.delay_ms:
-            self.send(self.data[self.start_position : self.end_position])
+            self.broadcaster.send(self.data[start:end], played=end)
 
         else:
-            # If we have a delay, send a character at a time.
-            for ch in self.data[self.start_position : self.end_position]:
-                self.send(ch)
+            # If we have a delay, send a byte at a time.
+            for pos in range(start, end):
+                self.broadcaster.send(self.data[pos : pos + 1], played=pos + 1)
+                self.broadcaster.flush()
                 time.sleep(self.delay_ms / 1000.0)
 
+    def parse_offset(self, arg):
+        """Turn an <offset> or #<stop> command argument into an offset.
+
+        Returns None (after telling the user) if it's not a valid offset.
+        """
+        if not re.match(r'^#?\d+$', arg):
+            print('Invalid offset: %s' % (arg,))
+            return None
+
+        if arg[0] == '#':
+            index = int(arg[1:])
+            if index < 1 or index > len(self.stops):
+                print('No such stop.')
+                return None
+
+            return self.stops[index - 1]['offset']
+
+        pos = int(arg)
+        if pos > len(self.data):
+            print('Seek past end.')
+            return None
+
+        return pos
+
+    def goto(self, pos):
+        """Broadcast everything up to |pos| and display the chunk there.
+
+        If |pos| comes before the current position, input is replayed from the
+        beginning.  If checkpoints are turned on, the state at the closest one
+        before |pos| is sent instead when that's less data.
+        """
+        if pos < self.start_position:
+            self.start_position = 0
+
+        if self.use_checkpoints:
+            index = self.checkpoints.find(pos)
+            if index is not None:
+                offset = self.checkpoints.offsets[index]
+                repaint = self.checkpoints.repaints[index]
+                if pos - self.start_position > pos - offset + len(repaint):
+                    print('Restoring checkpoint at offset %s.' % (offset,))
+                    self.broadcaster.send(repaint)
+                    self.start_position = offset
+
+        self.broadcast_range(self.start_position, pos)
+        self.end_position = pos
+        self.show_next_chunk()
+
+    def probe_position(self, pos):
+        """Return the first place at or after |pos| to insert a probe.
+
+        Probes can't go in the middle of an escape sequence, so those are
+        skipped over.  Probes in the middle of plain text are fine, as long as
+        they don't split a UTF-8 character.
+        """
+        index = self.chunks.find(pos)
+        if index >= len(self.chunks) or self.chunks.start(index) == pos:
+            return pos
+
+        end = self.chunks.end(index)
+        if self.chunks.kinds[index] != ChunkIndex.TEXT:
+            return end
+
+        # Skip over UTF-8 continuation bytes.
+        while pos < end and 0x80 <= self.data[pos] < 0xc0:
+            pos += 1
+        return pos
+
+    def play_range(self, start, end, speed):
+        """Stream the canned data between two offsets to the clients.
+
+        Data is sent in batches of up to batch_size bytes.  If probe_interval
+        is set, a latency probe is sent that often, and once more at the end.
+
+        Args:
+          start: The offset to start playing from.
+          end: The offset to stop at.
+          speed: None to play as fast as the clients will accept the data, or
+              a multiplier for the original timing of the data.
+
+        Returns:
+          A report on the playback, as a dict.  The 'end' is the offset that
+          playback actually reached, which is short of |end| if the user
+          interrupted it.
+        """
+        pos = start
+        timing = self.timing if speed is not None else None
+
+        interval = self.probe_interval
+        query = None
+        probe = None
+        if interval:
+            (query, answer_re, query_re) = PROBE_QUERIES[self.probe_query]
+            count = sum(
+                len(query_re.findall(
+                    self.data[x : min(x + TOKENIZE_SIZE, end)]))
+                for x in range(start, end, TOKENIZE_SIZE))
+            if count:
+                print('Warning: the data has %s %s queries of its own, which '
+                      'will throw off the probe results.' %
+                      (count, self.probe_query.upper()))
+            self.broadcaster.start_probing(answer_re)
+            probe = self.probe_position(start + interval)
+
+        began = time.monotonic()
+        try:
+            for step in playback_steps(start, end, self.batch_size, timing,
+                                       speed):
+                if isinstance(step, float):
+                    time.sleep(step)
+                    continue
+
+                (pos, stop) = step
+                while interval and probe < stop:
+                    self.broadcaster.send(self.data[pos:probe], played=probe)
+                    self.broadcaster.send(query, probe=probe)
+                    pos = probe
+                    probe = self.probe_position(probe + interval)
+                self.broadcaster.send(self.data[pos:stop], played=stop)
+                pos = stop
+
+            if interval:
+                # One last probe to tell when the clients are all done.
+                self.broadcaster.send(query, probe=pos)
+            self.broadcaster.flush()
+            if interval:
+                self.broadcaster.wait_for_probes()
+        except KeyboardInterrupt:
+            print('^C')
+
+        if interval:
+            self.broadcaster.stop_probing()
+
+        elapsed = max(time.monotonic() - began, 1e-6)
+        count = pos - start
+        sequences = self.chunks.count_sequences(start, pos)
+        print('Played %s bytes, %s sequences in %.3fs: '
+              '%.0f bytes/sec, %.0f sequences/sec' %
+              (count, sequences, elapsed, count / elapsed,
+               sequences / elapsed))
+
+        clients = []
+        with self.broadcaster.lock:
+            for client in self.broadcaster.clients:
+                drain_time = None
+                if client.drained is not None and client.drained >= began:
+                    drain_time = client.drained - began
+                clients.append({
+                    'address': client.address,
+                    'sent': client.sent,
+                    'dropped': client.dropped,
+                    'queued': client.queued,
+                    'drain_time': drain_time,
+                })
+                if interval:
+                    clients[-1]['probes'] = probe_report(client, start, began)
+
+        for (i, client) in enumerate(clients):
+            if 'probes' in client:
+                probes = client['probes']
+                latency = probes['latency']
+                print('Client #%s: %s/%s probes answered' %
+                      (i + 1, probes['answered'], probes['probes']), end='')
+                if latency:
+                    print(', latency median %.1fms, p90 %.1fms, p99 %.1fms, '
+                          'max %.1fms' %
+                          (latency['median_ms'], latency['p90_ms'],
+                           latency['p99_ms'], latency['max_ms']), end='')
+                print('.')
+
+        report = {
+            'pace': 'max' if speed is None else speed,
+            'start': start,
+            'end': pos,
+            'bytes': count,
+            'sequences': sequences,
+            'wall_time': elapsed,
+            'bytes_per_sec': count / elapsed,
+            'sequences_per_sec': sequences / elapsed,
+            'clients': clients,
+        }
+        if interval:
+            report['probe'] = {'interval': interval, 'query': self.probe_query}
+        return report
+
+    def replay_to(self, pos):
+        """Bring the clients to |pos| without displaying anything.
+
+        Going backwards resets the clients and replays the data from the
+        beginning.
+        """
+        if pos < self.start_position:
+            # Reset to Initial State (RIS).
+            self.broadcaster.send(b'\x1bc')
+            self.start_position = 0
+
+        self.broadcast_range(self.start_position, pos)
+        self.start_position = self.end_position = pos
+
+    def snapshot(self):
+        """Ask all the clients to report their screens.
+
+        Returns:
+          A list of parse_screen_report() results, one per client, with None
+          for clients that didn't answer.
+        """
+        rows = self.screen_rows
+        return self.broadcaster.query(
+            screen_query(rows, self.screen_columns),
+            lambda data: parse_screen_report(data, rows))
+
+    def compare_clients(self):
+        """Return the differences between the clients' screens (if any)."""
+        return diff_reports(self.snapshot())
+
+    @staticmethod
+    def parse_every(arg):
+        """Turn a 'stops' or <count> argument to 'compare' into a count.
+
+        Returns None for 'stops'.  Raises ValueError for bad arguments.
+        """
+        if arg == 'stops':
+            return None
+
+        every = int(arg)
+        if every <= 0:
+            raise ValueError('Count must be positive.')
+        return every
+
+    def compare_positions(self, start, end, every=None):
+        """Yield the offsets where 'compare' checks the clients.
+
+        Args:
+          start: The offset to start from (which isn't included).
+          end: The offset to stop at (which is always included).
+          every: Check after every |every| escape sequences, or None to check
+              at each header stop.
+        """
+        if every is None:
+            for offset in self.stops.offsets:
+                if start < offset < end:
+                    yield offset
+        else:
+            count = 0
+            kinds = self.chunks.kinds
+            for index in range(self.chunks.find(start), len(self.chunks)):
+                pos = self.chunks.end(index)
+                if pos >= end:
+                    break
+                if kinds[index] != ChunkIndex.TEXT:
+                    count += 1
+                    if count % every == 0 and pos > start:
+                        yield pos
+
+        yield end
+
+    def compare_range(self, start, end, every=None):
+        """Play the data between two offsets and compare the clients as we go.
+
+        The clients are asked to report their screens at each of the
+        compare_positions().  When they first disagree, we bisect between the
+        last position where they agreed and that one, by chunk, to find the
+        first chunk after which they differ.  The current position is left at
+        the start of that chunk.
+
+        Args:
+          start: The offset to start from.
+          end: The offset to stop at.
+          every: Check after every |every| escape sequences, or None to check
+              at each header stop.
+
+        Returns:
+          A report on the comparison, as a dict, or None if there aren't
+          enough clients to compare.
+        """
+        if len(self.broadcaster.clients) < 2:
+            print('Need at least two clients to compare.')
+            return None
+
+        began = time.monotonic()
+        if start == 0:
+            # Start from a clean slate, whatever the clients were doing.
+            self.broadcaster.send(b'\x1bc')
+
+        good = start
+        bad = None
+        checks = 1
+        diffs = self.compare_clients()
+        if diffs:
+            bad = start
+        else:
+            try:
+                for pos in self.compare_positions(start, end, every):
+                    self.replay_to(pos)
+                    checks += 1
+                    diffs = self.compare_clients()
+                    if diffs:
+                        bad = pos
+                        break
+                    good = pos
+            except KeyboardInterrupt:
+                print('^C')
+
+        offset = None
+        if bad is not None and bad > good:
+            # Bisect over the chunk boundaries between the two positions.  The
+            # clients agree at positions[lo] and differ at positions[hi].
+            starts = self.chunks.starts
+            positions = ([good] +
+                         list(starts[bisect.bisect_right(starts, good) :
+                                     bisect.bisect_left(starts, bad)]) +
+                         [bad])
+            (lo, hi) = (0, len(positions) - 1)
+            while hi - lo > 1:
+                mid = (lo + hi) // 2
+                self.replay_to(positions[mid])
+                checks += 1
+                mid_diffs = self.compare_clients()
+                if mid_diffs:
+                    (hi, diffs) = (mid, mid_diffs)
+                else:
+                    lo = mid
+
+            offset = positions[lo]
+            self.replay_to(offset)
+        elif bad is not None:
+            offset = bad
+
+        self.end_position = self.start_position
+        snippet = self.find_next_chunk()
+        if offset is not None:
+            print('Clients diverge at offset %s, %s' % (offset, snippet))
+            for diff in diffs:
+                print('  %s' % (diff,))
+        else:
+            print('Clients agree after %s checks up to offset %s.' %
+                  (checks, good))
+            if snippet:
+                print('Next up: offset %s, %s' % (self.start_position,
+                                                  snippet))
+
+        return {
+            'start': start,
+            'end': good,
+            'checks': checks,
+            'compare_time': time.monotonic() - began,
+            'diverged': offset is not None,
+            'offset': offset,
+            'chunk': snippet if offset is not None else None,
+            'differences': diffs,
+        }
+
+    def load_timing(self, filename):
+        """Load a timing file for the current canned data."""
+        try:
+            self.timing = Timing.load(filename, timing_base(self.data))
+        except (OSError, ValueError) as e:
+            print('Unable to load timing from %s: %s' % (filename, e))
+            return
+        self.show_timing(filename)
+
+    def show_timing(self, filename):
+        """Tell the user about the timing data that was loaded."""
+        print('Read %s timing records from %s, %.3fs total.' %
+              (len(self.timing), filename, self.timing.duration()))
+
     def dispatch_command(self, command_line):
         """Dispatch a command line to an appropriate cmd_* method."""
         command_args = command_line.split(' ')
@@ -275,6 +2529,10 @@ class VTScope:
 
         try:
             command_function(command_args)
+            # Make sure everything the command sent actually gets out.
+            self.broadcaster.flush()
+        except KeyboardInterrupt:
+            print('^C')
         except Exception:  # pylint: disable=broad-except
             traceback.print_exc()
             print('Internal error executing "%s"' % (command_name,))
@@ -286,38 +2544,50 @@ class VTScope:
 
         Usage: accept <client-count>
 
-        If <client-count> starts with a '+' as in 'accept +1', then this will
-        allow additional clients to connect.  Otherwise all existing connections
-        are reset before accepting.
+        Clients can connect at any time without this command; it just holds
+        the prompt until <client-count> of them are connected.  If
+        <client-count> starts with a '+' as in 'accept +1', then this will
+        wait for that many more clients to connect.  Use the 'disconnect'
+        command to reset existing connections.
 
         Clients can connect using the the 'nc' (aka netcat) command, with...
 
             $ nc 127.0.0.1 8383
+
+        ...or, if vtscope was started with --unix <path>, with...
+
+            $ nc -U <path>
+
+        hterm can also connect directly over a WebSocket, without a bridge, by
+        opening ../html/hterm.html?vtscope=ws://127.0.0.1:8384 in a browser.
         """
         if not args:
             print('Missing argument.')
             return
 
+        if not self.broadcaster.listeners:
+            self.cmd_listen([])
+            if not self.broadcaster.listeners:
+                return
+
         if args[0][0] == '+':
-            count = len(self.clients) + int(args[0][1:])
+            count = len(self.broadcaster.clients) + int(args[0][1:])
         else:
             count = int(args[0])
-            self.clients = []
 
-        print('Listening on %s:%s' % (LISTEN_HOST, LISTEN_PORT))
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        sock.bind((LISTEN_HOST, LISTEN_PORT))
-        sock.listen(1)
+        self.broadcaster.wait_for_clients(count)
+
+    def cmd_batch(self, args):
+        """Set the largest amount of data the 'play' command sends at once.
+
+        Usage: batch [<bytes>]
 
-        while len(self.clients) < count:
-            print('Waiting for client %s/%s...' %
-                  (len(self.clients) + 1, count))
-            (fd, addr) = sock.accept()
-            self.clients.append(fd)
-            print('Remote connected by', addr)
+        With no arguments, display the current setting.
+        """
+        if args:
+            self.batch_size = max(1, int(args[0]))
 
-        sock.close()
+        print('Batch size is now: %s' % self.batch_size)
 
     def cmd_bstep(self, args):
         """Step a given number of bytes."""
@@ -326,12 +2596,126 @@ class VTScope:
         else:
             count = 1
 
-        self.end_position = self.start_position + count
-        if self.end_position == len(self.data):
-            self.end_position = len(self.data)
+        self.end_position = min(self.start_position + count, len(self.data))
 
         self.cmd_step([])
 
+    def cmd_catchup(self, args):
+        """Set whether late joining clients are sent what they missed.
+
+        Usage: catchup [on|off]
+
+        When on, a client that connects after playback has started is sent
+        all of the canned data up to the current position in one go, so it
+        ends up in the same state as the other clients.
+
+        With no arguments, display the current setting.
+        """
+        if args:
+            if args[0] not in ('on', 'off'):
+                print('Expected "on" or "off"')
+                return
+
+            self.broadcaster.catchup = args[0] == 'on'
+
+        print('Catchup is now: %s' % ('on' if self.broadcaster.catchup else
+                                      'off',))
+
+    def cmd_checkpoints(self, args):
+        """Set whether seeking uses checkpoints.
+
+        Usage: checkpoints [on|off]
+
+        Normally seeking backwards replays all the data from the beginning,
+        and seeking forwards sends everything in between.  With checkpoints
+        on, seeking instead resets the clients and repaints the screen as it
+        was at the closest checkpoint before the target offset, then plays the
+        data from there.  That's much less data when the offset is far away.
+
+        Checkpoints are taken from the stops in the file header, and only
+        restore the expected text and cursor position.  Other state (colors,
+        modes, scroll regions, ...) is lost, which is why this is off by
+        default.
+
+        With no arguments, display the current setting.
+        """
+        if args:
+            if args[0] not in ('on', 'off'):
+                print('Expected "on" or "off"')
+                return
+
+            self.use_checkpoints = args[0] == 'on'
+
+        print('Checkpoints are now: %s (%s available)' %
+              ('on' if self.use_checkpoints else 'off', len(self.checkpoints)))
+
+    def cmd_clients(self, args):
+        """Display the connected clients and how much data each has received.
+
+        Usage: clients
+        """
+        if args:
+            print('Command takes no arguments')
+            return
+
+        with self.broadcaster.lock:
+            if not self.broadcaster.clients:
+                print('No clients connected.')
+                return
+
+            for i, client in enumerate(self.broadcaster.clients):
+                print('#%s %s sent: %s, queued: %s, dropped: %s' %
+                      (i + 1, client.address, client.sent, client.queued,
+                       client.dropped))
+
+    def cmd_compare(self, args):
+        """Play the canned data and compare the clients' screens as we go.
+
+        Usage: compare [stops|<count>] [<offset>]
+
+        Plays from the current position to <offset> (or '#<n>' for a stop),
+        or to the end of the data if not specified.  Along the way, the
+        clients are asked to report their screens at each header stop (the
+        default), or after every <count> escape sequences, and at the end.
+
+        If the clients disagree, vtscope bisects (replaying from the start as
+        needed) to find the first chunk after which they differ, and stops
+        right before it, so you can 'step' over it and 'diff' the results.
+
+        Clients report the checksum of each row (DECRQCRA) and the cursor
+        position (DSR), so they have to support those and be the same size.
+        hterm needs the enable-checksum-report preference for this (the
+        ?vtscope= mode of hterm.html turns it on).
+        See the 'screen' command for the area that's compared.  The answers
+        come back through the client's connection, so the terminal should
+        pass them through as is, e.g.:
+
+            $ stty raw -echo; nc 127.0.0.1 8383; stty sane
+        """
+        if not self.data:
+            print('No data.')
+            return
+
+        every = None
+        if args:
+            try:
+                every = self.parse_every(args[0])
+            except ValueError as e:
+                print(e)
+                return
+
+        end = len(self.data)
+        if len(args) > 1:
+            end = self.parse_offset(args[1])
+            if end is None:
+                return
+
+        if end < self.start_position:
+            print('Already past offset %s.' % end)
+            return
+
+        self.compare_range(self.start_position, end, every)
+
     def cmd_delay(self, args):
         """Set a delay between each character, in milliseconds."""
         if args:
@@ -339,6 +2723,54 @@ class VTScope:
 
         print('Delay is now: %s' % self.delay_ms)
 
+    def cmd_diff(self, args):
+        """Compare the clients' screens right now.
+
+        Usage: diff
+
+        Shows each client's cursor position, and the rows whose contents
+        differ between them.  See the 'compare' command for details.
+        """
+        if args:
+            print('Command takes no arguments')
+            return
+
+        reports = self.snapshot()
+        if not reports:
+            print('No clients connected.')
+            return
+
+        for (i, report) in enumerate(reports):
+            if report is not None:
+                print('#%s cursor: %s,%s' % (i + 1, report['cursor'][0],
+                                             report['cursor'][1]))
+
+        diffs = diff_reports(reports)
+        for diff in diffs:
+            print(diff)
+        if not diffs:
+            print('Clients agree.')
+
+    def cmd_disconnect(self, args):
+        """Disconnect clients.
+
+        Usage: disconnect [<client-number>]
+
+        Disconnects the given client (as numbered by the 'clients' command),
+        or all of them if not specified.
+        """
+        if not args:
+            self.broadcaster.clear()
+            return
+
+        with self.broadcaster.lock:
+            index = int(args[0])
+            if index < 1 or index > len(self.broadcaster.clients):
+                print('No such client.')
+                return
+
+            self.broadcaster.remove(self.broadcaster.clients[index - 1])
+
     def cmd_exit(self, args):
         """Exit vtscope.
 
@@ -370,6 +2802,130 @@ class VTScope:
                         line = line[8:]
                     print('  %s' % (line,))
 
+    def cmd_play(self, args):
+        """Stream the canned data to the clients.
+
+        Usage: play [max|real|<speed>] [<offset>]
+
+        Plays from the current position to <offset>, or to the end of the data
+        if not specified.  As with 'seek', use '#<n>' to play to a stop.
+
+        The first argument sets the pace:
+
+          max: As fast as the clients will accept the data (the default).
+          real: Match the timing of the original session.
+          <speed>: Like 'real', but faster or slower by the given factor,
+              as in 'play 2' or 'play 0.5'.
+
+        Pacing needs a timing file, see the 'timing' command.  Data is sent in
+        batches of up to 'batch' bytes.  Once done (or interrupted with Ctrl+C),
+        the achieved bytes/sec and sequences/sec are displayed.
+        """
+        if not self.data:
+            print('No data.')
+            return
+
+        speed = None
+        if args:
+            try:
+                speed = parse_pace(args[0])
+            except ValueError as e:
+                print(e)
+                return
+
+        if speed is not None and not self.timing:
+            print('No timing data, see the "timing" command.')
+            return
+
+        end = len(self.data)
+        if len(args) > 1:
+            end = self.parse_offset(args[1])
+            if end is None:
+                return
+
+        if end < self.start_position:
+            print('Already past offset %s.' % end)
+            return
+
+        report = self.play_range(self.start_position, end, speed)
+        self.end_position = report['end']
+        self.show_next_chunk()
+
+    def cmd_policy(self, args):
+        """Set what happens when a client can't keep up.
+
+        Usage: policy [block|drop|disconnect] [<queue-limit>] [<timeout>]
+
+        Every client has an output queue that holds up to <queue-limit> bytes.
+        When a queue is full, the 'block' policy waits for the client to catch
+        up, 'drop' throws away data the client has no room for, and
+        'disconnect' disconnects the client.
+
+        After every command clients get to drain their queues.  Unless the
+        policy is 'block', they have <timeout> seconds to do so before the
+        policy is applied to them.
+
+        With no arguments, display the current settings.
+        """
+        broadcaster = self.broadcaster
+
+        if args:
+            if args[0] not in Broadcaster.POLICIES:
+                print('Unknown policy: "%s"' % args[0])
+                return
+
+            broadcaster.policy = args[0]
+            if len(args) > 1:
+                broadcaster.queue_limit = int(args[1])
+            if len(args) > 2:
+                broadcaster.timeout = float(args[2])
+
+        print('Policy is now: %s, queue limit: %s bytes, timeout: %ss' %
+              (broadcaster.policy, broadcaster.queue_limit,
+               broadcaster.timeout))
+
+    def cmd_probe(self, args):
+        """Measure how far behind the clients fall while playing.
+
+        Usage: probe [off|<bytes>] [da|dsr]
+
+        Every <bytes> of data, the 'play' command slips a query into the data,
+        and times how long each client takes to answer it.  Terminals answer
+        queries once they've processed everything before them, so this shows
+        how far behind they're running.  The query is either a cursor position
+        request (dsr, the default) or a Device Attributes request (da).
+
+        After playing, the latency percentiles for each client are displayed.
+        The --play report also has a trace of how far through the data each
+        client had got at each answer, and its throughput since the last one.
+
+        Answers to the same kind of query in the data itself can't be told
+        apart from answers to probes, so use the other kind for such data.
+
+        With no arguments, display the current settings.
+        """
+        if args:
+            if len(args) > 1 and args[1] not in PROBE_QUERIES:
+                print('Unknown query: "%s"' % args[1])
+                return
+
+            if args[0] == 'off':
+                self.probe_interval = None
+            elif args[0].isdigit() and int(args[0]) > 0:
+                self.probe_interval = int(args[0])
+            else:
+                print('Invalid interval: "%s"' % args[0])
+                return
+
+            if len(args) > 1:
+                self.probe_query = args[1]
+
+        if self.probe_interval:
+            print('Probing every %s bytes with %s.' %
+                  (self.probe_interval, self.probe_query.upper()))
+        else:
+            print('Not probing.')
+
     def cmd_send(self, args):
         r"""Send a string to all clients.
 
@@ -413,7 +2969,26 @@ class VTScope:
                 data += json.loads('"%s"' % arg)
 
         print('Sending %s' % json.dumps(data))
-        self.send(data)
+        self.send(data.encode('utf-8'))
+
+    def cmd_timing(self, args):
+        """Load a timing file for the canned data.
+
+        Usage: timing <local-path>
+
+        The file should be in the format written by `script -t`, with the
+        timings of each write made by the recorded program.  These line up
+        with the start of the playback data, or with the line after the
+        "Script started on" line if the data came from `script`.
+
+        Opening a file automatically loads a timing file with the same name
+        plus a '.timing' suffix, if there is one.
+        """
+        if len(args) != 1:
+            print('Command only accepts a single filename')
+            return
+
+        self.load_timing(os.path.expanduser(args[0]))
 
     def cmd_stops(self, args):
         """Display a list of the stop offsets.
@@ -428,17 +3003,81 @@ class VTScope:
             print('No stop offsets found.')
             return
 
-        for i, offset in enumerate(self.stops):
+        for i in range(len(self.stops)):
+            offset = self.stops[i]
             print('#%s offset: %s, lines: %s, cursor: %s,%s' %
                   (i + 1, offset['offset'], offset['lines'], offset['row'],
                    offset['column']))
 
+    def cmd_listen(self, args):
+        """Start listening for clients.
+
+        Usage: listen
+
+        This happens automatically when vtscope starts, but if a port was in
+        use at the time you can use this to try again.  Plain clients connect
+        to TCP port 8383, WebSocket clients (like hterm pages) to port 8384,
+        and plain clients can also use a Unix socket given with --unix.
+        """
+        if args:
+            print('Command takes no arguments')
+            return
+
+        endpoints = [('%s:%s' % (LISTEN_HOST, LISTEN_PORT),
+                      lambda: self.broadcaster.listen(LISTEN_HOST,
+                                                      LISTEN_PORT))]
+        if self.websocket_port:
+            endpoints.append((
+                'ws://%s:%s' % (LISTEN_HOST, self.websocket_port),
+                lambda: self.broadcaster.listen(LISTEN_HOST,
+                                                self.websocket_port,
+                                                websocket=True)))
+        if self.unix_path:
+            endpoints.append((
+                'unix:%s' % (self.unix_path,),
+                lambda: self.broadcaster.listen_unix(self.unix_path)))
+
+        endpoints = [x for x in endpoints if x[0] not in self.listening]
+        if not endpoints:
+            print('Already listening.')
+            return
+
+        for (name, listen) in endpoints:
+            try:
+                listen()
+            except OSError as e:
+                print('Unable to listen on %s: %s' % (name, e))
+                continue
+
+            self.listening.add(name)
+            print('Listening on %s' % (name,))
+
+    def cmd_next(self, args):
+        """Seek to the next stop offset after the current position.
+
+        Usage: next
+
+        Unlike 'seek', this stops exactly at the stop offset even if that's in
+        the middle of a chunk.  See the 'stops' command for more information.
+        """
+        if args:
+            print('Command takes no arguments')
+            return
+
+        index = self.stops.next_after(self.start_position)
+        if index is None:
+            print('No more stops.')
+            return
+
+        print('Stop #%s' % (index + 1,))
+        self.goto(self.stops.offsets[index])
+
     def cmd_open(self, args):
         """Open a local file containing canned data.
 
         If the log file has header information then the OFFSETs found in the
-        header will be available to the 'seek' command.  See 'seek' and 'stops'
-        commands for more information.
+        header will be available to the 'seek', 'next' and 'prev' commands.
+        See 'seek' and 'stops' commands for more information.
 
         Usage: open <local-path>
         """
@@ -448,22 +3087,53 @@ class VTScope:
 
         filename = os.path.expanduser(args[0])
 
-        with open(filename) as f:
-            self.data = f.read()
+        try:
+            recording = Recording(filename)
+        except (OSError, vtpack.Error) as e:
+            print('Unable to open %s: %s' % (filename, e))
+            return
 
-        if re.match(r'(#[^\n]*\n)*@@ HEADER_START', self.data):
-            m = re.search(r'@@ HEADER_END\r?\n', self.data, re.MULTILINE)
-            if not m:
-                print('Unable to locate end of header.')
-            else:
-                end = m.end()
-                print('Read %s bytes of header.' % end)
-                self.scan_header(self.data[0:end])
-                self.data = self.data[end:]
+        if recording.header_size is None:
+            print('Unable to locate end of header.')
+        elif recording.header_size:
+            print('Read %s bytes of header, %s stops.' %
+                  (recording.header_size, len(recording.stops)))
+
+        self.data = recording.data
+        self.stops = recording.stops
+        self.checkpoints = recording.checkpoints
 
         print('Read %s bytes of playback.' % len(self.data))
+        self.broadcaster.set_backlog(self.data)
+        self.chunks = ChunkIndex(self.data)
+        print('Indexed %s chunks.' % len(self.chunks))
+
+        self.timing = recording.timing
+        if self.timing:
+            self.show_timing(recording.timing_filename)
+
         self.cmd_reset([])
 
+    def cmd_prev(self, args):
+        """Seek to the last stop offset before the current position.
+
+        Usage: prev
+
+        Like 'seek', this replays input from the beginning.  See the 'next'
+        command for more information.
+        """
+        if args:
+            print('Command takes no arguments')
+            return
+
+        index = self.stops.previous_before(self.start_position)
+        if index is None:
+            print('No earlier stops.')
+            return
+
+        print('Stop #%s' % (index + 1,))
+        self.goto(self.stops.offsets[index])
+
     def cmd_reset(self, args):
         """Reset the current position in the canned data and display the first
         chunk.
@@ -476,8 +3146,28 @@ class VTScope:
 
         self.start_position = 0
         self.end_position = 0
+        self.broadcaster.set_backlog(self.data)
         self.show_next_chunk()
 
+    def cmd_screen(self, args):
+        """Set the size of the screen compared by 'compare' and 'diff'.
+
+        Usage: screen [<columns>x<rows>]
+
+        The default is 80x25, the same as the canned tests.  With no
+        arguments, display the current setting.
+        """
+        if args:
+            m = re.match(r'^(\d+)x(\d+)$', args[0])
+            if not m or not int(m.group(1)) or not int(m.group(2)):
+                print('Expected <columns>x<rows>')
+                return
+
+            self.screen_columns = int(m.group(1))
+            self.screen_rows = int(m.group(2))
+
+        print('Screen is now: %sx%s' % (self.screen_columns, self.screen_rows))
+
     def cmd_seek(self, args):
         """Seek to a given position in the canned data.
 
@@ -487,8 +3177,10 @@ class VTScope:
         the stop offset at the given 1-based index.  Use the 'stops' command to
         list out the stop offsets defined by the log file.
 
-        If the resulting offset comes before the current position input will
-        be replayed from the beginning.
+        Everything up to the start of the chunk containing <offset> is sent
+        to the clients at once.  If that comes before the current position
+        input will be replayed from the beginning, unless 'checkpoints' are
+        on.
         """
         if not args:
             print('Missing argument')
@@ -498,27 +3190,29 @@ class VTScope:
             print('No data.')
             return
 
-        if args[0][0] == '#':
-            index = int(args[0][1:])
-            if index < 1 or index > len(self.stops):
-                print('No such stop.')
-                return
+        pos = self.parse_offset(args[0])
+        if pos is None:
+            return
 
-            pos = self.stops[index - 1]['offset']
+        self.goto(self.chunks.start(self.chunks.find(pos)))
 
-        else:
-            pos = int(args[0])
+    def cmd_stats(self, args):
+        """Display statistics about the canned data.
 
-        if pos > len(self.data):
-            print('Seek past end.')
-            return
+        Usage: stats [<count>]
 
-        if pos <= self.start_position:
-            self.cmd_reset([])
+        This shows how much of the data is made up of each kind of escape
+        sequence, the most common functions (sequences minus their parameters)
+        and sequences, the distribution of plain text run lengths, and the
+        largest sequences.  <count> sets how many entries to show in the top
+        lists, 10 by default.
+        """
+        if not self.chunks:
+            print('No data.')
+            return
 
-        while self.end_position <= pos:
-            self.broadcast_chunk()
-            self.show_next_chunk()
+        top = int(args[0]) if args else STATS_TOP
+        print_stats(collect_stats(self.data, self.chunks, top), top)
 
     def cmd_step(self, args):
         """Step over a given number of escape sequences, or 1 if not specified.
@@ -549,13 +3243,141 @@ def get_parser():
     parser = argparse.ArgumentParser(
         description=__doc__,
         formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('files', nargs='*', metavar='file',
+                        help='Canned data to open at startup, or to --serve.')
+    parser.add_argument('--clients', type=int, default=0, metavar='N',
+                        help='Wait for N clients to connect at startup.')
+    parser.add_argument('--wait', type=float, metavar='SECONDS',
+                        help='Give up if the clients have not connected '
+                             'within SECONDS.')
+    parser.add_argument('--play', action='store_true',
+                        help='Play the file without the REPL and exit.')
+    parser.add_argument('--pace', default='max',
+                        help='How fast to --play: max, real, or a speed '
+                             'factor, as for the\n"play" command. '
+                             '(default: %(default)s)')
+    parser.add_argument('--stats', action='store_true',
+                        help='Report statistics about the file as JSON and '
+                             'exit.')
+    parser.add_argument('--stop', metavar='OFFSET',
+                        help='Stop playing at OFFSET (or #N for a header stop) '
+                             'rather than the end.')
+    parser.add_argument('--batch', type=int, metavar='BYTES',
+                        help='Send at most BYTES at a time while playing.')
+    parser.add_argument('--policy', choices=Broadcaster.POLICIES,
+                        help='What to do with clients that fall behind.')
+    parser.add_argument('--serve', action='store_true',
+                        help='Serve independent replays of the files to every '
+                             'client that connects.')
+    parser.add_argument('--compare', action='store_true',
+                        help='Compare the screens of the clients (at least 2) '
+                             'while playing the\nfile, and report where they '
+                             'first differ.  Exits with 1 if they do.')
+    parser.add_argument('--every', type=int, metavar='N',
+                        help='--compare every N sequences rather than at each '
+                             'header stop.')
+    parser.add_argument('--screen', default='%sx%s' % (SCREEN_COLUMNS,
+                                                       SCREEN_ROWS),
+                        metavar='COLUMNSxROWS',
+                        help='The size of the screen to --compare. '
+                             '(default: %(default)s)')
+    parser.add_argument('--probe', type=int, metavar='BYTES',
+                        help='Time how long the clients take to answer a query '
+                             'sent every BYTES\nwhile playing, as for the '
+                             '"probe" command.')
+    parser.add_argument('--probe-query', choices=sorted(PROBE_QUERIES),
+                        default='dsr',
+                        help='The query to --probe with. '
+                             '(default: %(default)s)')
+    parser.add_argument('--websocket-port', type=int, default=WEBSOCKET_PORT,
+                        metavar='PORT',
+                        help='Accept WebSocket clients (like hterm pages) on '
+                             'PORT, or 0 for none.\n(default: %(default)s)')
+    parser.add_argument('--unix', metavar='PATH',
+                        help='Also accept clients on a Unix socket at PATH.')
+    parser.add_argument('--report', metavar='FILE',
+                        help='Write the --play, --stats or --compare report '
+                             'to FILE rather than\nstdout.')
     return parser
 
 
 def main(argv):
     """The main func!"""
     parser = get_parser()
-    parser.parse_args(argv)
+    opts = parser.parse_args(argv)
+
+    if opts.serve:
+        if not opts.files:
+            parser.error('--serve needs at least one file')
+
+        server = Server([os.path.expanduser(x) for x in opts.files],
+                        opts.pace, opts.batch or BATCH_SIZE)
+        try:
+            asyncio.run(server.serve(LISTEN_HOST, LISTEN_PORT, opts.unix))
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    if len(opts.files) > 1:
+        parser.error('only one file can be opened')
+    opts.file = opts.files[0] if opts.files else None
+
+    if (opts.play or opts.stats or opts.compare) and not opts.file:
+        parser.error('--play, --stats and --compare need a file')
+
+    vtscope = VTScope()
+    vtscope.websocket_port = opts.websocket_port
+    vtscope.unix_path = opts.unix
+    if opts.batch:
+        vtscope.batch_size = opts.batch
+    if opts.policy:
+        vtscope.broadcaster.policy = opts.policy
+
+    if opts.every is not None and opts.every <= 0:
+        parser.error('--every must be positive')
+    if opts.stop is not None and not re.match(r'^#?\d+$', opts.stop):
+        parser.error('invalid --stop: %s' % (opts.stop,))
+
+    if opts.probe is not None and opts.probe <= 0:
+        parser.error('--probe must be positive')
+    vtscope.probe_interval = opts.probe
+    vtscope.probe_query = opts.probe_query
+
+    m = re.match(r'^(\d+)x(\d+)$', opts.screen)
+    if not m:
+        parser.error('invalid --screen: %s' % (opts.screen,))
+    vtscope.screen_columns = int(m.group(1))
+    vtscope.screen_rows = int(m.group(2))
+
+    if opts.play or opts.stats or opts.compare:
+        # Keep stdout clean for the report.
+        with contextlib.redirect_stdout(sys.stderr):
+            if opts.stats:
+                vtscope.cmd_open([opts.file])
+                report = None
+                if vtscope.chunks is not None:
+                    report = collect_stats(vtscope.data, vtscope.chunks)
+            else:
+                vtscope.cmd_listen([])
+                clients = opts.clients
+                if opts.compare:
+                    clients = max(clients, 2)
+                report = vtscope.run_batch(opts.file, clients, opts.pace,
+                                           opts.stop, opts.wait, opts.compare,
+                                           opts.every)
+                vtscope.broadcaster.clear()
+
+        if report is None:
+            return 1
+
+        if opts.report:
+            with open(opts.report, 'w') as f:
+                json.dump(report, f, indent=2)
+                f.write('\n')
+        else:
+            json.dump(report, sys.stdout, indent=2)
+            print()
+        return 1 if report.get('diverged') else 0
 
     try:
         readline.read_history_file(HISTFILE)
@@ -564,7 +3386,11 @@ def main(argv):
 
     atexit.register(lambda: readline.write_history_file(HISTFILE))
 
-    vtscope = VTScope()
+    vtscope.cmd_listen([])
+    if opts.file:
+        vtscope.cmd_open([opts.file])
+    if opts.clients:
+        vtscope.broadcaster.wait_for_clients(opts.clients, opts.wait)
     vtscope.run()
 
 
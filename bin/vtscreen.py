@@ -0,0 +1,1611 @@
+#!/usr/bin/env python3
+# Copyright 2020 The Chromium OS Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""A reference model of the hterm screen, for checking canned sessions.
+
+The canned tests (../js/hterm_vt_canned_tests.js) play a recording through
+hterm in a browser, and compare the screen against the '@@ OFFSET' checkpoints
+in its header, which have to be written by hand.  This plays a recording
+through a model of the screen & cursor in Python instead, so checking a
+recording, or adding checkpoints to a new one, takes seconds and no browser.
+
+The model is a port of what hterm.Terminal, hterm.Screen & hterm.VT do to the
+text & the cursor, quirks and all.  Attributes are only tracked as far as they
+change that (e.g. erasing with a non-default background writes spaces).  It's
+set up like the canned tests: 80x25, DECCOLM allowed, and the iso-2022
+character maps in effect.  Character widths & maps are read from ../js/ so
+they stay in sync with hterm.
+
+Some caveats:
+
+    * The data is decoded as UTF-8, and C1 controls aren't recognized.
+    * Nothing is sent back, so queries (e.g. DSR) are ignored.
+    * Wide characters that don't fit at the end of a row might not come out
+      quite like they do in hterm.
+    * Offsets count bytes, as they do in vtscope.py.  The canned tests count
+      characters, which is only the same for ASCII data, so we warn about
+      checkpoints after any non-ASCII data.
+
+Rows are numbered from the top of the scrollback, like the checkpoints, so only
+as much scrollback is kept as the checkpoints look at.
+
+Sample usage:
+
+    # Check the checkpoints in some recordings.
+    ./vtscreen.py ../test_data/*.log
+
+    # Fill in the checkpoints left by vtrecord.py (which only know where the
+    # cursor is), add more every 64KiB, and write a copy with the new header.
+    ./vtscreen.py --every 64K -o /tmp/top-checked.log /tmp/top.log
+"""
+
+import argparse
+import codecs
+import contextlib
+import functools
+import math
+import os
+import re
+import shutil
+import sys
+import time
+
+from pathlib import Path
+
+import vtgen
+import vtpack
+import vtparse
+import vtscope
+
+
+BIN_DIR = Path(__file__).resolve().parent
+DIR = BIN_DIR.parent
+
+# Where hterm keeps its character width table & character maps.
+WC_TABLE = DIR / 'js' / 'hterm_wc_table.js'
+CHARACTER_MAPS = DIR / 'js' / 'hterm_vt_character_map.js'
+
+# The terminal size the canned tests use.
+COLUMNS = vtscope.SCREEN_COLUMNS
+ROWS = vtscope.SCREEN_ROWS
+
+# Same as hterm.Terminal.tabWidth.
+TAB_WIDTH = 8
+
+# How much canned data to play at a time.
+READ_SIZE = 1024 * 1024
+
+# Stop reporting the details of failures in a recording after this many
+# checkpoints.
+MAX_REPORTED = 10
+
+# The width classes in the table (see hterm.wc.Class), and their widths.  Like
+# hterm, we give controls no width.
+CLASS_WIDTHS = (0, 1, 2, 1, 0)
+
+# Parses the parts of WC_TABLE we need.
+WC_SHIFT_RE = re.compile(r'^\s*shift: (\d+),', re.MULTILINE)
+WC_ARRAY_RE = r'^\s*%s: \[([^\]]*)\]'
+
+# Parses CHARACTER_MAPS: the names a map is registered under, and its GL
+# mapping (or null for none).
+CHARACTER_MAP_RE = re.compile(
+    r"((?:hterm\.VT\.CharacterMaps\.DefaultMaps\['.'\] =\s*)+)"
+    r"new hterm\.VT\.CharacterMap\(\s*'[^']*', (null|\{.*?\})\);",
+    re.DOTALL)
+CHARACTER_MAP_NAME_RE = re.compile(r"DefaultMaps\['(.)'\]")
+CHARACTER_MAP_ENTRY_RE = re.compile(
+    r"'\\x([0-9a-fA-F]{2})':\s*'\\u([0-9a-fA-F]{4})'")
+
+# The C0 controls hterm acts on in plain text (see hterm.VT.CC1); it prints
+# the rest.
+CONTROLS = '\x00\x05\x07\x08\x09\x0a\x0b\x0c\x0d\x0e\x0f\x11\x13\x18\x1a\x7f'
+CONTROLS_RE = re.compile('([%s])' % (re.escape(CONTROLS),))
+
+# Matches a CSI that hterm can parse in one go: any modifiers before &
+# after the params, and the final byte.
+CSI_RE = re.compile(rb'\x1b\[([ -/<-?]*)([0-9:;]*)([ -/<-?]*)([@-~])\Z')
+
+# Parses an OSC: the command number, and its argument.
+OSC_RE = re.compile(r'(\d+);?(.*)', re.DOTALL)
+
+# The checkpoints vtrecord.py leaves as comments when it doesn't know where the
+# cursor is.
+UNKNOWN_STOP_RE = re.compile(rb'^#\s*OFFSET:(\d+)\b', re.MULTILINE)
+
+# Finds data where byte & character offsets part ways.
+NON_ASCII_RE = re.compile(rb'[\x80-\xff]')
+
+# The graphic character set designators, and which of G0-G3 they set.
+SCS_CODES = {'(': 0, ')': 1, '-': 1, '*': 2, '.': 2, '+': 3, '/': 3}
+
+# The SGR codes that just set attributes (see hterm.VT.CSI['m']).  A value of
+# None turns the attribute off.
+SGR_ATTRIBUTES = {
+    1: {'bold': True},
+    2: {'faint': True},
+    3: {'italic': True},
+    4: {'underline': 'solid'},
+    5: {'blink': True},
+    7: {'inverse': True},
+    8: {'invisible': True},
+    9: {'strikethrough': True},
+    21: {'underline': 'double'},
+    22: {'bold': None, 'faint': None},
+    23: {'italic': None},
+    24: {'underline': None},
+    25: {'blink': None},
+    27: {'inverse': None},
+    28: {'invisible': None},
+    29: {'strikethrough': None},
+}
+
+# The underline styles for SGR 4 with a subparameter.
+UNDERLINE_STYLES = (None, 'solid', 'double', 'wavy', 'dotted', 'dashed')
+
+# The size of hterm's color palette.
+PALETTE_SIZE = 256
+
+
+def decode_runs(values):
+    """Decode a run-length encoded list (see mkwcwidth)."""
+    return [values[i] for i in range(0, len(values), 2)
+            for _ in range(values[i + 1])]
+
+
+@functools.lru_cache(maxsize=None)
+def load_wc_table():
+    """Load the character width table as an (index, blocks, shift) tuple."""
+    text = WC_TABLE.read_text()
+
+    def _array(name):
+        m = re.search(WC_ARRAY_RE % (name,), text, re.MULTILINE)
+        return decode_runs([int(x) for x in m.group(1).split(',')
+                            if x.strip()])
+
+    shift = int(WC_SHIFT_RE.search(text).group(1))
+    return (_array('index'), bytes(_array('blocks')), shift)
+
+
+@functools.lru_cache(maxsize=4096)
+def char_width(ch):
+    """Get the column width of a character, like hterm.wc.charWidth()."""
+    cp = ord(ch)
+    if 0x20 <= cp < 0x7f:
+        return 1
+
+    (index, blocks, shift) = load_wc_table()
+    block = cp >> shift
+    if block >= len(index):
+        return 1
+    return CLASS_WIDTHS[blocks[(index[block] << shift) |
+                              (cp & ((1 << shift) - 1))]]
+
+
+@functools.lru_cache(maxsize=None)
+def load_character_maps():
+    """Load hterm's character maps.
+
+    Returns:
+      A dict mapping each map name (as used in SCS sequences) to a
+      str.translate() table, or to None for maps that don't change anything.
+    """
+    maps = {}
+    for m in CHARACTER_MAP_RE.finditer(CHARACTER_MAPS.read_text()):
+        table = None
+        if m.group(2) != 'null':
+            table = {int(x, 16): chr(int(y, 16))
+                     for (x, y) in CHARACTER_MAP_ENTRY_RE.findall(m.group(2))}
+        for name in CHARACTER_MAP_NAME_RE.findall(m.group(1)):
+            maps[name] = table
+    return maps
+
+
+def text_cells(text):
+    """Split text into screen cells.
+
+    Each cell holds one column's worth of text: a character, along with any
+    zero width characters that follow it.  Wide characters take up two cells,
+    the second of which is empty.
+
+    Returns:
+      A (cells, lead) tuple, where lead is any zero width characters at the
+      start of the text, which belong with the cell before it.
+    """
+    if text.isascii() and text.isprintable():
+        return (list(text), '')
+
+    cells = []
+    lead = ''
+    for ch in text:
+        width = char_width(ch)
+        if width:
+            cells.append(ch)
+            if width == 2:
+                cells.append('')
+        elif not cells:
+            lead += ch
+        elif cells[-1]:
+            cells[-1] += ch
+        else:
+            cells[-2] += ch
+    return (cells, lead)
+
+
+def clip_cells(cells, start, end):
+    """Get the characters starting in a range of cells.
+
+    This is like lib.wc.substr(): a wide character cut off by the start of the
+    range is dropped, and one cut off by the end is kept.
+    """
+    part = cells[start:end]
+    while part and not part[0]:
+        part.pop(0)
+    if part and end < len(cells) and not cells[end]:
+        part.append('')
+    return part
+
+
+def split_wide(row, column):
+    """Break up a wide character that straddles |column| in a row.
+
+    This is about what hterm does when it has to cut one in half: the half that
+    survives becomes a space.
+    """
+    if 0 < column < len(row) and not row[column]:
+        row[column - 1] = row[column] = ' '
+
+
+def iarg(args, index, default):
+    """Get an integer argument, like hterm.VT.ParseState.iarg()."""
+    if index < len(args):
+        # Args only have digits & colons, and parseInt() stops at the colon.
+        value = args[index].partition(':')[0]
+        if value and int(value):
+            return int(value)
+    return default
+
+
+def js_mod(a, b):
+    """Get the remainder of a / b, with the sign of a like JavaScript's %."""
+    return int(math.fmod(a, b))
+
+
+class Screen:
+    """One of the terminal's screens (primary or alternate).
+
+    Like hterm.Screen, this holds the rows, the cursor, the current attributes,
+    and the saved cursor state.
+    """
+
+    def __init__(self, columns, rows):
+        self.columns = columns
+
+        # The rows, each a list of cells (see text_cells()).  Rows only have as
+        # many cells as have been written to.
+        self.lines = [[] for _ in range(rows)]
+
+        # The cursor, and whether the last thing printed ran off the end of the
+        # row (so the next character wraps).
+        self.row = 0
+        self.column = 0
+        self.overflow = False
+
+        # The non-default text attributes.
+        self.attrs = {}
+
+        # What ESC 7 saved.
+        self.saved = None
+
+    def reset_attributes(self):
+        """Reset the attributes, like hterm.TextAttributes.reset().
+
+        That doesn't touch the tile data (see CSI z), so neither do we.
+        """
+        tile = self.attrs.get('tile')
+        self.attrs.clear()
+        if tile is not None:
+            self.attrs['tile'] = tile
+
+    def is_default(self):
+        """Whether the attributes are all defaults (see TextAttributes)."""
+        return not self.attrs
+
+    def set_cursor_position(self, row, column):
+        """Move the cursor, clamping it to the screen."""
+        self.row = max(0, min(row, len(self.lines) - 1))
+        self.column = max(0, min(column, self.columns - 1))
+        self.overflow = False
+
+    def clear_cursor_row(self):
+        """Clear the cursor row, and move to its start."""
+        if self.is_default():
+            self.lines[self.row] = []
+        else:
+            self.lines[self.row] = [' '] * self.columns
+        self.column = 0
+        self.overflow = False
+
+    def insert_string(self, cells, lead=''):
+        """Insert some cells at the cursor, and move past them."""
+        row = self.lines[self.row]
+        column = self.column
+        if column > len(row):
+            row.extend([' '] * (column - len(row)))
+        else:
+            split_wide(row, column)
+        if lead and column:
+            prev = column - 1
+            while prev and not row[prev]:
+                prev -= 1
+            row[prev] += lead
+        row[column:column] = cells
+        self.column += len(cells)
+
+    def overwrite_string(self, cells, lead=''):
+        """Write some cells over what's at the cursor."""
+        space = self.columns - self.column
+        if not space:
+            return
+        self.delete_chars(min(len(cells), space))
+        self.insert_string(cells, lead)
+
+    def delete_chars(self, count):
+        """Delete cells at the cursor, shifting the rest of the row left.
+
+        Returns:
+          How many cells were deleted, which is |count| clamped to the rest of
+          the screen (not the row).
+        """
+        count = min(count, self.columns - self.column)
+        if count <= 0:
+            return 0
+        row = self.lines[self.row]
+        split_wide(row, self.column)
+        split_wide(row, self.column + count)
+        del row[self.column:self.column + count]
+        return count
+
+    def maybe_clip_current_row(self):
+        """Cut the cursor row down to size, and keep the cursor on screen."""
+        row = self.lines[self.row]
+        if len(row) > self.columns:
+            split_wide(row, self.columns)
+            del row[self.columns:]
+        if self.column >= self.columns:
+            self.column = self.columns - 1
+            self.overflow = True
+
+
+class Terminal:
+    """A model of an hterm.Terminal.
+
+    Data is fed in with feed(), and the state can be read back with row_text()
+    and the cursor attributes.  Method names follow hterm's.
+    """
+
+    def __init__(self, columns=COLUMNS, rows=ROWS, scrollback=0):
+        """Create a terminal.
+
+        Args:
+          columns: The width of the screen.
+          rows: The height of the screen.
+          scrollback: How many rows of scrollback to keep (the rest are only
+              counted).
+        """
+        self.columns = columns
+        self.rows = rows
+        self.scrollback_limit = scrollback
+        self.scrollback = []
+        self.scrollback_size = 0
+
+        self.primary = Screen(columns, rows)
+        self.alternate = Screen(columns, rows)
+        self.screen = self.primary
+
+        self.maps = load_character_maps()
+        self.utf8 = False
+        self.utf8_locked = False
+        self.allow_column_changes = True
+
+        self.tab_stops = []
+        self.default_tab_stops = True
+
+        self.tokenizer = vtparse.Tokenizer()
+        self.pending = bytearray()
+        self.decoder = codecs.getincrementaldecoder('utf-8')('replace')
+
+        self.reset()
+
+    def reset(self):
+        """Do a full reset (RIS), like hterm.Terminal.reset()."""
+        self.vt_reset()
+        self.tab_stops = []
+        self.set_default_tab_stops()
+        for screen in (self.primary, self.alternate):
+            screen.reset_attributes()
+            self.clear_home(screen)
+            self.save_cursor_and_state(screen)
+        self.reset_options()
+        self.set_vt_scroll_region(None, None)
+
+    def soft_reset(self):
+        """Do a soft reset (DECSTR)."""
+        self.vt_reset()
+        self.reset_options()
+        for screen in (self.primary, self.alternate):
+            screen.reset_attributes()
+            self.save_cursor_and_state(screen)
+        self.set_vt_scroll_region(None, None)
+
+    def vt_reset(self):
+        """Reset the character sets, like hterm.VT.reset()."""
+        self.charsets = ['B'] * 4
+        self.gl = 0
+        self.gr = 0
+
+    def reset_options(self):
+        """Reset the modes to their defaults (see hterm.Options)."""
+        self.wraparound = True
+        self.reverse_wraparound = False
+        self.origin_mode = False
+        self.auto_carriage_return = False
+        self.insert_mode = False
+
+    def feed(self, data):
+        """Interpret some data.
+
+        Plain text is acted on right away, and escape sequences as soon as
+        they're complete, so sequences can be split across calls.
+        """
+        tokenizer = self.tokenizer
+        base = tokenizer.start
+        self.pending += data
+        chunks = tokenizer.feed(data) + tokenizer.flush()
+        pending = self.pending
+        for (start, end, kind) in chunks:
+            chunk = bytes(pending[start - base:end - base])
+            if kind == vtparse.TEXT:
+                self.interpret_text(chunk)
+            elif kind == vtparse.CSI:
+                self.interpret_csi(chunk)
+            elif kind == vtparse.OSC:
+                self.interpret_osc(chunk)
+            elif kind in (vtparse.DEC, vtparse.CHR, vtparse.SCS, vtparse.ESC):
+                self.interpret_escape(chunk)
+        del pending[:tokenizer.start - base]
+
+    def row_count(self):
+        """Get the number of rows, including the scrollback."""
+        return self.scrollback_size + len(self.screen.lines)
+
+    def row_text(self, index):
+        """Get the text of a row, like hterm.Terminal.getRowText().
+
+        Returns:
+          The text, or None if the row doesn't exist, or is in the scrollback
+          but wasn't kept.
+        """
+        if index < self.scrollback_size:
+            if index < len(self.scrollback):
+                return self.scrollback[index]
+            return None
+        index -= self.scrollback_size
+        if index < len(self.screen.lines):
+            return ''.join(self.screen.lines[index])
+        return None
+
+    @property
+    def cursor(self):
+        """The (row, column) of the cursor."""
+        return (self.screen.row, self.screen.column)
+
+    #
+    # Parsing.
+    #
+
+    def interpret_text(self, data):
+        """Print some plain text, acting on any controls in it."""
+        if data.isascii() and not self.decoder.getstate()[0]:
+            text = data.decode('ascii')
+        else:
+            text = self.decoder.decode(data)
+        for (i, part) in enumerate(CONTROLS_RE.split(text)):
+            if i % 2:
+                self.interpret_control(part)
+            elif part:
+                self.print_mapped(part)
+
+    def print_mapped(self, text):
+        """Print text through the GL character set."""
+        if not self.utf8:
+            table = self.maps.get(self.charsets[self.gl])
+            if table:
+                text = text.translate(table)
+        self.print(text)
+
+    def interpret_control(self, ch):
+        """Act on a C0 control (see hterm.VT.CC1)."""
+        if ch == '\x08':
+            self.cursor_left(1)
+        elif ch == '\x09':
+            self.forward_tab_stop()
+        elif ch in '\x0a\x0b\x0c':
+            self.form_feed()
+        elif ch == '\x0d':
+            self.set_cursor_column(0)
+        elif ch == '\x0e':
+            self.gl = 1
+        elif ch == '\x0f':
+            self.gl = 0
+        elif ch in '\x18\x1a':
+            if self.gl == 1:
+                self.gl = 0
+            self.print('?')
+
+    def interpret_escape(self, data):
+        """Act on an escape sequence other than a CSI or a string.
+
+        Like hterm, anything the sequence didn't consume is printed.
+        """
+        text = data.decode('utf-8', 'replace')
+        code = text[1:2]
+        rest = 2
+        if code in SCS_CODES:
+            rest = 3
+            name = text[2:3]
+            if name in self.maps:
+                self.charsets[SCS_CODES[code]] = name
+        elif code == '#':
+            rest = 3
+            if text[2:3] == '8':
+                # DEC Screen Alignment Test (DECALN).
+                self.set_cursor_position(0, 0)
+                self.fill('E')
+        elif code == '%':
+            rest = 3
+            if text[2:3] == '/':
+                rest = 4
+            if not self.utf8_locked:
+                self.set_encoding(text[2:rest])
+        elif code == ' ':
+            rest = 3
+        elif code == 'D':
+            self.line_feed()
+        elif code == 'E':
+            self.set_cursor_column(0)
+            self.cursor_down(1)
+        elif code == 'H':
+            self.set_tab_stop(self.screen.column)
+        elif code == 'M':
+            self.reverse_line_feed()
+        elif code == 'c':
+            self.reset()
+        elif code == '7':
+            self.save_cursor_and_state()
+        elif code == '8':
+            self.restore_cursor_and_state()
+        elif code == 'n':
+            self.gl = 2
+        elif code == 'o':
+            self.gl = 3
+        elif code and code in '~}|':
+            self.gr = '~}|'.index(code) + 1
+
+        if text[rest:]:
+            self.interpret_text(data[len(text[:rest].encode('utf-8')):])
+
+    def set_encoding(self, code):
+        """Act on a DOCS (ESC %) sequence."""
+        if code == '@':
+            self.utf8 = False
+        elif code == 'G':
+            self.utf8 = True
+        elif code in ('/G', '/H', '/I'):
+            self.utf8 = self.utf8_locked = True
+
+    def interpret_osc(self, data):
+        """Act on an OSC.  Only hyperlinks matter to the screen."""
+        if data.endswith(b'\x07'):
+            data = data[2:-1]
+        elif data.endswith(b'\x1b\\'):
+            data = data[2:-2]
+        else:
+            return
+
+        m = OSC_RE.match(data.decode('utf-8', 'replace'))
+        if not m or m.group(1) != '8':
+            return
+        args = m.group(2).split(';')
+        if len(args) == 2 and args[1]:
+            self.screen.attrs['uri'] = args[1]
+        else:
+            self.screen.attrs.pop('uri', None)
+
+    def interpret_csi(self, data):
+        """Parse & act on a CSI, like hterm.VT.parseCSI_()."""
+        m = CSI_RE.match(data)
+        if m:
+            # The common case, with nothing out of place.
+            (leading, params, trailing, final) = m.groups()
+            if b':' not in params or final == b'm':
+                self.dispatch_csi((leading + trailing + final).decode(),
+                                  params.decode().split(';') if params else [])
+            return
+
+        text = data[2:].decode('utf-8', 'replace')
+        args = []
+        subargs = False
+        leading = trailing = ''
+        for (i, ch) in enumerate(text):
+            if '@' <= ch <= '~':
+                if not subargs or ch == 'm':
+                    self.dispatch_csi(leading + trailing + ch, args)
+                return
+            elif ch == ';':
+                if trailing:
+                    break
+                if not args:
+                    args.append('')
+                args.append('')
+            elif '0' <= ch <= '9' or ch == ':':
+                if trailing:
+                    break
+                if not args:
+                    args.append(ch)
+                else:
+                    args[-1] += ch
+                if ch == ':':
+                    subargs = True
+            elif ' ' <= ch <= '?':
+                if not args:
+                    leading += ch
+                else:
+                    trailing += ch
+            elif ch in CONTROLS:
+                self.interpret_control(ch)
+                if ch in '\x18\x1a':
+                    break
+            else:
+                break
+        else:
+            return
+
+        # The sequence was aborted, and the rest of it is plain text.
+        rest = text[i + 1:]
+        if rest:
+            self.interpret_text(rest.encode('utf-8'))
+
+    def dispatch_csi(self, code, args):
+        """Act on a parsed CSI (see hterm.VT.CSI)."""
+        if code == 'm':
+            self.set_sgr(args)
+        elif code == '@':
+            self.insert_space(iarg(args, 0, 1))
+        elif code == 'A':
+            self.cursor_up(iarg(args, 0, 1))
+        elif code == 'B':
+            self.cursor_down(iarg(args, 0, 1))
+        elif code == 'C':
+            self.cursor_right(iarg(args, 0, 1))
+        elif code == 'D':
+            self.cursor_left(iarg(args, 0, 1))
+        elif code == 'E':
+            self.cursor_down(iarg(args, 0, 1))
+            self.set_cursor_column(0)
+        elif code == 'F':
+            self.cursor_up(iarg(args, 0, 1))
+            self.set_cursor_column(0)
+        elif code in ('G', '`'):
+            self.set_cursor_column(iarg(args, 0, 1) - 1)
+        elif code in ('H', 'f'):
+            self.set_cursor_position(iarg(args, 0, 1) - 1,
+                                     iarg(args, 1, 1) - 1)
+        elif code == 'I':
+            for _ in range(max(1, min(iarg(args, 0, 1), self.columns))):
+                self.forward_tab_stop()
+        elif code in ('J', '?J'):
+            arg = int(args[0] or 0) if args else 0
+            if arg == 0:
+                self.erase_below()
+            elif arg == 1:
+                self.erase_above()
+            elif arg == 2:
+                self.clear()
+            elif arg == 3:
+                self.clear_scrollback()
+        elif code in ('K', '?K'):
+            arg = int(args[0] or 0) if args else 0
+            if arg == 0:
+                self.erase_to_right()
+            elif arg == 1:
+                self.erase_to_left()
+            elif arg == 2:
+                self.erase_line()
+        elif code == 'L':
+            self.insert_lines(iarg(args, 0, 1))
+        elif code == 'M':
+            self.delete_lines(iarg(args, 0, 1))
+        elif code == 'P':
+            self.delete_chars(iarg(args, 0, 1))
+        elif code == 'S':
+            self.vt_scroll_up(iarg(args, 0, 1))
+        elif code == 'T':
+            if len(args) <= 1:
+                self.vt_scroll_down(iarg(args, 0, 1))
+        elif code == 'X':
+            self.erase_to_right(iarg(args, 0, 1))
+        elif code == 'Z':
+            for _ in range(max(1, min(iarg(args, 0, 1), self.columns))):
+                self.backward_tab_stop()
+        elif code == 'a':
+            self.set_cursor_column(self.screen.column + iarg(args, 0, 1))
+        elif code == 'd':
+            self.set_absolute_cursor_row(iarg(args, 0, 1) - 1)
+        elif code == 'g':
+            arg = int(args[0] or 0) if args else 0
+            if arg == 0:
+                self.clear_tab_stop_at_cursor()
+            elif arg == 3:
+                self.clear_all_tab_stops()
+        elif code in ('h', 'l'):
+            for arg in args:
+                self.set_ansi_mode(int(arg or 0), code == 'h')
+        elif code in ('?h', '?l'):
+            for arg in args:
+                if arg:
+                    self.set_dec_mode(int(arg), code == '?h')
+        elif code == '!p':
+            self.soft_reset()
+        elif code == 'r':
+            top = int(args[0]) if args and args[0] else 0
+            bottom = int(args[1]) if len(args) > 1 and args[1] else self.rows
+            if top < 0 or bottom > self.rows or bottom <= top:
+                return
+            self.set_vt_scroll_region(top - 1 if top else None, bottom - 1)
+            self.set_cursor_position(0, 0)
+        elif code == 's':
+            self.save_cursor_and_state()
+        elif code == 'u':
+            self.restore_cursor_and_state()
+        elif code == 'z':
+            if args and args[0] and int(args[0]) == 0:
+                if len(args) >= 2:
+                    self.screen.attrs['tile'] = args[1]
+            elif args and args[0] and int(args[0]) == 1:
+                self.screen.attrs.pop('tile', None)
+
+    def set_ansi_mode(self, code, state):
+        """Set an ANSI mode (SM/RM)."""
+        if code == 4:
+            self.insert_mode = state
+        elif code == 20:
+            self.auto_carriage_return = state
+
+    def set_dec_mode(self, code, state):
+        """Set a DEC private mode (DECSET/DECRST)."""
+        if code == 3:
+            if self.allow_column_changes:
+                self.set_width(132 if state else 80)
+                self.clear_home()
+                self.set_vt_scroll_region(None, None)
+        elif code == 6:
+            self.origin_mode = state
+            self.set_cursor_position(0, 0)
+        elif code == 7:
+            self.wraparound = state
+        elif code == 40:
+            self.allow_column_changes = state
+        elif code == 45:
+            self.reverse_wraparound = state
+        elif code in (47, 1047):
+            self.set_alternate_mode(state)
+        elif code == 1048:
+            if state:
+                self.save_cursor_and_state()
+            else:
+                self.restore_cursor_and_state()
+        elif code == 1049:
+            if state:
+                self.save_cursor_and_state()
+                self.set_alternate_mode(state)
+                self.clear()
+            else:
+                self.set_alternate_mode(state)
+                self.restore_cursor_and_state()
+
+    def set_sgr(self, args):
+        """Set the text attributes (SGR)."""
+        attrs = self.screen.attrs
+        if not args:
+            self.screen.reset_attributes()
+            return
+
+        def _set(changes):
+            for (name, value) in changes.items():
+                if value is None:
+                    attrs.pop(name, None)
+                else:
+                    attrs[name] = value
+
+        i = 0
+        while i < len(args):
+            arg = iarg(args, i, 0)
+            if arg == 0:
+                self.screen.reset_attributes()
+            elif arg == 4 and ':' in args[i]:
+                style = args[i].split(':')[1]
+                style = int(style) if style.isdigit() else 0
+                if style < len(UNDERLINE_STYLES):
+                    _set({'underline': UNDERLINE_STYLES[style]})
+            elif arg in SGR_ATTRIBUTES:
+                _set(SGR_ATTRIBUTES[arg])
+            elif 30 <= arg <= 37 or 90 <= arg <= 97:
+                attrs['fg'] = arg
+            elif arg == 39:
+                attrs.pop('fg', None)
+            elif 40 <= arg <= 47 or 100 <= arg <= 107:
+                attrs['bg'] = arg
+            elif arg == 49:
+                attrs.pop('bg', None)
+            elif arg in (38, 48, 58):
+                (color, skip) = self.parse_sgr_extended_color(args, i)
+                # The underline color doesn't count as an attribute.
+                if color is not None and arg != 58:
+                    attrs['fg' if arg == 38 else 'bg'] = color
+                i += skip
+            i += 1
+
+    @staticmethod
+    def parse_sgr_extended_color(args, i):
+        """Parse an SGR 38/48/58 color, like hterm.VT.parseSgrExtendedColors.
+
+        Returns:
+          A (color, skip) tuple of the color (or None if there isn't a valid
+          one), and how many more args it used.
+        """
+        if ':' in args[i]:
+            values = args[i].split(':')[1:]
+            subargs = True
+        elif i + 1 < len(args) and ':' in args[i + 1]:
+            return (None, 0)
+        else:
+            values = args[i + 1:]
+            subargs = False
+
+        def _int(value):
+            return int(value) if value.isdigit() else 0
+
+        kind = _int(values[0]) if values else 0
+        if kind == 1 and subargs:
+            return ('transparent', 0)
+        if kind == 2:
+            start = 2 if subargs and len(values) != 4 else 1
+            if len(values) < start + 3:
+                return (None, 0)
+            color = 'rgb(%s)' % (','.join(str(_int(x)) for x in
+                                          values[start:start + 3]),)
+            return (color, 0 if subargs else 4)
+        if kind == 5:
+            if len(values) < 2:
+                return (None, 0)
+            color = _int(values[1])
+            return (color if color < PALETTE_SIZE else None,
+                    0 if subargs else 2)
+        return (None, 0)
+
+    #
+    # Screen operations, following hterm.Terminal.
+    #
+
+    def set_width(self, columns):
+        """Change the width of the screen."""
+        self.columns = columns
+        self.realize_width()
+
+    def realize_width(self):
+        """Make the current screen match the width, and fix up tab stops."""
+        screen = self.screen
+        delta = self.columns - screen.columns
+        if not delta:
+            return
+        screen.columns = self.columns
+        if delta > 0:
+            if self.default_tab_stops:
+                self.set_default_tab_stops(self.columns - delta)
+        else:
+            while self.tab_stops and self.tab_stops[-1] >= self.columns:
+                self.tab_stops.pop()
+        if screen.column >= screen.columns:
+            screen.set_cursor_position(screen.row, screen.columns - 1)
+
+    def set_alternate_mode(self, state):
+        """Switch between the primary & alternate screens."""
+        if state == (self.screen is self.alternate):
+            return
+        cursor = self.save_cursor()
+        self.screen = self.alternate if state else self.primary
+        self.realize_width()
+        self.restore_cursor(cursor)
+
+    def save_cursor(self):
+        """Get the cursor position, to hand to restore_cursor()."""
+        screen = self.screen
+        return (screen.row, screen.column, screen.overflow)
+
+    def restore_cursor(self, cursor):
+        """Put the cursor back where save_cursor() found it."""
+        (row, column, overflow) = cursor
+        screen = self.screen
+        screen.set_cursor_position(max(0, min(row, self.rows - 1)),
+                                   max(0, min(column, self.columns - 1)))
+        if column > screen.column or (column == screen.column and overflow):
+            screen.overflow = True
+
+    def save_cursor_and_state(self, screen=None):
+        """Save the cursor, attributes & character sets (DECSC)."""
+        if screen is None:
+            screen = self.screen
+        screen.saved = (self.save_cursor(), dict(screen.attrs),
+                        self.gl, self.gr, list(self.charsets))
+
+    def restore_cursor_and_state(self):
+        """Restore what save_cursor_and_state() saved (DECRC)."""
+        screen = self.screen
+        (cursor, attrs, self.gl, self.gr, charsets) = screen.saved
+        self.restore_cursor(cursor)
+        screen.attrs = dict(attrs)
+        self.charsets = list(charsets)
+
+    def set_vt_scroll_region(self, top, bottom):
+        """Set the scroll region, where None means the edge of the screen."""
+        self.scroll_top = top
+        self.scroll_bottom = bottom
+        if bottom == self.rows - 1:
+            self.scroll_bottom = None
+            if top == 0:
+                self.scroll_top = None
+
+    def vt_scroll_top(self):
+        """Get the top row of the scroll region."""
+        return 0 if self.scroll_top is None else self.scroll_top
+
+    def vt_scroll_bottom(self):
+        """Get the bottom row of the scroll region."""
+        return self.rows - 1 if self.scroll_bottom is None else \
+            self.scroll_bottom
+
+    def set_cursor_position(self, row, column):
+        """Move the cursor, relative to the scroll region in origin mode."""
+        if self.origin_mode:
+            top = self.vt_scroll_top()
+            row = max(top, min(row + top, self.vt_scroll_bottom()))
+            column = max(0, min(column, self.columns - 1))
+            self.screen.set_cursor_position(row, column)
+        else:
+            self.set_absolute_cursor_position(row, column)
+
+    def set_absolute_cursor_position(self, row, column):
+        """Move the cursor, clamping it to the screen."""
+        self.screen.set_cursor_position(max(0, min(row, self.rows - 1)),
+                                        max(0, min(column, self.columns - 1)))
+
+    def set_cursor_column(self, column):
+        """Move the cursor within its row."""
+        self.set_absolute_cursor_position(self.screen.row, column)
+
+    def set_absolute_cursor_row(self, row):
+        """Move the cursor to another row, keeping its column."""
+        self.set_absolute_cursor_position(row, self.screen.column)
+
+    def scroll_off(self, lines):
+        """Push rows that scrolled off the top into the scrollback."""
+        for line in lines:
+            if self.scrollback_size < self.scrollback_limit:
+                self.scrollback.append(''.join(line))
+            self.scrollback_size += 1
+
+    def clear_scrollback(self):
+        """Throw away the scrollback."""
+        self.scrollback = []
+        self.scrollback_size = 0
+
+    def print(self, text):
+        """Print text at the cursor, wrapping as needed."""
+        (cells, lead) = text_cells(text)
+        screen = self.screen
+        width = len(cells)
+        if not width:
+            if not lead:
+                return
+            # Like hterm, go around at least once for zero width text.
+            width = 1
+
+        start = 0
+        while start < width:
+            if self.wraparound and screen.overflow:
+                self.new_line()
+
+            count = width - start
+            overflow = screen.column + count >= self.columns
+            if overflow:
+                count = self.columns - screen.column
+
+            if overflow and not self.wraparound:
+                # The last character printed is the last one of the text.
+                part = (clip_cells(cells, start, start + count - 1) +
+                        clip_cells(cells, width - 1, width))
+                count = width
+            else:
+                part = clip_cells(cells, start, start + count)
+
+            part_lead = lead if start == 0 else ''
+            if self.insert_mode:
+                screen.insert_string(part, part_lead)
+            else:
+                screen.overwrite_string(part, part_lead)
+            screen.maybe_clip_current_row()
+            start += count
+
+    def new_line(self):
+        """Move to the start of the next row, scrolling if need be."""
+        screen = self.screen
+        at_end_of_screen = screen.row == len(screen.lines) - 1
+        at_end_of_region = screen.row == self.vt_scroll_bottom()
+
+        if self.scroll_top is not None and at_end_of_region:
+            self.vt_scroll_up(1)
+            self.set_absolute_cursor_position(screen.row, 0)
+        elif at_end_of_screen:
+            screen.lines.append([])
+            extra = len(screen.lines) - self.rows
+            if extra > 0:
+                self.scroll_off(screen.lines[:extra])
+                del screen.lines[:extra]
+            self.set_absolute_cursor_position(len(screen.lines) - 1, 0)
+        elif at_end_of_region:
+            self.scroll_off(screen.lines[:1])
+            del screen.lines[0]
+            screen.lines.insert(screen.row, [])
+            self.set_absolute_cursor_position(screen.row, 0)
+        else:
+            self.set_absolute_cursor_position(screen.row + 1, 0)
+
+    def line_feed(self):
+        """Move to the next row, keeping the column."""
+        column = self.screen.column
+        self.new_line()
+        self.set_cursor_column(column)
+
+    def form_feed(self):
+        """Act on LF, VT & FF."""
+        if self.auto_carriage_return:
+            self.new_line()
+        else:
+            self.line_feed()
+
+    def reverse_line_feed(self):
+        """Move up a row, scrolling down at the top of the scroll region."""
+        if self.screen.row == self.vt_scroll_top():
+            self.insert_lines(1)
+        else:
+            self.set_absolute_cursor_row(self.screen.row - 1)
+
+    def move_rows(self, start, count, to):
+        """Move some rows to another place on the screen."""
+        lines = self.screen.lines
+        moved = lines[start:start + count]
+        del lines[start:start + count]
+        lines[to:to] = moved
+
+    def insert_lines(self, count):
+        """Insert blank rows at the cursor, within the scroll region."""
+        row = self.screen.row
+        bottom = self.vt_scroll_bottom()
+        count = min(count, bottom - row)
+        move_count = bottom - row - count + 1
+        if move_count:
+            self.move_rows(row, move_count, row + count)
+        for i in range(count - 1, -1, -1):
+            self.set_absolute_cursor_position(row + i, 0)
+            self.screen.clear_cursor_row()
+
+    def delete_lines(self, count):
+        """Delete rows at the cursor, within the scroll region."""
+        cursor = self.save_cursor()
+        top = cursor[0]
+        bottom = self.vt_scroll_bottom()
+        max_count = bottom - top + 1
+        count = min(count, max_count)
+        move_start = bottom - count + 1
+        if count != max_count:
+            self.move_rows(top, count, move_start)
+        for i in range(count):
+            self.set_absolute_cursor_position(move_start + i, 0)
+            self.screen.clear_cursor_row()
+        self.restore_cursor(cursor)
+        self.screen.overflow = False
+
+    def insert_space(self, count):
+        """Insert blanks at the cursor (ICH)."""
+        cursor = self.save_cursor()
+        self.screen.insert_string([' '] * (count or 1))
+        self.screen.maybe_clip_current_row()
+        self.restore_cursor(cursor)
+        self.screen.overflow = False
+
+    def delete_chars(self, count):
+        """Delete characters at the cursor (DCH)."""
+        deleted = self.screen.delete_chars(count)
+        if deleted and not self.screen.is_default():
+            cursor = self.save_cursor()
+            self.set_cursor_column(self.columns - deleted)
+            self.screen.insert_string([' '] * deleted)
+            self.restore_cursor(cursor)
+        self.screen.overflow = False
+
+    def vt_scroll_up(self, count):
+        """Scroll the scroll region up."""
+        cursor = self.save_cursor()
+        self.set_absolute_cursor_row(self.vt_scroll_top())
+        self.delete_lines(count)
+        self.restore_cursor(cursor)
+
+    def vt_scroll_down(self, count):
+        """Scroll the scroll region down."""
+        cursor = self.save_cursor()
+        self.set_absolute_cursor_position(self.vt_scroll_top(), 0)
+        self.insert_lines(count)
+        self.restore_cursor(cursor)
+
+    def erase_to_left(self):
+        """Blank the row up to & including the cursor."""
+        cursor = self.save_cursor()
+        self.set_cursor_column(0)
+        self.screen.overwrite_string([' '] * (cursor[1] + 1))
+        self.restore_cursor(cursor)
+
+    def erase_to_right(self, count=None):
+        """Blank the row from the cursor on."""
+        screen = self.screen
+        if screen.overflow:
+            return
+
+        space = self.columns - screen.column
+        count = min(count, space) if count else space
+
+        if 'bg' not in screen.attrs and 'inverse' not in screen.attrs:
+            if len(screen.lines[screen.row]) <= screen.column + count:
+                screen.delete_chars(count)
+                screen.overflow = False
+                return
+
+        cursor = self.save_cursor()
+        screen.overwrite_string([' '] * count)
+        self.restore_cursor(cursor)
+        screen.overflow = False
+
+    def erase_line(self):
+        """Blank the cursor row."""
+        cursor = self.save_cursor()
+        self.screen.clear_cursor_row()
+        self.restore_cursor(cursor)
+        self.screen.overflow = False
+
+    def erase_above(self):
+        """Blank everything up to & including the cursor."""
+        cursor = self.save_cursor()
+        self.erase_to_left()
+        for i in range(cursor[0]):
+            self.set_absolute_cursor_position(i, 0)
+            self.screen.clear_cursor_row()
+        self.restore_cursor(cursor)
+        self.screen.overflow = False
+
+    def erase_below(self):
+        """Blank everything from the cursor on."""
+        cursor = self.save_cursor()
+        self.erase_to_right()
+        for i in range(cursor[0] + 1, self.rows):
+            self.set_absolute_cursor_position(i, 0)
+            self.screen.clear_cursor_row()
+        self.restore_cursor(cursor)
+        self.screen.overflow = False
+
+    def fill(self, ch):
+        """Fill the screen with a character."""
+        cursor = self.save_cursor()
+        for row in range(self.rows):
+            for column in range(self.columns):
+                self.set_absolute_cursor_position(row, column)
+                self.screen.overwrite_string([ch])
+        self.restore_cursor(cursor)
+
+    def clear_home(self, screen=None):
+        """Blank the screen, and move the cursor home."""
+        if screen is None:
+            screen = self.screen
+        for i in range(len(screen.lines)):
+            screen.set_cursor_position(i, 0)
+            screen.clear_cursor_row()
+        screen.set_cursor_position(0, 0)
+
+    def clear(self, screen=None):
+        """Blank the screen, leaving the cursor where it is."""
+        if screen is None:
+            screen = self.screen
+        (row, column) = (screen.row, screen.column)
+        self.clear_home(screen)
+        screen.set_cursor_position(row, column)
+
+    def cursor_up(self, count):
+        """Move the cursor up, stopping at the top (of the scroll region)."""
+        self.cursor_down(-(count or 1))
+
+    def cursor_down(self, count):
+        """Move the cursor down, stopping at the bottom."""
+        count = count or 1
+        if self.origin_mode:
+            (top, bottom) = (self.vt_scroll_top(), self.vt_scroll_bottom())
+        else:
+            (top, bottom) = (0, self.rows - 1)
+        self.set_absolute_cursor_row(max(top, min(self.screen.row + count,
+                                                  bottom)))
+
+    def cursor_left(self, count):
+        """Move the cursor left, wrapping back in reverse-wraparound mode."""
+        count = count or 1
+        if count < 1:
+            return
+
+        screen = self.screen
+        if not self.reverse_wraparound:
+            self.set_cursor_column(max(screen.column - count, 0))
+            return
+
+        if screen.overflow:
+            count -= 1
+            screen.overflow = False
+            if not count:
+                return
+
+        row = screen.row
+        column = screen.column - count
+        if column < 0:
+            row = row - count // self.columns - 1
+            if row < 0:
+                row = self.rows + js_mod(row, self.rows)
+            column = self.columns + js_mod(column, self.columns)
+        self.set_cursor_position(max(row, 0), column)
+
+    def cursor_right(self, count):
+        """Move the cursor right, stopping at the edge."""
+        count = count or 1
+        if count < 1:
+            return
+        self.set_cursor_column(max(0, min(self.screen.column + count,
+                                          self.columns - 1)))
+
+    def set_tab_stop(self, column):
+        """Add a tab stop."""
+        if column not in self.tab_stops:
+            self.tab_stops.append(column)
+            self.tab_stops.sort()
+
+    def clear_tab_stop_at_cursor(self):
+        """Remove the tab stop at the cursor, if there is one."""
+        if self.screen.column in self.tab_stops:
+            self.tab_stops.remove(self.screen.column)
+
+    def clear_all_tab_stops(self):
+        """Remove every tab stop."""
+        self.tab_stops = []
+        self.default_tab_stops = False
+
+    def set_default_tab_stops(self, start=0):
+        """Add a tab stop every TAB_WIDTH columns from |start| on."""
+        start = start - 1 - js_mod(start - 1, TAB_WIDTH) + TAB_WIDTH
+        for column in range(start, self.columns, TAB_WIDTH):
+            self.set_tab_stop(column)
+        self.default_tab_stops = True
+
+    def forward_tab_stop(self):
+        """Move to the next tab stop, or the last column."""
+        column = self.screen.column
+        for stop in self.tab_stops:
+            if stop > column:
+                self.set_cursor_column(stop)
+                return
+        overflow = self.screen.overflow
+        self.set_cursor_column(self.columns - 1)
+        self.screen.overflow = overflow
+
+    def backward_tab_stop(self):
+        """Move to the previous tab stop, or (like hterm) column 1."""
+        column = self.screen.column
+        for stop in reversed(self.tab_stops):
+            if stop < column:
+                self.set_cursor_column(stop)
+                return
+        self.set_cursor_column(1)
+
+
+def pieces(data, start, end):
+    """Yield part of the playback data of a Recording, a bit at a time."""
+    if isinstance(data, vtpack.Reader):
+        yield from data.pieces(start, end)
+        return
+    end = min(end, len(data))
+    for pos in range(start, end, READ_SIZE):
+        yield data[pos:min(pos + READ_SIZE, end)]
+
+
+def find_non_ascii(data, end):
+    """Find the first non-ASCII byte before |end| in the playback data.
+
+    Returns:
+      Its offset, or None if everything before |end| is ASCII.
+    """
+    pos = 0
+    for piece in pieces(data, 0, end):
+        m = NON_ASCII_RE.search(piece)
+        if m:
+            return pos + m.start()
+        pos += len(piece)
+    return None
+
+
+def warn_non_ascii(recording, offsets):
+    """Warn if any checkpoint offsets won't line up in the canned tests.
+
+    We count bytes (like vtscope.py), but the canned tests count characters,
+    so the offsets only agree up to the first non-ASCII byte.
+    """
+    pos = find_non_ascii(recording.data, max(offsets, default=0))
+    if pos is not None:
+        print('%s: warning: the data isn\'t ASCII from byte %d on, so '
+              'checkpoints after that are at the wrong places in the canned '
+              'tests, which count characters' % (recording.filename, pos),
+              file=sys.stderr)
+
+
+def play(terminal, data, offsets):
+    """Play data through a terminal, stopping at each offset.
+
+    Args:
+      terminal: The Terminal.
+      data: The playback data of a Recording.
+      offsets: The offsets to stop at, in order.
+
+    Yields:
+      Each offset, once everything before it has been played.
+    """
+    pos = 0
+    for offset in offsets:
+        for piece in pieces(data, pos, offset):
+            terminal.feed(piece)
+        pos = max(pos, offset)
+        yield offset
+
+
+def compare(terminal, expected, row, column):
+    """Compare a terminal against a checkpoint.
+
+    Args:
+      terminal: The Terminal.
+      expected: The expected rows, from the top of the scrollback.
+      row: The expected cursor row.
+      column: The expected cursor column.
+
+    Returns:
+      A list of the differences, as strings.
+    """
+    diffs = []
+    for (i, line) in enumerate(expected):
+        text = terminal.row_text(i)
+        if text != line:
+            diffs.append('row %d: expected %r, got %r' % (i, line, text))
+    if terminal.cursor != (row, column):
+        diffs.append('cursor: expected %d,%d, got %d,%d' %
+                     ((row, column) + terminal.cursor))
+    return diffs
+
+
+def check(recording, opts, out=sys.stdout):
+    """Check the checkpoints in a recording.
+
+    Returns:
+      The number of checkpoints that failed.
+    """
+    stops = recording.stops
+    warn_non_ascii(recording, stops.offsets)
+    terminal = Terminal(opts.columns, opts.rows,
+                        max(stops.lines, default=0))
+    failed = 0
+    for (i, offset) in enumerate(play(terminal, recording.data,
+                                      stops.offsets)):
+        expected = [x.decode('utf-8', 'replace')
+                    for x in stops.expected_lines(recording.header, i)]
+        # Checkpoints without lines (e.g. from vtrecord.py) only have the
+        # cursor to check.
+        diffs = compare(terminal, expected, stops.rows[i], stops.columns[i])
+        if not diffs:
+            continue
+
+        failed += 1
+        if failed <= MAX_REPORTED:
+            print('%s: OFFSET:%d:' % (recording.filename, offset), file=out)
+            for diff in diffs:
+                print('  %s' % (diff,), file=out)
+        elif failed == MAX_REPORTED + 1:
+            print('%s: not showing any more failures' %
+                  (recording.filename,), file=out)
+    return failed
+
+
+def next_char(data, offset):
+    """Move an offset forward past any UTF-8 continuation bytes."""
+    while offset < len(data) and 0x80 <= data[offset] < 0xc0:
+        offset += 1
+    return offset
+
+
+def generate(recording, opts):
+    """Generate checkpoints for a recording.
+
+    There's one at each existing checkpoint (including the ones vtrecord.py
+    left as comments), and every --every bytes.
+
+    Returns:
+      The new header, as bytes.
+    """
+    size = len(recording.data)
+    offsets = set(recording.stops.offsets)
+    offsets.update(next_char(recording.data, min(int(x), size))
+                   for x in UNKNOWN_STOP_RE.findall(recording.header))
+    if opts.every:
+        offsets.update(next_char(recording.data, x)
+                       for x in range(opts.every, size, opts.every))
+    offsets.add(size)
+    warn_non_ascii(recording, offsets)
+
+    lines = ['@@ HEADER_START']
+    terminal = Terminal(opts.columns, opts.rows, opts.lines)
+    for offset in play(terminal, recording.data, sorted(offsets)):
+        rows = [terminal.row_text(i)
+                for i in range(min(opts.lines, terminal.row_count()))]
+        if any(x.startswith('@@') for x in rows):
+            print('%s: skipping OFFSET:%d: a row starts with @@' %
+                  (recording.filename, offset), file=sys.stderr)
+            continue
+        lines.append('@@ OFFSET:%d LINES:%d CURSOR:%d,%d' %
+                     ((offset, len(rows)) + terminal.cursor))
+        lines += rows
+    lines.append('@@ HEADER_END')
+
+    # Keep the comments at the start of the old header.
+    m = re.match(rb'(#[^\n]*\n)*', recording.header)
+    return bytes(m.group()) + ''.join(x + '\n' for x in lines).encode('utf-8')
+
+
+@contextlib.contextmanager
+def replace_file(path):
+    """Write a file via a temp file in the same dir, replacing it atomically.
+
+    This also makes it safe to overwrite the recording we're reading from,
+    since that keeps the old file (which may be memory-mapped) intact.
+
+    Yields:
+      The temp file, open for writing.
+    """
+    tmp = os.path.join(os.path.dirname(path), '.%s.%d.tmp' % (
+        os.path.basename(path), os.getpid()))
+    try:
+        with open(tmp, 'wb') as fp:
+            yield fp
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+
+
+def write_recording(recording, header, output):
+    """Write a copy of a recording with a new header.
+
+    Packs are written as packs (with the same compression & timing), and
+    everything else as a canned session (along with its timing file).
+    """
+    data = recording.data
+    if isinstance(data, vtpack.Reader):
+        with replace_file(output) as fp:
+            writer = vtpack.Writer(fp, data.index['codec'], data.block_size)
+            for piece in pieces(data, 0, len(data)):
+                writer.write(piece)
+            writer.close(header, data.timing)
+        return
+
+    with replace_file(output) as fp:
+        fp.write(header)
+        for piece in pieces(data, 0, len(data)):
+            fp.write(piece)
+
+    timing = output + vtpack.TIMING_SUFFIX
+    if recording.timing_filename and not (
+            os.path.exists(timing) and
+            os.path.samefile(recording.timing_filename, timing)):
+        with replace_file(timing) as fp, \
+                open(recording.timing_filename, 'rb') as src:
+            shutil.copyfileobj(src, fp)
+
+
+def get_parser():
+    """Get a command line parser."""
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='+', metavar='file',
+                        help='Canned sessions (or packs made by vtpack.py).')
+    parser.add_argument('-o', '--output',
+                        help='Generate checkpoints for the file, and write a '
+                             'copy of it with them as its header.')
+    parser.add_argument('--every', type=vtgen.parse_size,
+                        help='With --output, also add a checkpoint every so '
+                             'many bytes, e.g. 64K.')
+    parser.add_argument('--lines', type=int, default=ROWS,
+                        help='How many rows generated checkpoints hold. '
+                             '(default: %(default)s)')
+    parser.add_argument('--columns', type=int, default=COLUMNS,
+                        help='The width of the terminal. '
+                             '(default: %(default)s)')
+    parser.add_argument('--rows', type=int, default=ROWS,
+                        help='The height of the terminal. '
+                             '(default: %(default)s)')
+    return parser
+
+
+def main(argv):
+    """The main func!"""
+    parser = get_parser()
+    opts = parser.parse_args(argv)
+
+    if opts.output and len(opts.files) > 1:
+        parser.error('--output only works with one file')
+    if opts.every is not None and not opts.output:
+        parser.error('--every needs --output')
+    if opts.every is not None and opts.every <= 0:
+        parser.error('--every must be positive')
+    if opts.columns <= 0 or opts.rows <= 0 or opts.lines < 0:
+        parser.error('the terminal size & --lines must be positive')
+
+    ret = 0
+    for filename in opts.files:
+        try:
+            recording = vtscope.Recording(filename)
+        except (vtpack.Error, OSError) as e:
+            print('%s: %s' % (filename, e), file=sys.stderr)
+            return 1
+
+        start = time.monotonic()
+        if opts.output:
+            header = generate(recording, opts)
+            write_recording(recording, header, opts.output)
+            count = len(vtpack.parse_stops(header))
+            result = 'wrote %d checkpoints to %s' % (count, opts.output)
+        else:
+            failed = check(recording, opts)
+            count = len(recording.stops)
+            result = '%d/%d checkpoints passed' % (count - failed, count)
+            if failed:
+                ret = 1
+
+        elapsed = time.monotonic() - start
+        print('%s: %s (%d bytes in %.2fs)' %
+              (filename, result, len(recording.data), elapsed))
+
+    return ret
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -229,6 +229,111 @@ hterm.msg = function(name, args = [], string = '') {
   return hterm.messageManager.get('HTERM_' + name, args, string);
 };
 
+/**
+ * Type suffix for resources that aren't bundled.
+ *
+ * `bin/mkdist --lazy-resources` registers these with the URL of a separate
+ * file as their data rather than the data itself.
+ *
+ * @const {string}
+ */
+hterm.LAZY_RESOURCE_SUFFIX = ';lazy';
+
+/**
+ * Pending fetches of lazy resources.
+ *
+ * @private {!Map<string, !Promise<string>>}
+ */
+hterm.resourceLoads_ = new Map();
+
+/**
+ * Check whether a resource's data is available without fetching it.
+ *
+ * @param {string} name The name of the resource.
+ * @return {boolean} True if the resource is registered & not lazy.
+ */
+hterm.isResourceLoaded = function(name) {
+  const resource = lib.resource.get(name, null);
+  return resource !== null &&
+      !resource.type.endsWith(hterm.LAZY_RESOURCE_SUFFIX);
+};
+
+/**
+ * Get a URL for a resource.
+ *
+ * Bundled resources are returned as data: URLs, while lazy resources return
+ * the URL of their file so the browser only fetches them when they're used.
+ *
+ * @param {string} name The name of the resource.
+ * @return {string} The URL.
+ */
+hterm.getResourceUrl = function(name) {
+  const resource = lib.resource.get(name);
+  if (resource.type.endsWith(hterm.LAZY_RESOURCE_SUFFIX)) {
+    return resource.data;
+  }
+  return lib.resource.getDataUrl(name);
+};
+
+/**
+ * Load a resource's data, fetching it first if it isn't bundled.
+ *
+ * Once loaded, the resource is registered normally, so lib.resource.getData
+ * will work for it too.
+ *
+ * @param {string} name The name of the resource.
+ * @return {!Promise<string>} The resource data.
+ */
+hterm.loadResource = function(name) {
+  const resource = lib.resource.get(name);
+  if (!resource.type.endsWith(hterm.LAZY_RESOURCE_SUFFIX)) {
+    return Promise.resolve(resource.data);
+  }
+
+  let load = hterm.resourceLoads_.get(name);
+  if (load) {
+    return load;
+  }
+
+  const type = resource.type.slice(0, -hterm.LAZY_RESOURCE_SUFFIX.length);
+  load = fetch(resource.data)
+    .then((response) => {
+      if (!response.ok) {
+        throw new Error(`${resource.data}: ${response.statusText}`);
+      }
+      if (!type.endsWith(';base64')) {
+        return response.text();
+      }
+
+      // The file holds the raw bytes, but callers expect base64.
+      return response.blob().then((blob) => new Promise((resolve) => {
+        const reader = new FileReader();
+        reader.onload = () => {
+          const dataUrl = /** @type {string} */ (reader.result);
+          resolve(dataUrl.split(',', 2)[1]);
+        };
+        reader.readAsDataURL(blob);
+      }));
+    })
+    .then((data) => {
+      lib.resource.add(name, type, data);
+      return data;
+    })
+    .finally(() => hterm.resourceLoads_.delete(name));
+  hterm.resourceLoads_.set(name, load);
+  return load;
+};
+
+/**
+ * Load a number of resources.
+ *
+ * @param {!Array<string>} names The names of the resources.
+ * @return {!Promise<!Array<string>>} The resource data.
+ */
+hterm.loadResources = function(names) {
+  return Promise.all(names.map((name) => hterm.loadResource(name)));
+};
+
 /**
  * Create a new notification.
  *
@@ -248,7 +353,7 @@ hterm.notify = function(params) {
   // directly in case it was stuffed with excess junk.
   const options = {
       'body': params.body,
-      'icon': def(params.icon, lib.resource.getDataUrl('hterm/images/icon-96')),
+      'icon': def(params.icon, hterm.getResourceUrl('hterm/images/icon-96')),
   };
 
   let title = def(params.title, window.document.title);
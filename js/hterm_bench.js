@@ -0,0 +1,412 @@
+// Copyright 2020 The Chromium OS Authors. All rights reserved.
+// Use of this source code is governed by a BSD-style license that can be
+// found in the LICENSE file.
+
+'use strict';
+
+/**
+ * @fileoverview Performance benchmarks.
+ *
+ * This is loaded by ../html/hterm_bench.html, normally via bin/load_benchmarks
+ * which serves the page, collects the results, and compares them against a
+ * baseline.  The page can also be opened by hand, in which case the results
+ * are displayed when it's done.
+ *
+ * Every stream (the canned sessions in ../test_data/, plus whatever is listed
+ * in the ?data= manifest) is played through a fresh terminal twice:
+ *
+ *   interpret: As fast as possible in CHUNK_SIZE writes, for raw throughput
+ *       of the parser & screen updates.  Redraws never get a chance to run.
+ *   frames: FRAME_SIZE bytes per animation frame, for how long frames take
+ *       when the ScrollPort has to keep up.
+ *
+ * There are also micro benchmarks of hterm.Screen insertions and
+ * hterm.ScrollPort redraws.
+ *
+ * Heap sizes are only available in Chrome, and are only accurate when it's
+ * run with --enable-precise-memory-info & --js-flags=--expose-gc.
+ */
+
+hterm.bench = {};
+
+/**
+ * How much data to write to the terminal at a time, like a busy connection.
+ *
+ * @const {number}
+ */
+hterm.bench.CHUNK_SIZE = 4096;
+
+/**
+ * How much data to write per animation frame.
+ *
+ * @const {number}
+ */
+hterm.bench.FRAME_SIZE = 64 * 1024;
+
+/**
+ * The canned sessions to play.
+ *
+ * @const {!Array<string>}
+ */
+hterm.bench.CANNED = ['vttest-01', 'vttest-02', 'charsets'];
+
+/**
+ * How many times to repeat the canned sessions (they're too small to measure
+ * otherwise).
+ *
+ * @const {number}
+ */
+hterm.bench.CANNED_REPEAT = 50;
+
+/**
+ * How many strings to insert in the hterm.Screen benchmark.
+ *
+ * @const {number}
+ */
+hterm.bench.INSERT_ITERATIONS = 100000;
+
+/**
+ * How many redraws to do in the hterm.ScrollPort benchmark.
+ *
+ * @const {number}
+ */
+hterm.bench.REDRAW_ITERATIONS = 500;
+
+/**
+ * Where to show progress & results.
+ *
+ * @param {string} msg The message to show.
+ */
+hterm.bench.log = function(msg) {
+  console.log(msg);
+  const log = document.getElementById('log');
+  log.textContent += `${msg}\n`;
+};
+
+/**
+ * Strip the header (if any) off a canned session.
+ *
+ * @param {string} data The canned session.
+ * @return {string} The playback data.
+ */
+hterm.bench.stripHeader = function(data) {
+  if (!data.match(/^(#[^\n]*\n)*@@ HEADER_START/)) {
+    return data;
+  }
+  const m = data.match(/^@@ HEADER_END\r?\n/m);
+  return m ? data.substr(m.index + m[0].length) : data;
+};
+
+/**
+ * Count the escape sequences in some data.
+ *
+ * This just counts ESC bytes, which is close enough for a rate.  Streams from
+ * the manifest come with an exact count, made by bin/vtparse.py.
+ *
+ * @param {!Uint8Array} data The data to scan.
+ * @return {number} The number of escape sequences.
+ */
+hterm.bench.countSequences = function(data) {
+  let count = 0;
+  for (let i = data.indexOf(0x1b); i != -1; i = data.indexOf(0x1b, i + 1)) {
+    ++count;
+  }
+  return count;
+};
+
+/**
+ * Get the size of the JS heap, after collecting garbage if we can.
+ *
+ * @return {?number} The heap size in bytes, or null if we can't tell.
+ */
+hterm.bench.heapUsed = function() {
+  if (window.gc) {
+    window.gc();
+  }
+  return performance.memory ? performance.memory.usedJSHeapSize : null;
+};
+
+/**
+ * Summarize a list of durations.
+ *
+ * @param {!Array<number>} times The durations in milliseconds.
+ * @return {!Object} The median, 95th percentile & worst times.
+ */
+hterm.bench.percentiles = function(times) {
+  const sorted = Array.from(times).sort((a, b) => a - b);
+  const at = (p) => sorted[Math.min(sorted.length - 1,
+                                    Math.floor(sorted.length * p))];
+  return {
+    'median_ms': sorted.length ? at(0.5) : null,
+    'p95_ms': sorted.length ? at(0.95) : null,
+    'max_ms': sorted.length ? sorted[sorted.length - 1] : null,
+  };
+};
+
+/**
+ * Run a benchmark against a fresh terminal, set up like the canned tests.
+ *
+ * @param {function(!hterm.Terminal): (!Object|!Promise<!Object>)} callback
+ *     The benchmark to run.
+ * @return {!Promise<!Object>} The results of the benchmark.
+ */
+hterm.bench.withTerminal = async function(callback) {
+  const div = document.createElement('div');
+  div.style.position = 'absolute';
+  div.style.width = '100%';
+  div.style.height = '100%';
+  document.body.appendChild(div);
+
+  const terminal = new hterm.Terminal();
+  terminal.decorate(div);
+  terminal.setWidth(80);
+  terminal.setHeight(25);
+  await new Promise((resolve) => terminal.onTerminalReady = resolve);
+
+  try {
+    return await callback(terminal);
+  } finally {
+    terminal.setCursorBlink(false);
+    div.remove();
+  }
+};
+
+/**
+ * Play a stream through a terminal as fast as possible.
+ *
+ * @param {!hterm.Terminal} terminal The terminal.
+ * @param {!Uint8Array} data The stream.
+ * @param {?number=} sequences The number of escape sequences in the stream, if
+ *     known.
+ * @return {!Object} The results.
+ */
+hterm.bench.runInterpret = function(terminal, data, sequences = null) {
+  const heapBefore = hterm.bench.heapUsed();
+  const start = performance.now();
+  for (let i = 0; i < data.length; i += hterm.bench.CHUNK_SIZE) {
+    terminal.io.writeUTF8(data.subarray(i, i + hterm.bench.CHUNK_SIZE));
+  }
+  const elapsed = Math.max(performance.now() - start, 0.001);
+  const heapAfter = hterm.bench.heapUsed();
+
+  if (sequences === null) {
+    sequences = hterm.bench.countSequences(data);
+  }
+  return {
+    'bytes': data.length,
+    'sequences': sequences,
+    'time_ms': elapsed,
+    'bytes_per_sec': data.length * 1000 / elapsed,
+    'sequences_per_sec': sequences * 1000 / elapsed,
+    'heap_growth': heapBefore === null ? null : heapAfter - heapBefore,
+  };
+};
+
+/**
+ * Play a stream through a terminal one FRAME_SIZE chunk per frame.
+ *
+ * @param {!hterm.Terminal} terminal The terminal.
+ * @param {!Uint8Array} data The stream.
+ * @return {!Promise<!Object>} The results.
+ */
+hterm.bench.runFrames = function(terminal, data) {
+  return new Promise((resolve) => {
+    const frameTimes = [];
+    const start = performance.now();
+    let last = start;
+    let pos = 0;
+
+    const onFrame = (now) => {
+      if (pos) {
+        frameTimes.push(now - last);
+      }
+      last = now;
+
+      if (pos >= data.length) {
+        const elapsed = Math.max(performance.now() - start, 0.001);
+        resolve(Object.assign({
+          'frames': frameTimes.length,
+          'time_ms': elapsed,
+          'bytes_per_sec': data.length * 1000 / elapsed,
+        }, hterm.bench.percentiles(frameTimes)));
+        return;
+      }
+
+      terminal.io.writeUTF8(
+          data.subarray(pos, pos + hterm.bench.FRAME_SIZE));
+      pos += hterm.bench.FRAME_SIZE;
+      requestAnimationFrame(onFrame);
+    };
+    requestAnimationFrame(onFrame);
+  });
+};
+
+/**
+ * Benchmark hterm.Screen.insertString.
+ *
+ * @return {!Object} The results.
+ */
+hterm.bench.runScreenInsert = function() {
+  const screen = new hterm.Screen();
+  screen.setColumnCount(80);
+  for (let i = 0; i < 25; ++i) {
+    screen.pushRow(document.createElement('x-row'));
+  }
+
+  const text = 'The quick brown fox jumps over the lazy dog. ';
+  const iterations = hterm.bench.INSERT_ITERATIONS;
+  const start = performance.now();
+  for (let i = 0; i < iterations; ++i) {
+    screen.setCursorPosition(i % 25, (i * 7) % 80);
+    // Change attributes now & then so rows end up with several nodes.
+    screen.textAttributes.bold = (i & 8) != 0;
+    screen.textAttributes.syncColors();
+    screen.insertString(text);
+    screen.maybeClipCurrentRow();
+  }
+  const elapsed = Math.max(performance.now() - start, 0.001);
+
+  return {
+    'iterations': iterations,
+    'time_ms': elapsed,
+    'ops_per_sec': iterations * 1000 / elapsed,
+  };
+};
+
+/**
+ * Benchmark full hterm.ScrollPort redraws.
+ *
+ * @param {!hterm.Terminal} terminal The terminal.
+ * @return {!Object} The results.
+ */
+hterm.bench.runRedraw = function(terminal) {
+  for (let i = 0; i < 25; ++i) {
+    terminal.interpret(`\x1b[3${i % 8}m${'redraw '.repeat(11)}\x1b[m\r\n`);
+  }
+
+  const scrollPort = terminal.getScrollPort();
+  const times = [];
+  const iterations = hterm.bench.REDRAW_ITERATIONS;
+  const start = performance.now();
+  for (let i = 0; i < iterations; ++i) {
+    const before = performance.now();
+    scrollPort.invalidate();
+    scrollPort.redraw_();
+    times.push(performance.now() - before);
+  }
+  const elapsed = Math.max(performance.now() - start, 0.001);
+
+  return Object.assign({
+    'iterations': iterations,
+    'time_ms': elapsed,
+    'ops_per_sec': iterations * 1000 / elapsed,
+  }, hterm.bench.percentiles(times));
+};
+
+/**
+ * Load the streams to play.
+ *
+ * @param {?string} manifest The URL of a JSON list of {name, url, sequences}
+ *     streams to play in addition to the canned sessions.  Their urls serve
+ *     the raw playback data (i.e. without a canned session header).
+ * @return {!Promise<!Array<{name: string, data: !Uint8Array,
+ *     sequences: ?number}>>} The streams.
+ */
+hterm.bench.loadStreams = async function(manifest) {
+  const encoder = new TextEncoder();
+  const streams = hterm.bench.CANNED.map((name) => {
+    const data = hterm.bench.stripHeader(
+        lib.resource.getData(`hterm/test/canned/${name}`));
+    return {
+      name: `canned/${name}`,
+      data: encoder.encode(data.repeat(hterm.bench.CANNED_REPEAT)),
+      sequences: null,
+    };
+  });
+
+  if (manifest) {
+    const base = new URL(manifest, document.location.href);
+    const entries = await (await fetch(base.href)).json();
+    for (const entry of entries) {
+      // The runner only serves the playback data, so use the bytes as is.
+      const response = await fetch(new URL(entry.url, base).href);
+      streams.push({
+        name: entry.name,
+        data: new Uint8Array(await response.arrayBuffer()),
+        sequences: entry.sequences,
+      });
+    }
+  }
+
+  return streams;
+};
+
+/**
+ * Run all the benchmarks.
+ *
+ * @param {?string} manifest See loadStreams.
+ * @return {!Promise<!Object>} The results.
+ */
+hterm.bench.run = async function(manifest) {
+  const results = {
+    'user_agent': navigator.userAgent,
+    'date': new Date().toISOString(),
+    'chunk_size': hterm.bench.CHUNK_SIZE,
+    'frame_size': hterm.bench.FRAME_SIZE,
+    'heap': !!performance.memory && !!window.gc,
+    'benchmarks': {},
+  };
+  const benchmarks = results['benchmarks'];
+
+  for (const stream of await hterm.bench.loadStreams(manifest)) {
+    hterm.bench.log(`interpret ${stream.name}: ${stream.data.length} bytes`);
+    benchmarks[`interpret/${stream.name}`] = await hterm.bench.withTerminal(
+        (terminal) => hterm.bench.runInterpret(terminal, stream.data,
+                                               stream.sequences));
+
+    hterm.bench.log(`frames ${stream.name}`);
+    benchmarks[`frames/${stream.name}`] = await hterm.bench.withTerminal(
+        (terminal) => hterm.bench.runFrames(terminal, stream.data));
+  }
+
+  hterm.bench.log('screen/insert');
+  benchmarks['screen/insert'] = hterm.bench.runScreenInsert();
+
+  hterm.bench.log('scrollport/redraw');
+  benchmarks['scrollport/redraw'] =
+      await hterm.bench.withTerminal(hterm.bench.runRedraw);
+
+  return results;
+};
+
+/**
+ * Run the benchmarks when the page loads.
+ *
+ * URL parameters:
+ *   data: See loadStreams.
+ *   report: A URL to POST the JSON results to.
+ */
+window.onload = async function() {
+  hterm.defaultStorage = new lib.Storage.Memory();
+  await lib.init();
+
+  const params = new URLSearchParams(document.location.search);
+  let results;
+  try {
+    results = await hterm.bench.run(params.get('data'));
+  } catch (e) {
+    results = {'error': `${e}\n${e.stack}`};
+  }
+
+  const json = JSON.stringify(results, null, 2);
+  document.getElementById('log').textContent = json;
+
+  const report = params.get('report');
+  if (report) {
+    await fetch(report, {
+      method: 'POST',
+      headers: {'Content-Type': 'application/json'},
+      body: json,
+    });
+  }
+};
@@ -27,6 +27,13 @@ hterm.FindBar = function(terminal) {
    */
   this.scrollPort_ = terminal.getScrollPort();
 
+  /**
+   * The document the find bar is added to.
+   *
+   * @private {?Document}
+   */
+  this.document_ = null;
+
   /** @private {?Element} */
   this.findBar_ = null;
 
@@ -84,6 +91,14 @@ hterm.FindBar = function(terminal) {
    */
   this.pendingNotifyChanges_ = null;
 
+  /**
+   * Whether the find bar should be displayed once its resources are loaded.
+   * Cleared by close() so a close while loading wins.
+   *
+   * @private {boolean}
+   */
+  this.pendingDisplay_ = false;
+
   /**
    * List of rows which are changed on terminal.
    *
@@ -195,12 +210,39 @@ hterm.FindBar.RowResult;
 /** @typedef {{index: number, highlighter: ?Element}} */
 hterm.FindBar.Result;
 
+/**
+ * The resources used by the find bar.
+ *
+ * @const {!Array<string>}
+ */
+hterm.FindBar.RESOURCES = [
+  'hterm/html/find_bar',
+  'hterm/html/find_screen',
+  'hterm/images/close',
+  'hterm/images/keyboard_arrow_down',
+  'hterm/images/keyboard_arrow_up',
+];
+
 /**
  * Add find bar to the terminal.
  *
+ * If the resources haven't been loaded yet (see hterm.loadResource), creating
+ * the find bar is put off until it's first displayed.
+ *
  * @param {!Document} document
  */
 hterm.FindBar.prototype.decorate = function(document) {
+  this.document_ = document;
+  if (hterm.FindBar.RESOURCES.every(hterm.isResourceLoaded)) {
+    this.createElements_();
+  }
+};
+
+/**
+ * Create the find bar elements.
+ */
+hterm.FindBar.prototype.createElements_ = function() {
+  const document = this.document_;
   this.findBar_ = document.createElement('div');
   this.findBar_.id = 'hterm:find-bar';
   this.findBar_.setAttribute('aria-hidden', 'true');
@@ -249,6 +291,26 @@ hterm.FindBar.prototype.decorate = function(document) {
  * Display find bar.
  */
 hterm.FindBar.prototype.display = function() {
+  if (!this.findBar_) {
+    if (this.pendingDisplay_) {
+      return;
+    }
+    this.pendingDisplay_ = true;
+    hterm.loadResources(hterm.FindBar.RESOURCES).then(() => {
+      if (!this.findBar_) {
+        this.createElements_();
+      }
+      if (this.pendingDisplay_) {
+        this.pendingDisplay_ = false;
+        this.display();
+      }
+    }).catch((e) => {
+      this.pendingDisplay_ = false;
+      console.warn(`Unable to load the find bar: ${e}`);
+    });
+    return;
+  }
+
   this.scrollPort_.subscribe('scroll', this.onScroll_);
 
   this.findBar_.classList.add('enabled');
@@ -265,6 +327,11 @@ hterm.FindBar.prototype.display = function() {
  * Close find bar.
  */
 hterm.FindBar.prototype.close = function() {
+  this.pendingDisplay_ = false;
+  if (!this.findBar_) {
+    return;
+  }
+
   // Clear all results of findbar.
   this.resultScreen_.style.display = 'none';
 
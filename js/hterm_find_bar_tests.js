@@ -64,6 +64,45 @@ function setInputElementValue(value, inputElement) {
 
 const classes = (ele) => Array.from(ele.classList.values());
 
+/**
+ * Test that the find bar is created on first use with lazy resources.
+ */
+it('findbar-lazy-resources', async function() {
+  // Register the resources by URL as `mkdist --lazy-resources` would.
+  const saved = hterm.FindBar.RESOURCES.map((name) => lib.resource.get(name));
+  saved.forEach((resource) => {
+    lib.resource.add(resource.name, resource.type + hterm.LAZY_RESOURCE_SUFFIX,
+                     URL.createObjectURL(new Blob([resource.data])));
+  });
+
+  try {
+    const findBar = new hterm.FindBar(this.terminal);
+    findBar.decorate(this.document);
+    /** @suppress {visibility} */
+    assert.isNull(findBar.findBar_);
+
+    // Closing before it's ever been shown is fine.
+    findBar.close();
+
+    // Closing while the resources are loading cancels the display.
+    findBar.display();
+    findBar.close();
+    await hterm.loadResources(hterm.FindBar.RESOURCES);
+    /** @suppress {visibility} */
+    const findBarDiv = findBar.findBar_;
+    assert.isNotNull(findBarDiv);
+    assert.notInclude(classes(findBarDiv), 'enabled');
+
+    findBar.display();
+    assert.include(classes(findBarDiv), 'enabled');
+    findBar.close();
+  } finally {
+    saved.forEach((resource) => {
+      lib.resource.add(resource.name, resource.type, resource.data);
+    });
+  }
+});
+
 /**
  * Test if find bar is not visible when disabled and vice-versa.
  */
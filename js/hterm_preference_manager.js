@@ -425,6 +425,21 @@ hterm.PreferenceManager.defaultPreferences = {
       `Enabling this by default is safe.`,
   ),
 
+  'enable-checksum-report': hterm.PreferenceManager.definePref_(
+      'Allow reading back the screen (DECRQCRA)',
+      hterm.PreferenceManager.Categories.Miscellaneous,
+      false, 'bool',
+      `Whether to answer the host's requests for checksums of parts of the ` +
+      `screen (DECRQCRA).  Test tools use these to check what's on the ` +
+      `screen.
+` +
+      `
+` +
+      `This lets anything that can write to the terminal (e.g. a file being ` +
+      `displayed) read back the screen contents, so only enable it for ` +
+      `testing.`,
+  ),
+
   'environment': hterm.PreferenceManager.definePref_(
       'Environment variables',
       hterm.PreferenceManager.Categories.Miscellaneous,
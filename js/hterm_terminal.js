@@ -313,7 +313,7 @@ hterm.Terminal.prototype.setProfile = function(
       const ary = v.match(/^lib-resource:(\S+)/);
       if (ary) {
         terminal.bellAudio_.setAttribute('src',
-                                         lib.resource.getDataUrl(ary[1]));
+                                         hterm.getResourceUrl(ary[1]));
       } else {
         terminal.bellAudio_.setAttribute('src', v);
       }
@@ -491,6 +491,10 @@ hterm.Terminal.prototype.setProfile = function(
       terminal.vt.enableCsiJ3 = !!v;
     },
 
+    'enable-checksum-report': function(v) {
+      terminal.vt.enableChecksumReport = !!v;
+    },
+
     'find-result-color': function(v) {
       terminal.findBar.setFindResultColor(v);
     },
@@ -3356,14 +3360,35 @@ hterm.Terminal.prototype.paste = function() {
  */
 hterm.Terminal.prototype.copyStringToClipboard = function(str) {
   if (this.prefs_.get('enable-clipboard-notice')) {
-    if (!this.clipboardNotice_) {
-      this.clipboardNotice_ = this.document_.createElement('div');
-      this.clipboardNotice_.style.textAlign = 'center';
-      const copyImage = lib.resource.getData('hterm/images/copy');
-      this.clipboardNotice_.innerHTML =
-          `${copyImage}<div>${hterm.msg('NOTIFY_COPY')}</div>`;
+    const createNotice = (copyImage) => {
+      const notice = this.document_.createElement('div');
+      notice.style.textAlign = 'center';
+      notice.innerHTML = `${copyImage}<div>${hterm.msg('NOTIFY_COPY')}</div>`;
+      return notice;
+    };
+    const showNotice = (notice) => {
+      setTimeout(() => this.showOverlay(notice, 500), 200);
+    };
+
+    const name = 'hterm/images/copy';
+    if (this.clipboardNotice_) {
+      showNotice(this.clipboardNotice_);
+    } else if (hterm.isResourceLoaded(name)) {
+      this.clipboardNotice_ = createNotice(lib.resource.getData(name));
+      showNotice(this.clipboardNotice_);
+    } else {
+      // Lazy builds fetch the icon on first use.  If that fails, show the
+      // notice without it (and try again next time).
+      hterm.loadResource(name).then((copyImage) => {
+        if (!this.clipboardNotice_) {
+          this.clipboardNotice_ = createNotice(copyImage);
+        }
+        showNotice(this.clipboardNotice_);
+      }).catch((e) => {
+        console.warn(`Unable to load ${name}: ${e}`);
+        showNotice(createNotice(''));
+      });
     }
-    setTimeout(() => this.showOverlay(this.clipboardNotice_, 500), 200);
   }
 
   hterm.copySelectionToClipboard(this.document_, str);
@@ -26,12 +26,159 @@ window.onerror = function(...args) {
   earlyError = Array.from(args);
 };
 
-/** Run the test framework once everything is finished. */
+/**
+ * Hash a string (32-bit FNV-1a).
+ *
+ * @param {string} str The string to hash.
+ * @return {number} The hash.
+ */
+function hashString(str) {
+  let hash = 0x811c9dc5;
+  for (let i = 0; i < str.length; ++i) {
+    hash ^= str.charCodeAt(i);
+    hash = Math.imul(hash, 0x01000193);
+  }
+  return hash >>> 0;
+}
+
+/**
+ * Only keep the tests that belong to one shard.
+ *
+ * When sharding by file, every top level suite (i.e. every *_tests.js file)
+ * is given to one shard, round robin.  When sharding by hash, every test goes
+ * to the shard its full title hashes to, which also spreads out the big files
+ * (like the canned VT sessions).  Suites left without tests are skipped by
+ * mocha, hooks and all.
+ *
+ * @param {!Mocha.Suite} root The root suite.
+ * @param {number} shard Which shard to keep, from 0.
+ * @param {number} shards How many shards there are.
+ * @param {string} by How to split the tests: 'file' or 'hash'.
+ */
+function shardSuites(root, shard, shards, by) {
+  if (by == 'hash') {
+    const filter = (suite) => {
+      suite.tests = suite.tests.filter(
+          (test) => hashString(test.fullTitle()) % shards == shard);
+      suite.suites.forEach(filter);
+    };
+    filter(root);
+  } else {
+    root.suites = root.suites.filter((suite, i) => i % shards == shard);
+  }
+}
+
+/**
+ * Collect the results of a run, per top level suite.
+ *
+ * @param {!Mocha.Runner} runner The running tests.
+ * @param {function(!Object)} callback Called with the results at the end.
+ */
+function collectResults(runner, callback) {
+  const start = performance.now();
+  const suites = {};
+  const failures = [];
+  const suiteStarts = new Map();
+  let passes = 0;
+  let pending = 0;
+
+  // The top level suite a test or hook belongs to.
+  const topSuite = (runnable) => {
+    let suite = runnable.parent;
+    while (suite.parent && !suite.parent.root) {
+      suite = suite.parent;
+    }
+    return suite;
+  };
+  const stats = (suite) => {
+    const title = suite.fullTitle();
+    if (!(title in suites)) {
+      suites[title] = {
+        'time_ms': 0, 'tests': 0, 'passes': 0, 'failures': 0, 'pending': 0,
+      };
+    }
+    return suites[title];
+  };
+
+  runner.on('suite', (suite) => {
+    if (suite.parent && suite.parent.root) {
+      suiteStarts.set(suite, performance.now());
+    }
+  });
+  runner.on('suite end', (suite) => {
+    if (suiteStarts.has(suite)) {
+      stats(suite)['time_ms'] += performance.now() - suiteStarts.get(suite);
+    }
+  });
+  runner.on('pass', (test) => {
+    ++passes;
+    const s = stats(topSuite(test));
+    ++s['tests'];
+    ++s['passes'];
+  });
+  runner.on('pending', (test) => {
+    ++pending;
+    const s = stats(topSuite(test));
+    ++s['tests'];
+    ++s['pending'];
+  });
+  runner.on('fail', (runnable, err) => {
+    // Failed hooks count against their suite, but aren't tests.
+    const s = stats(topSuite(runnable));
+    if (runnable.type == 'test') {
+      ++s['tests'];
+    }
+    ++s['failures'];
+    failures.push({
+      'title': runnable.fullTitle(),
+      'error': `${err}\n${err && err.stack || ''}`,
+    });
+  });
+  runner.on('end', () => {
+    callback({
+      'time_ms': performance.now() - start,
+      'passes': passes,
+      'failures': failures.length,
+      'pending': pending,
+      'suites': suites,
+      'failure_details': failures,
+    });
+  });
+}
+
+/**
+ * Run the test framework once everything is finished.
+ *
+ * URL parameters (normally from bin/load_tests --shards):
+ *   shard, shards: Only run one shard of this many.
+ *   by: How to shard the tests; see shardSuites.
+ *   report: A URL to POST the JSON results to.
+ */
 window.onload = async function() {
   hterm.defaultStorage = new lib.Storage.Memory();
 
+  const params = new URLSearchParams(document.location.search);
+  const shards = parseInt(params.get('shards'), 10) || 1;
+  const shard = parseInt(params.get('shard'), 10) || 0;
+  if (shards > 1) {
+    shardSuites(mocha.suite, shard, shards, params.get('by') || 'file');
+  }
+
   await lib.init();
-  mocha.run();
+  const runner = mocha.run();
+
+  const report = params.get('report');
+  if (report) {
+    collectResults(runner, (results) => {
+      results['shard'] = shard;
+      results['early_error'] = earlyError && earlyError.join('\n');
+      fetch(report, {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify(results),
+      });
+    });
+  }
 
   if (earlyError !== null) {
     assert.fail(`uncaught exception detected:\n${earlyError.join('\n')}\n`);
@@ -91,4 +91,43 @@ it.skip('copy-execCommand', (done) => {
   hterm.copySelectionToClipboard(doc, 'copypasta!');
 });
 
+/**
+ * Test that bundled resources are available right away.
+ */
+it('resource-bundled', async () => {
+  const name = 'hterm/test/bundled';
+  lib.resource.add(name, 'text/plain', 'data');
+  assert.isTrue(hterm.isResourceLoaded(name));
+  assert.equal(hterm.getResourceUrl(name), lib.resource.getDataUrl(name));
+  assert.equal(await hterm.loadResource(name), 'data');
+});
+
+/**
+ * Test that lazy resources are fetched on first use.
+ */
+it('resource-lazy', async () => {
+  const name = 'hterm/test/lazy-text';
+  const url = 'data:text/plain,data';
+  lib.resource.add(name, `text/plain${hterm.LAZY_RESOURCE_SUFFIX}`, url);
+  assert.isFalse(hterm.isResourceLoaded(name));
+  assert.equal(hterm.getResourceUrl(name), url);
+
+  assert.equal(await hterm.loadResource(name), 'data');
+  assert.isTrue(hterm.isResourceLoaded(name));
+  assert.equal(lib.resource.getData(name), 'data');
+  assert.equal(lib.resource.get(name).type, 'text/plain');
+});
+
+/**
+ * Test that lazy binary resources end up base64 encoded.
+ */
+it('resource-lazy-base64', async () => {
+  const name = 'hterm/test/lazy-binary';
+  lib.resource.add(name, `image/png;base64${hterm.LAZY_RESOURCE_SUFFIX}`,
+                   'data:application/octet-stream;base64,AAEC/w==');
+  const data = await hterm.loadResources([name]);
+  assert.deepStrictEqual(data, ['AAEC/w==']);
+  assert.equal(lib.resource.get(name).type, 'image/png;base64');
+});
+
 });
@@ -531,7 +531,7 @@ hterm.TextAttributes.splitWidecharString = function(str) {
     const isAscii = asciiRegex.test(grapheme);
     const strWidth = isAscii ? 1 : lib.wc.strWidth(grapheme);
     const isWideChar =
-        isAscii ? false : (lib.wc.charWidth(grapheme.codePointAt(0)) == 2);
+        isAscii ? false : (hterm.wc.charWidth(grapheme.codePointAt(0)) == 2);
 
     // Only merge non-wide characters together.  Every wide character needs to
     // be separate so it can get a unique container.
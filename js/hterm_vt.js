@@ -79,6 +79,14 @@ hterm.VT = function(terminal) {
    */
   this.enableCsiJ3 = true;
 
+  /**
+   * Answer the host's requests for checksums of the screen contents (DECRQCRA).
+   *
+   * We disable this by default as it lets anything that can write to the
+   * terminal (e.g. a file being cat'ed) read back what's on the screen.
+   */
+  this.enableChecksumReport = false;
+
   /**
    * If true, emit warnings when we encounter a control character or escape
    * sequence that we don't recognize or explicitly ignore.
@@ -3206,6 +3214,52 @@ hterm.VT.CSI['*x'] = hterm.VT.ignore;
  */
 hterm.VT.CSI['$x'] = hterm.VT.ignore;
 
+/**
+ * Request Checksum of Rectangular Area (DECRQCRA), VT420 and up.
+ *
+ * CSI Pi ; Pg ; Pt ; Pl ; Pb ; Pr * y
+ *
+ * Pi is an id echoed back in the reply, Pg is the page (ignored), and the rest
+ * are the 1-based top, left, bottom & right edges of the rectangle (inclusive).
+ * The result is DCS Pi ! ~ xxxx ST, where xxxx is the negated 16-bit sum of
+ * the code points in the rectangle, in hex.  Empty cells count as spaces, and
+ * attributes are not included.
+ *
+ * This is ignored unless the enable-checksum-report preference is set.
+ *
+ * @this {!hterm.VT}
+ * @param {!hterm.VT.ParseState} parseState
+ */
+hterm.VT.CSI['*y'] = function(parseState) {
+  if (!this.enableChecksumReport) {
+    return;
+  }
+
+  const terminal = this.terminal;
+  const width = terminal.screenSize.width;
+  const height = terminal.screenSize.height;
+  const top = Math.min(parseState.iarg(2, 1), height);
+  const left = Math.min(parseState.iarg(3, 1), width);
+  const bottom = Math.min(parseState.iarg(4, height), height);
+  const right = Math.min(parseState.iarg(5, width), width);
+
+  let sum = 0;
+  // Screen rows come after the scrollback.
+  const firstRow = terminal.getRowCount() - height;
+  for (let row = top; row <= bottom && left <= right; ++row) {
+    const text = lib.wc.substring(
+        terminal.getRowText(firstRow + row - 1), left - 1, right);
+    for (const ch of text) {
+      sum += ch.codePointAt(0);
+    }
+    sum += (right - left + 1 - lib.wc.strWidth(text)) * 0x20;
+  }
+
+  const checksum = (-sum & 0xffff).toString(16).toUpperCase();
+  terminal.io.sendString(
+      `\x1bP${parseState.iarg(0, 0)}!~${checksum.padStart(4, '0')}\x1b\\`);
+};
+
 /**
  * vt_tiledata (as used by NAOhack and UnNetHack)
  * (see https://nethackwiki.com/wiki/Vt_tiledata for more info)
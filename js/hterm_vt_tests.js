@@ -1009,6 +1009,41 @@ it('status-report', function() {
                  'line three');
   });
 
+/**
+ * Test the rectangular area checksum report.
+ */
+it('checksum-report', function() {
+    let resultString;
+    this.terminal.io.sendString = (str) => resultString = str;
+
+    // Make sure that enableChecksumReport is respected.
+    this.terminal.vt.enableChecksumReport = false;
+    this.terminal.interpret('\x1b[1;1;1;1;1;80*y');
+    assert.isUndefined(resultString);
+
+    this.terminal.vt.enableChecksumReport = true;
+
+    // A blank row is all spaces, and the rectangle is clipped to the screen.
+    this.terminal.interpret('\x1b[1;1;1;1;1;80*y');
+    assert.equal(resultString, '\x1bP1!~FE20\x1b\\');
+
+    this.terminal.interpret('ab\r\n中c');
+
+    // Just the "ab": -(0x61 + 0x62) & 0xffff.
+    this.terminal.interpret('\x1b[2;1;1;1;1;2*y');
+    assert.equal(resultString, '\x1bP2!~FF3D\x1b\\');
+
+    // The wide character takes up two columns: -(0x4e2d + 0x63 + 0x20).
+    this.terminal.interpret('\x1b[3;1;2;1;2;4*y');
+    assert.equal(resultString, '\x1bP3!~B150\x1b\\');
+
+    // The whole screen by default.
+    this.terminal.interpret('\x1b[*y');
+    const sum = 0x61 + 0x62 + 0x4e2d + 0x63 + (15 * 6 - 5) * 0x20;
+    assert.equal(resultString,
+                 `\x1bP0!~${(-sum & 0xffff).toString(16).toUpperCase()}\x1b\\`);
+  });
+
 /**
  * Test that various mode commands correctly change the state of the terminal.
  *
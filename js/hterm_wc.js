@@ -0,0 +1,213 @@
+// Copyright 2020 The Chromium OS Authors. All rights reserved.
+// Use of this source code is governed by a BSD-style license that can be
+// found in the LICENSE file.
+
+'use strict';
+
+/**
+ * @fileoverview Table driven character width lookups.
+ *
+ * lib.wc.charWidth binary searches a few range tables for every character,
+ * and it gets called for every character we print (via lib.wc.strWidth &
+ * friends).  We replace it with a two-level table lookup.  The table itself
+ * is generated by bin/mkwcwidth into hterm_wc_table.js.
+ *
+ * Note that the replacement is global: loading hterm replaces
+ * lib.wc.charWidth, lib.wc.charWidthRegardAmbiguous,
+ * lib.wc.charWidthDisregardAmbiguous & lib.wc.isCjkAmbiguous, so everything
+ * else on the page using lib.wc (including strWidth, substr & substring) gets
+ * hterm's widths too, and lib.wc stays consistent with itself.  The originals
+ * are kept in hterm.wc.lib.
+ */
+
+hterm.wc = {};
+
+/**
+ * The width classes in the table.
+ *
+ * Keep in sync with bin/mkwcwidth.
+ *
+ * @enum {number}
+ */
+hterm.wc.Class = {
+  ZERO: 0,
+  NARROW: 1,
+  WIDE: 2,
+  AMBIGUOUS: 3,
+  CONTROL: 4,
+};
+
+/**
+ * The block number for every (code point >> shift).
+ *
+ * This is decoded from hterm.wc.table_ on first use.
+ *
+ * @private {?Uint8Array|?Uint16Array}
+ */
+hterm.wc.index_ = null;
+
+/**
+ * The classes of the code points in each block, one block after another.
+ *
+ * This is decoded from hterm.wc.table_ on first use.
+ *
+ * @private {?Uint8Array}
+ */
+hterm.wc.blocks_ = null;
+
+/**
+ * The lib.wc functions we replaced.
+ *
+ * @const {{
+ *     charWidth: function(number): number,
+ *     charWidthRegardAmbiguous: function(number): number,
+ *     charWidthDisregardAmbiguous: function(number): number,
+ *     isCjkAmbiguous: function(number): boolean,
+ * }}
+ */
+hterm.wc.lib = {
+  charWidth: lib.wc.charWidth,
+  charWidthRegardAmbiguous: lib.wc.charWidthRegardAmbiguous,
+  charWidthDisregardAmbiguous: lib.wc.charWidthDisregardAmbiguous,
+  isCjkAmbiguous: lib.wc.isCjkAmbiguous,
+};
+
+/**
+ * Expand a run-length encoded array.
+ *
+ * @param {!Array<number>} runs Alternating values & run lengths.
+ * @param {function(new:T, number)} ArrayType The typed array to create.
+ * @return {T} The decoded array.
+ * @template T
+ */
+hterm.wc.decodeRuns_ = function(runs, ArrayType) {
+  let length = 0;
+  for (let i = 1; i < runs.length; i += 2) {
+    length += runs[i];
+  }
+
+  const ret = new ArrayType(length);
+  let pos = 0;
+  for (let i = 0; i < runs.length; i += 2) {
+    ret.fill(runs[i], pos, pos + runs[i + 1]);
+    pos += runs[i + 1];
+  }
+  return ret;
+};
+
+/**
+ * Decode the generated table.
+ */
+hterm.wc.decodeTable_ = function() {
+  const table = hterm.wc.table_;
+  const blocks = hterm.wc.decodeRuns_(table.blocks, Uint8Array);
+  hterm.wc.index_ = hterm.wc.decodeRuns_(
+      table.index,
+      (blocks.length >> table.shift) <= 0x100 ? Uint8Array : Uint16Array);
+  hterm.wc.blocks_ = blocks;
+};
+
+/**
+ * Get the width class of a code point.
+ *
+ * @param {number} codePoint The code point.
+ * @return {!hterm.wc.Class} The class.
+ */
+hterm.wc.getClass = function(codePoint) {
+  if (hterm.wc.blocks_ === null) {
+    hterm.wc.decodeTable_();
+  }
+
+  const shift = hterm.wc.table_.shift;
+  const block = hterm.wc.index_[codePoint >> shift];
+  if (block === undefined) {
+    // Past the end of Unicode.
+    return hterm.wc.Class.NARROW;
+  }
+  const mask = (1 << shift) - 1;
+  return hterm.wc.blocks_[(block << shift) | (codePoint & mask)];
+};
+
+/**
+ * Get the column width of a code point.
+ *
+ * @param {number} codePoint The code point.
+ * @param {boolean} regardAmbiguous Whether East Asian ambiguous characters
+ *     are lib.wc.cjkAmbiguousWidth columns wide, rather than 1.
+ * @return {number} The column width.
+ */
+hterm.wc.width_ = function(codePoint, regardAmbiguous) {
+  // Fast path for printable ASCII.
+  if (codePoint >= 0x20 && codePoint < 0x7f) {
+    return 1;
+  }
+
+  switch (hterm.wc.getClass(codePoint)) {
+    case hterm.wc.Class.ZERO:
+      return codePoint === 0 ? lib.wc.nulWidth : 0;
+    case hterm.wc.Class.WIDE:
+      return 2;
+    case hterm.wc.Class.AMBIGUOUS:
+      return regardAmbiguous ? lib.wc.cjkAmbiguousWidth : 1;
+    case hterm.wc.Class.CONTROL:
+      return lib.wc.controlWidth;
+    default:
+      return 1;
+  }
+};
+
+/**
+ * Get the column width of a code point.
+ *
+ * This is a drop-in replacement for lib.wc.charWidth, and honors the same
+ * settings (e.g. lib.wc.regardCjkAmbiguous).
+ *
+ * @param {number} codePoint The code point.
+ * @return {number} The column width.
+ */
+hterm.wc.charWidth = function(codePoint) {
+  return hterm.wc.width_(codePoint, lib.wc.regardCjkAmbiguous);
+};
+
+/**
+ * Get the column width of a code point, with ambiguous characters as wide.
+ *
+ * A drop-in replacement for lib.wc.charWidthRegardAmbiguous.
+ *
+ * @param {number} codePoint The code point.
+ * @return {number} The column width.
+ */
+hterm.wc.charWidthRegardAmbiguous = function(codePoint) {
+  return hterm.wc.width_(codePoint, true);
+};
+
+/**
+ * Get the column width of a code point, with ambiguous characters as narrow.
+ *
+ * A drop-in replacement for lib.wc.charWidthDisregardAmbiguous.
+ *
+ * @param {number} codePoint The code point.
+ * @return {number} The column width.
+ */
+hterm.wc.charWidthDisregardAmbiguous = function(codePoint) {
+  return hterm.wc.width_(codePoint, false);
+};
+
+/**
+ * Whether a code point is East Asian ambiguous.
+ *
+ * A drop-in replacement for lib.wc.isCjkAmbiguous.
+ *
+ * @param {number} codePoint The code point.
+ * @return {boolean}
+ */
+hterm.wc.isCjkAmbiguous = function(codePoint) {
+  return hterm.wc.getClass(codePoint) == hterm.wc.Class.AMBIGUOUS;
+};
+
+// Everything else in lib.wc (e.g. strWidth & substr) goes through these, so
+// they all pick up the table.  See the file overview.
+lib.wc.charWidth = hterm.wc.charWidth;
+lib.wc.charWidthRegardAmbiguous = hterm.wc.charWidthRegardAmbiguous;
+lib.wc.charWidthDisregardAmbiguous = hterm.wc.charWidthDisregardAmbiguous;
+lib.wc.isCjkAmbiguous = hterm.wc.isCjkAmbiguous;
@@ -0,0 +1,150 @@
+// Copyright 2020 The Chromium OS Authors. All rights reserved.
+// Use of this source code is governed by a BSD-style license that can be
+// found in the LICENSE file.
+
+// This file was generated by hterm/bin/mkwcwidth.  Do not edit.
+
+'use strict';
+
+/**
+ * The run-length encoded character width table.  See hterm.wc.
+ *
+ * @const
+ */
+hterm.wc.table_ = {
+  unicodeVersion: '17.0.0',
+  shift: 7,
+  index: [
+    0, 1, 1, 1, 2, 1, 3, 1, 4, 1, 5, 1, 6, 1, 7, 1, 8, 1, 9, 1, 10, 1, 11, 1,
+    12, 1, 13, 1, 14, 1, 15, 1, 16, 1, 17, 1, 18, 1, 19, 1, 20, 1, 21, 1, 22, 1,
+    23, 1, 24, 1, 25, 1, 26, 1, 27, 1, 28, 1, 29, 1, 30, 1, 31, 1, 32, 1, 33, 1,
+    34, 1, 35, 1, 10, 2, 36, 1, 10, 7, 37, 1, 38, 1, 39, 1, 40, 1, 41, 1, 10, 1,
+    42, 1, 43, 1, 44, 1, 45, 1, 46, 1, 47, 1, 10, 1, 48, 1, 10, 4, 49, 1, 50, 1,
+    51, 1, 52, 1, 53, 1, 54, 1, 55, 1, 56, 1, 57, 1, 58, 1, 59, 1, 60, 1, 61, 1,
+    62, 1, 63, 1, 64, 1, 10, 6, 65, 1, 10, 2, 66, 1, 67, 1, 68, 1, 10, 1, 69, 1,
+    70, 1, 71, 1, 72, 1, 73, 1, 74, 1, 75, 1, 76, 1, 70, 228, 77, 1, 10, 2, 78,
+    1, 79, 1, 10, 2, 80, 1, 81, 1, 82, 1, 83, 1, 84, 1, 85, 1, 10, 1, 86, 1, 70,
+    87, 87, 1, 10, 16, 88, 50, 70, 4, 89, 1, 10, 5, 90, 1, 67, 1, 91, 1, 92, 1,
+    10, 3, 93, 1, 10, 1, 94, 1, 95, 1, 10, 13, 96, 1, 97, 1, 10, 4, 98, 1, 10,
+    2, 99, 1, 100, 1, 101, 1, 102, 1, 103, 1, 104, 1, 105, 1, 106, 1, 107, 1,
+    108, 1, 109, 1, 110, 1, 111, 1, 10, 1, 112, 1, 113, 1, 114, 1, 115, 1, 10,
+    1, 116, 1, 10, 1, 117, 1, 118, 1, 119, 1, 120, 1, 121, 1, 10, 1, 122, 1,
+    123, 1, 124, 1, 125, 1, 10, 1, 126, 1, 127, 1, 10, 41, 128, 1, 10, 89, 129,
+    1, 10, 18, 130, 1, 131, 1, 10, 7, 132, 1, 133, 1, 70, 57, 134, 1, 135, 1,
+    136, 1, 10, 67, 137, 1, 70, 2, 138, 1, 70, 2, 139, 1, 10, 19, 140, 1, 10,
+    36, 141, 1, 10, 3, 142, 1, 143, 1, 144, 1, 10, 1, 145, 1, 10, 13, 146, 1,
+    147, 1, 10, 10, 148, 1, 149, 1, 131, 1, 10, 2, 150, 1, 10, 3, 151, 1, 10, 1,
+    152, 1, 10, 1, 153, 1, 10, 3, 154, 1, 155, 1, 10, 13, 156, 1, 157, 1, 158,
+    1, 159, 1, 160, 1, 10, 1, 161, 1, 162, 1, 163, 1, 164, 1, 165, 1, 166, 1,
+    167, 1, 168, 1, 10, 1, 169, 1, 10, 2, 170, 1, 70, 1, 171, 1, 172, 1, 10, 10,
+    70, 511, 173, 1, 70, 511, 173, 1, 10, 5120, 174, 1, 10, 1, 35, 1, 6, 1, 10,
+    508, 88, 511, 175, 1, 88, 511, 175, 1,
+  ],
+  blocks: [
+    0, 1, 4, 31, 1, 95, 4, 33, 1, 1, 3, 1, 1, 2, 3, 1, 1, 2, 3, 2, 1, 1, 3, 1,
+    1, 2, 3, 2, 1, 1, 3, 5, 1, 1, 3, 5, 1, 1, 3, 4, 1, 6, 3, 1, 1, 9, 3, 1, 1,
+    6, 3, 2, 1, 5, 3, 4, 1, 4, 3, 1, 1, 1, 3, 3, 1, 1, 3, 2, 1, 2, 3, 1, 1, 1,
+    3, 2, 1, 3, 3, 4, 1, 1, 3, 1, 1, 1, 3, 1, 1, 2, 3, 1, 1, 15, 3, 1, 1, 1, 3,
+    1, 1, 7, 3, 1, 1, 10, 3, 2, 1, 3, 3, 1, 1, 5, 3, 3, 1, 4, 3, 1, 1, 6, 3, 4,
+    1, 1, 3, 1, 1, 3, 3, 4, 1, 1, 3, 1, 1, 4, 3, 2, 1, 18, 3, 2, 1, 3, 3, 1, 1,
+    98, 3, 1, 1, 1, 3, 1, 1, 1, 3, 1, 1, 1, 3, 1, 1, 1, 3, 1, 1, 1, 3, 1, 1, 1,
+    3, 1, 1, 1, 3, 1, 1, 116, 3, 1, 1, 15, 3, 1, 1, 98, 3, 1, 1, 2, 3, 1, 1, 1,
+    3, 3, 1, 1, 3, 1, 1, 2, 3, 1, 1, 7, 3, 4, 1, 1, 3, 1, 1, 1, 3, 1, 1, 32, 0,
+    112, 1, 33, 3, 17, 1, 1, 3, 7, 1, 7, 3, 17, 1, 1, 3, 7, 1, 55, 3, 1, 1, 14,
+    3, 64, 1, 1, 3, 1, 1, 49, 0, 7, 1, 263, 0, 45, 1, 1, 0, 1, 1, 1, 0, 2, 1, 1,
+    0, 2, 1, 1, 0, 1, 1, 56, 0, 6, 1, 10, 0, 11, 1, 1, 0, 1, 1, 46, 0, 21, 1,
+    16, 0, 1, 1, 101, 0, 8, 1, 1, 0, 6, 1, 2, 0, 2, 1, 1, 0, 4, 1, 33, 0, 1, 1,
+    1, 0, 1, 1, 30, 0, 27, 1, 91, 0, 11, 1, 58, 0, 9, 1, 9, 0, 1, 1, 24, 0, 4,
+    1, 1, 0, 9, 1, 1, 0, 3, 1, 1, 0, 5, 1, 43, 0, 3, 1, 52, 0, 2, 1, 5, 0, 9, 1,
+    42, 0, 58, 1, 54, 0, 3, 1, 1, 0, 18, 1, 1, 0, 7, 1, 10, 0, 2, 1, 29, 0, 3,
+    1, 56, 0, 1, 1, 1, 0, 7, 1, 2, 0, 2, 1, 2, 0, 3, 1, 9, 0, 1, 1, 10, 0, 2, 1,
+    26, 0, 1, 1, 2, 0, 3, 1, 56, 0, 1, 1, 1, 0, 5, 1, 4, 0, 2, 1, 2, 0, 3, 1, 3,
+    0, 1, 1, 30, 0, 2, 1, 3, 0, 1, 1, 11, 0, 3, 1, 56, 0, 1, 1, 1, 0, 8, 1, 1,
+    0, 3, 1, 1, 0, 3, 1, 20, 0, 2, 1, 22, 0, 6, 1, 1, 0, 3, 1, 56, 0, 1, 1, 1,
+    0, 7, 1, 2, 0, 2, 1, 2, 0, 3, 1, 7, 0, 3, 1, 10, 0, 2, 1, 30, 0, 1, 1, 59,
+    0, 5, 1, 3, 0, 3, 1, 1, 0, 4, 1, 9, 0, 1, 1, 40, 0, 5, 1, 55, 0, 1, 1, 1, 0,
+    7, 1, 1, 0, 3, 1, 1, 0, 4, 1, 7, 0, 2, 1, 11, 0, 2, 1, 29, 0, 3, 1, 56, 0,
+    1, 1, 1, 0, 7, 1, 1, 0, 3, 1, 1, 0, 4, 1, 7, 0, 2, 1, 11, 0, 2, 1, 15, 0, 1,
+    1, 12, 0, 4, 1, 55, 0, 2, 1, 1, 0, 7, 1, 1, 0, 3, 1, 1, 0, 4, 1, 9, 0, 1, 1,
+    10, 0, 2, 1, 29, 0, 3, 1, 70, 0, 1, 1, 4, 0, 6, 1, 1, 0, 1, 1, 1, 0, 8, 1,
+    18, 0, 2, 1, 61, 0, 1, 1, 2, 0, 7, 1, 12, 0, 8, 1, 98, 0, 1, 1, 2, 0, 9, 1,
+    11, 0, 7, 1, 73, 0, 2, 1, 27, 0, 1, 1, 1, 0, 1, 1, 1, 0, 1, 1, 4, 0, 2, 1,
+    49, 0, 20, 1, 1, 0, 2, 1, 5, 0, 11, 1, 1, 0, 36, 1, 9, 0, 1, 1, 100, 0, 20,
+    1, 23, 0, 4, 1, 4, 0, 3, 1, 1, 0, 3, 1, 2, 0, 7, 1, 3, 0, 4, 1, 13, 0, 12,
+    1, 1, 0, 1, 1, 10, 0, 4, 1, 98, 2, 96, 0, 160, 1, 93, 0, 3, 1, 50, 0, 4, 1,
+    28, 0, 3, 1, 29, 0, 2, 1, 30, 0, 2, 1, 64, 0, 32, 1, 9, 0, 1, 1, 45, 0, 5,
+    1, 117, 0, 2, 1, 34, 0, 1, 1, 118, 0, 12, 1, 4, 0, 12, 1, 91, 0, 5, 1, 57,
+    0, 10, 1, 1, 0, 29, 1, 2, 0, 1, 1, 48, 0, 46, 1, 2, 0, 12, 1, 20, 0, 5, 1,
+    47, 0, 17, 1, 38, 0, 9, 1, 12, 0, 3, 1, 30, 0, 13, 1, 56, 0, 14, 1, 48, 0,
+    20, 1, 152, 0, 3, 1, 1, 0, 21, 1, 4, 0, 1, 1, 6, 0, 1, 1, 2, 0, 3, 1, 70, 0,
+    64, 1, 11, 0, 5, 3, 1, 1, 2, 3, 4, 1, 1, 3, 2, 1, 2, 3, 2, 1, 2, 3, 3, 1, 1,
+    3, 4, 0, 7, 1, 1, 3, 1, 1, 1, 3, 2, 1, 1, 3, 1, 1, 5, 3, 1, 1, 2, 3, 1, 1,
+    33, 0, 5, 1, 1, 0, 10, 1, 4, 3, 1, 1, 10, 3, 1, 1, 1, 3, 4, 1, 39, 3, 1, 1,
+    35, 0, 33, 1, 18, 3, 1, 1, 1, 3, 1, 1, 3, 3, 1, 1, 9, 3, 1, 1, 2, 3, 1, 1,
+    10, 3, 2, 1, 3, 3, 1, 1, 4, 3, 1, 1, 39, 3, 2, 1, 6, 3, 4, 1, 1, 3, 12, 1,
+    4, 3, 10, 1, 15, 3, 1, 1, 6, 3, 10, 1, 30, 3, 2, 1, 24, 3, 1, 1, 1, 3, 1, 1,
+    18, 3, 1, 1, 24, 3, 1, 1, 1, 3, 2, 1, 3, 3, 2, 1, 2, 3, 1, 1, 3, 3, 1, 1, 1,
+    3, 1, 1, 3, 3, 1, 1, 4, 3, 1, 1, 2, 3, 4, 1, 2, 3, 1, 1, 1, 3, 1, 1, 1, 3,
+    6, 1, 1, 3, 1, 1, 5, 3, 4, 1, 4, 3, 2, 1, 10, 3, 1, 1, 3, 3, 1, 1, 5, 3, 1,
+    1, 13, 3, 2, 1, 2, 3, 4, 1, 2, 3, 2, 1, 2, 3, 2, 1, 18, 3, 2, 1, 2, 3, 2, 1,
+    13, 3, 1, 1, 3, 3, 1, 1, 11, 3, 1, 1, 25, 3, 1, 1, 82, 3, 1, 1, 7, 2, 2, 1,
+    13, 2, 2, 1, 190, 2, 4, 1, 3, 2, 1, 1, 2, 2, 1, 1, 108, 3, 138, 1, 1, 3, 97,
+    1, 4, 3, 36, 1, 12, 3, 16, 1, 2, 3, 4, 1, 10, 3, 2, 1, 1, 3, 7, 1, 8, 3, 2,
+    1, 2, 3, 2, 1, 4, 3, 2, 1, 2, 3, 2, 1, 4, 3, 3, 1, 2, 3, 1, 1, 2, 3, 4, 1,
+    16, 3, 4, 1, 9, 3, 1, 1, 13, 2, 2, 1, 6, 3, 2, 1, 2, 3, 1, 1, 4, 3, 2, 1, 4,
+    2, 2, 1, 6, 3, 1, 1, 1, 3, 1, 1, 17, 2, 8, 1, 8, 3, 1, 1, 1, 3, 1, 1, 5, 2,
+    12, 1, 12, 3, 2, 1, 1, 3, 3, 1, 1, 3, 4, 1, 1, 3, 2, 1, 1, 3, 1, 1, 15, 2,
+    1, 1, 10, 2, 6, 1, 3, 2, 1, 1, 10, 3, 2, 1, 1, 2, 1, 1, 8, 2, 2, 1, 17, 2,
+    2, 3, 1, 1, 4, 2, 2, 3, 8, 2, 1, 3, 5, 2, 1, 3, 13, 1, 1, 3, 1, 1, 4, 3, 2,
+    2, 1, 3, 7, 2, 2, 3, 1, 2, 1, 3, 4, 2, 1, 3, 2, 2, 1, 3, 2, 1, 5, 2, 1, 1,
+    4, 2, 2, 1, 28, 2, 1, 1, 20, 3, 1, 1, 14, 2, 1, 1, 1, 2, 1, 1, 4, 2, 3, 1,
+    1, 2, 1, 1, 30, 3, 10, 1, 21, 2, 3, 1, 24, 2, 1, 1, 14, 2, 1, 1, 91, 2, 2,
+    1, 51, 2, 1, 1, 4, 2, 1, 3, 4, 1, 149, 0, 3, 1, 141, 0, 1, 1, 96, 0, 32, 2,
+    26, 1, 1, 2, 89, 1, 12, 2, 214, 1, 26, 2, 58, 0, 6, 2, 15, 1, 2, 2, 86, 1,
+    2, 0, 2, 2, 101, 1, 5, 2, 43, 1, 1, 2, 94, 1, 1, 2, 86, 1, 9, 2, 48, 1, 1,
+    2, 40, 3, 8, 2, 61, 1, 3, 2, 55, 1, 168, 0, 4, 1, 1, 0, 10, 1, 32, 0, 2, 1,
+    80, 0, 2, 1, 16, 0, 1, 1, 3, 0, 1, 1, 4, 0, 1, 1, 23, 0, 5, 1, 4, 0, 1, 1,
+    83, 0, 2, 1, 50, 0, 18, 1, 26, 0, 18, 1, 13, 0, 1, 1, 38, 0, 8, 1, 25, 0,
+    13, 1, 12, 2, 29, 1, 3, 0, 4, 1, 47, 0, 14, 1, 36, 0, 1, 1, 67, 0, 14, 1,
+    12, 0, 1, 1, 8, 0, 2, 1, 45, 0, 3, 1, 50, 0, 1, 1, 1, 0, 3, 1, 2, 0, 2, 1,
+    5, 0, 2, 1, 1, 0, 1, 1, 41, 0, 5, 1, 5, 0, 2, 1, 108, 0, 8, 1, 1, 0, 2, 1,
+    18, 2, 36, 1, 12, 0, 80, 3, 128, 1, 30, 0, 1, 1, 97, 0, 16, 2, 10, 1, 6, 0,
+    16, 2, 35, 1, 1, 2, 19, 1, 1, 2, 4, 1, 21, 2, 96, 1, 127, 2, 7, 1, 18, 0, 3,
+    1, 1, 3, 1, 1, 127, 0, 1, 1, 98, 0, 1, 1, 149, 0, 5, 1, 6, 0, 3, 1, 1, 0, 2,
+    1, 5, 0, 4, 1, 40, 0, 3, 1, 4, 0, 1, 1, 165, 0, 2, 1, 61, 0, 4, 1, 65, 0, 5,
+    1, 61, 0, 2, 1, 77, 0, 6, 1, 70, 0, 11, 1, 49, 0, 4, 1, 122, 0, 3, 1, 53, 0,
+    15, 1, 41, 0, 1, 1, 2, 0, 2, 1, 10, 0, 4, 1, 45, 0, 11, 1, 2, 0, 1, 1, 4, 0,
+    1, 1, 10, 0, 1, 1, 50, 0, 3, 1, 36, 0, 14, 1, 16, 0, 2, 1, 44, 0, 1, 1, 12,
+    0, 3, 1, 48, 0, 14, 1, 8, 0, 4, 1, 1, 0, 2, 1, 92, 0, 12, 1, 6, 0, 1, 1, 2,
+    0, 1, 1, 157, 0, 12, 1, 21, 0, 4, 1, 55, 0, 2, 1, 1, 0, 7, 1, 2, 0, 2, 1, 2,
+    0, 3, 1, 9, 0, 1, 1, 10, 0, 2, 1, 2, 0, 7, 1, 3, 0, 5, 1, 67, 0, 9, 1, 1, 0,
+    1, 1, 2, 0, 1, 1, 1, 0, 4, 1, 1, 0, 5, 1, 1, 0, 1, 1, 14, 0, 2, 1, 82, 0,
+    18, 1, 23, 0, 1, 1, 81, 0, 20, 1, 107, 0, 7, 1, 2, 0, 9, 1, 27, 0, 2, 1, 82,
+    0, 17, 1, 106, 0, 13, 1, 101, 0, 15, 1, 128, 0, 15, 1, 117, 0, 6, 1, 1, 0,
+    2, 1, 2, 0, 4, 1, 1, 0, 1, 1, 1, 0, 2, 1, 141, 0, 7, 1, 2, 0, 7, 1, 3, 0, 1,
+    1, 28, 0, 10, 1, 40, 0, 7, 1, 1, 0, 4, 1, 8, 0, 1, 1, 9, 0, 11, 1, 46, 0,
+    16, 1, 198, 0, 8, 1, 71, 0, 8, 1, 1, 0, 8, 1, 82, 0, 22, 1, 1, 0, 14, 1,
+    122, 0, 6, 1, 3, 0, 1, 1, 1, 0, 2, 1, 1, 0, 7, 1, 1, 0, 1, 1, 66, 0, 5, 1,
+    1, 0, 2, 1, 1, 0, 5, 1, 219, 0, 4, 1, 9, 0, 2, 1, 1, 0, 1, 1, 48, 0, 7, 1,
+    3, 0, 5, 1, 23, 0, 1, 1, 85, 0, 17, 1, 6, 0, 15, 1, 72, 0, 18, 1, 192, 0, 5,
+    1, 59, 0, 7, 1, 152, 0, 1, 1, 1, 0, 55, 1, 7, 0, 4, 1, 77, 2, 4, 0, 1, 1,
+    11, 0, 2, 2, 5, 1, 9, 2, 86, 1, 41, 2, 32, 1, 97, 2, 115, 1, 125, 2, 4, 1,
+    1, 2, 7, 1, 1, 2, 2, 1, 1, 2, 35, 1, 15, 2, 1, 1, 29, 2, 3, 1, 2, 2, 1, 1,
+    14, 2, 4, 1, 8, 2, 140, 1, 33, 0, 2, 1, 1, 0, 4, 1, 92, 0, 46, 1, 2, 0, 23,
+    1, 158, 0, 5, 1, 3, 0, 22, 1, 2, 0, 7, 1, 30, 0, 4, 1, 148, 0, 3, 1, 59, 2,
+    87, 1, 9, 2, 23, 1, 9, 0, 55, 1, 4, 0, 50, 1, 8, 0, 1, 1, 14, 0, 1, 1, 22,
+    0, 5, 1, 1, 0, 15, 1, 80, 0, 7, 1, 1, 0, 17, 1, 2, 0, 7, 1, 1, 0, 2, 1, 1,
+    0, 5, 1, 100, 0, 1, 1, 158, 0, 1, 1, 61, 0, 4, 1, 124, 0, 4, 1, 126, 0, 2,
+    1, 115, 0, 1, 1, 2, 0, 1, 1, 7, 0, 2, 1, 5, 0, 1, 1, 90, 0, 7, 1, 109, 0, 7,
+    1, 57, 2, 1, 1, 202, 2, 1, 1, 48, 3, 11, 1, 5, 3, 30, 1, 2, 3, 58, 1, 6, 3,
+    30, 2, 1, 3, 2, 2, 10, 3, 18, 1, 83, 2, 3, 1, 13, 2, 44, 1, 4, 2, 9, 1, 7,
+    2, 2, 1, 14, 2, 6, 1, 26, 2, 33, 1, 12, 2, 9, 1, 1, 2, 70, 1, 1, 2, 22, 1,
+    12, 2, 43, 1, 4, 2, 5, 1, 12, 2, 17, 1, 3, 2, 1, 1, 3, 2, 3, 0, 5, 2, 63, 1,
+    1, 2, 1, 1, 1, 2, 187, 1, 2, 2, 63, 1, 13, 2, 4, 1, 1, 2, 24, 1, 18, 2, 1,
+    1, 26, 2, 2, 1, 13, 2, 1, 1, 86, 2, 85, 1, 48, 2, 70, 1, 6, 2, 1, 1, 3, 2,
+    3, 1, 2, 2, 4, 1, 3, 2, 4, 1, 11, 2, 2, 1, 7, 2, 9, 1, 99, 2, 12, 1, 4, 2,
+    1, 1, 27, 2, 47, 1, 1, 2, 10, 1, 1, 2, 57, 1, 112, 2, 13, 1, 3, 2, 11, 1, 3,
+    2, 57, 1, 1, 2, 1, 1, 4, 2, 16, 1, 2, 2, 12, 1, 4, 2, 10, 1, 7, 2, 126, 1,
+    3, 0, 1, 1, 30, 0, 96, 3, 126, 1, 2,
+  ],
+};
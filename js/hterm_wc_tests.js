@@ -0,0 +1,91 @@
+// Copyright 2020 The Chromium OS Authors. All rights reserved.
+// Use of this source code is governed by a BSD-style license that can be
+// found in the LICENSE file.
+
+'use strict';
+
+/**
+ * @fileoverview hterm.wc unit tests.
+ */
+
+describe('hterm_wc_tests.js', () => {
+
+/**
+ * Restore lib.wc settings the tests change.
+ */
+afterEach(() => {
+  lib.wc.regardCjkAmbiguous = false;
+});
+
+/**
+ * Test that the table replaces lib.wc.charWidth.
+ */
+it('installed', () => {
+  assert.strictEqual(lib.wc.charWidth, hterm.wc.charWidth);
+  assert.strictEqual(lib.wc.charWidthRegardAmbiguous,
+                     hterm.wc.charWidthRegardAmbiguous);
+  assert.strictEqual(lib.wc.charWidthDisregardAmbiguous,
+                     hterm.wc.charWidthDisregardAmbiguous);
+  assert.strictEqual(lib.wc.isCjkAmbiguous, hterm.wc.isCjkAmbiguous);
+  assert.notStrictEqual(hterm.wc.lib.charWidth, hterm.wc.charWidth);
+  assert.equal(lib.wc.strWidth('a一̀b'), 4);
+});
+
+/**
+ * Test the various width classes.
+ */
+it('classes', () => {
+  const Class = hterm.wc.Class;
+  const tests = [
+    [0x00, Class.ZERO],
+    [0x1b, Class.CONTROL],
+    [0x41, Class.NARROW],
+    [0x7f, Class.CONTROL],
+    [0x9b, Class.CONTROL],
+    [0xa1, Class.AMBIGUOUS],
+    [0x0300, Class.ZERO],
+    [0x200b, Class.ZERO],
+    [0x3042, Class.WIDE],
+    [0x4e00, Class.WIDE],
+    [0xac00, Class.WIDE],
+    [0xff21, Class.WIDE],
+    [0x1f600, Class.WIDE],
+    [0x20000, Class.WIDE],
+    [0x10fffd, Class.AMBIGUOUS],
+  ];
+  tests.forEach(([codePoint, expected]) => {
+    assert.equal(hterm.wc.getClass(codePoint), expected,
+                 codePoint.toString(16));
+  });
+});
+
+/**
+ * Test the widths of the various classes.
+ */
+it('widths', () => {
+  assert.equal(hterm.wc.charWidth(0x00), lib.wc.nulWidth);
+  assert.equal(hterm.wc.charWidth(0x1b), lib.wc.controlWidth);
+  assert.equal(hterm.wc.charWidth(0x41), 1);
+  assert.equal(hterm.wc.charWidth(0x0300), 0);
+  assert.equal(hterm.wc.charWidth(0x4e00), 2);
+  assert.equal(hterm.wc.charWidth(0x1f600), 2);
+  assert.equal(hterm.wc.charWidth(0x110000), 1);
+});
+
+/**
+ * Test East Asian ambiguous characters follow lib.wc.regardCjkAmbiguous.
+ */
+it('cjk-ambiguous', () => {
+  assert.equal(hterm.wc.charWidth(0xa1), 1);
+  assert.equal(hterm.wc.charWidthRegardAmbiguous(0xa1),
+               lib.wc.cjkAmbiguousWidth);
+  assert.equal(hterm.wc.charWidthDisregardAmbiguous(0xa1), 1);
+  assert.isTrue(hterm.wc.isCjkAmbiguous(0xa1));
+  assert.isFalse(hterm.wc.isCjkAmbiguous(0x4e00));
+  lib.wc.regardCjkAmbiguous = true;
+  assert.equal(hterm.wc.charWidth(0xa1), lib.wc.cjkAmbiguousWidth);
+  // Combining characters stay zero width.
+  assert.equal(hterm.wc.charWidth(0x0300), 0);
+});
+
+});